@@ -1,4 +1,8 @@
 from src.database import Database
+from src.money import to_decimal, to_cents, from_cents
+
+
+VALID_ACCOUNT_TYPES = ['checking', 'savings', 'business', 'loan', 'money_market', 'certificate_of_deposit']
 
 
 class AccountManager:
@@ -8,19 +12,31 @@ class AccountManager:
         """Initialize with a database connection"""
         self.db = db if db is not None else Database()
     
-    def create_account(self, owner_name, account_type, email=None, phone_number=None, initial_balance=0.0):
-        """Create a new bank account"""
-        # Validate input
+    def _account_from_row(self, row):
+        """Convert an accounts row to a dict with a Decimal balance"""
+        account = dict(row)
+        account['balance'] = from_cents(account['balance'])
+        return account
+    
+    def validate_new_account(self, owner_name, account_type, initial_balance=0.0):
+        """Check the fields of a new account, returning the initial balance as a Decimal"""
         if not owner_name:
             raise ValueError("Owner name is required")
         
-        valid_account_types = ['checking', 'savings', 'business', 'loan', 'money_market', 'certificate_of_deposit']
-        if account_type not in valid_account_types:
-            raise ValueError(f"Invalid account type. Must be one of: {', '.join(valid_account_types)}")
+        if account_type not in VALID_ACCOUNT_TYPES:
+            raise ValueError(f"Invalid account type. Must be one of: {', '.join(VALID_ACCOUNT_TYPES)}")
         
+        initial_balance = to_decimal(initial_balance)
         if initial_balance < 0:
             raise ValueError("Initial balance cannot be negative")
         
+        return initial_balance
+    
+    def create_account(self, owner_name, account_type, email=None, phone_number=None, initial_balance=0.0):
+        """Create a new bank account"""
+        # Validate input
+        initial_balance = self.validate_new_account(owner_name, account_type, initial_balance)
+        
         # Generate account number
         account_number = self.db.generate_account_number()
         
@@ -37,7 +53,7 @@ class AccountManager:
         """
         params = (
             account_number, owner_name, account_type,
-            email, phone_number, initial_balance, current_time, current_time
+            email, phone_number, to_cents(initial_balance), current_time, current_time
         )
         
         try:
@@ -48,30 +64,79 @@ class AccountManager:
         except Exception as e:
             raise Exception(f"Error creating account: {e}")
     
-    def get_account(self, account_id):
-        """Get account by ID"""
+    def _use_cache(self):
+        """Whether lookups may go through the account cache"""
+        # Reads inside a unit of work must see its uncommitted writes, so they skip the cache
+        return self.db.account_cache is not None and not self.db.in_transaction
+    
+    def get_account(self, account_id, use_cache=True):
+        """
+        Get account by ID
+        
+        Pass use_cache=False when the balance feeds a decision or a figure that
+        must be current; the cache may hold a row another worker has since changed.
+        """
+        use_cache = use_cache and self._use_cache()
+        if use_cache:
+            account = self.db.account_cache.get(account_id)
+            if account:
+                return self._account_from_row(account)
+            generation = self.db.account_cache.generation()
+        
         query = "SELECT * FROM accounts WHERE account_id = ?"
         account = self.db.execute_query(query, (account_id,), 'one')
         
         if account:
-            return dict(account)
+            if use_cache:
+                self.db.account_cache.put(account, generation)
+            return self._account_from_row(account)
         return None
     
     def get_account_by_number(self, account_number):
         """Get account by account number"""
+        use_cache = self._use_cache()
+        if use_cache:
+            account_id = self.db.account_cache.get_id(account_number)
+            if account_id is not None:
+                return self.get_account(account_id)
+            generation = self.db.account_cache.generation()
+        
         query = "SELECT * FROM accounts WHERE account_number = ?"
         account = self.db.execute_query(query, (account_number,), 'one')
         
         if account:
-            return dict(account)
+            if use_cache:
+                self.db.account_cache.put(account, generation)
+            return self._account_from_row(account)
         return None
     
+    def invalidate_cached_accounts(self, account_ids):
+        """
+        Drop accounts from the cache after they are written
+        
+        Entries are dropped at once and again when the current unit of work
+        commits, so a stale row read by another thread before the commit
+        does not stay cached.
+        """
+        cache = self.db.account_cache
+        if cache is None:
+            return
+        
+        account_ids = list(account_ids)
+        
+        def invalidate():
+            for account_id in account_ids:
+                cache.invalidate(account_id)
+        
+        invalidate()
+        self.db.after_commit(invalidate)
+    
     def get_all_accounts(self):
         """Get all accounts in the system"""
         query = "SELECT * FROM accounts ORDER BY created_at DESC"
         accounts = self.db.execute_query(query, fetch_mode='all')
         
-        return [dict(account) for account in accounts] if accounts else []
+        return [self._account_from_row(account) for account in accounts] if accounts else []
     
     def search_accounts(self, **kwargs):
         """Search for accounts with various filters"""
@@ -94,11 +159,11 @@ class AccountManager:
         
         if 'min_balance' in kwargs:
             query += " AND balance >= ?"
-            params.append(kwargs['min_balance'])
+            params.append(to_cents(kwargs['min_balance']))
         
         if 'max_balance' in kwargs:
             query += " AND balance <= ?"
-            params.append(kwargs['max_balance'])
+            params.append(to_cents(kwargs['max_balance']))
         
         if 'created_after' in kwargs:
             query += " AND created_at >= ?"
@@ -114,7 +179,52 @@ class AccountManager:
         # Execute the query
         accounts = self.db.execute_query(query, tuple(params), 'all')
         
-        return [dict(account) for account in accounts] if accounts else []
+        return [self._account_from_row(account) for account in accounts] if accounts else []
+    
+    def search_accounts_by_prefix(self, term, limit=10):
+        """
+        Find up to limit accounts whose account number or owner name starts with term
+        
+        Each half of the search is a range seek on an index and stops after limit
+        rows, so the cost does not grow with the number of accounts.
+        """
+        term = (term or '').strip()
+        if not term:
+            return []
+        
+        if limit <= 0:
+            raise ValueError("Limit must be positive")
+        
+        # Account numbers are upper case; the next string after every 'TERM...' is the
+        # term with its last character bumped by one
+        number_prefix = term.upper()
+        number_end = number_prefix[:-1] + chr(ord(number_prefix[-1]) + 1)
+        
+        # Escape LIKE wildcards so user input is matched literally
+        name_pattern = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+        
+        query = """
+            SELECT * FROM (
+                SELECT * FROM accounts
+                WHERE account_number >= ? AND account_number < ?
+                ORDER BY account_number
+                LIMIT ?
+            )
+            UNION
+            SELECT * FROM (
+                SELECT * FROM accounts
+                WHERE owner_name LIKE ? ESCAPE '\\'
+                ORDER BY owner_name COLLATE NOCASE
+                LIMIT ?
+            )
+            ORDER BY owner_name COLLATE NOCASE, account_number
+            LIMIT ?
+        """
+        params = (number_prefix, number_end, limit, name_pattern, limit, limit)
+        
+        accounts = self.db.execute_query(query, params, 'all')
+        
+        return [self._account_from_row(account) for account in accounts] if accounts else []
     
     def update_account(self, account_id, **kwargs):
         """Update account details"""
@@ -149,6 +259,7 @@ class AccountManager:
         # Execute update query
         query = f"UPDATE accounts SET {', '.join(update_fields)} WHERE account_id = ?"
         self.db.execute_query(query, tuple(params))
+        self.invalidate_cached_accounts([account_id])
         
         # Return updated account
         return self.get_account(account_id)
@@ -156,6 +267,7 @@ class AccountManager:
     def update_balance(self, account_id, new_balance):
         """Update account balance"""
         # Validate input
+        new_balance = to_decimal(new_balance)
         if new_balance < 0:
             raise ValueError("Account balance cannot be negative")
         
@@ -166,34 +278,69 @@ class AccountManager:
         
         # Update balance
         query = "UPDATE accounts SET balance = ?, updated_at = ? WHERE account_id = ?"
-        params = (new_balance, self.db.get_current_timestamp(), account_id)
+        params = (to_cents(new_balance), self.db.get_current_timestamp(), account_id)
         
         self.db.execute_query(query, params)
+        self.invalidate_cached_accounts([account_id])
         
         # Return updated account
         return self.get_account(account_id)
     
-    def close_account(self, account_id):
-        """Close and delete an account"""
-        # Check if account exists
-        account = self.get_account(account_id)
-        if not account:
-            raise ValueError(f"Account with ID {account_id} not found")
+    def apply_balance_delta(self, account_id, delta, allow_negative=False):
+        """
+        Atomically add delta to an account balance
         
-        # Check if account has zero balance
-        if account['balance'] != 0:
-            raise ValueError("Account must have zero balance before closing")
+        The change is a single conditional UPDATE, so concurrent deposits and
+        withdrawals cannot overwrite each other.
         
-        # Check if account has any active loans
-        query = "SELECT COUNT(*) as count FROM loans WHERE account_id = ? AND status IN ('pending', 'active')"
-        result = self.db.execute_query(query, (account_id,), 'one')
+        Returns:
+        - The new balance, or None if the change would make the balance
+          negative and allow_negative is False
+        """
+        query = """
+            UPDATE accounts
+            SET balance = balance + ?, updated_at = ?
+            WHERE account_id = ? AND (? OR balance + ? >= 0)
+            RETURNING balance
+        """
+        delta = to_cents(delta)
+        params = (delta, self.db.get_current_timestamp(), account_id, 1 if allow_negative else 0, delta)
         
-        if result and result['count'] > 0:
-            raise ValueError("Cannot close account with active or pending loans")
+        result = self.db.execute_query(query, params, 'one')
+        if result:
+            self.invalidate_cached_accounts([account_id])
+            return from_cents(result['balance'])
         
-        # Delete account (cascade will delete related transactions)
-        query = "DELETE FROM accounts WHERE account_id = ?"
-        self.db.execute_query(query, (account_id,))
+        # Nothing was updated - tell a missing account apart from insufficient funds
+        if not self.get_account(account_id):
+            raise ValueError(f"Account with ID {account_id} not found")
+        return None
+    
+    def close_account(self, account_id):
+        """Close and delete an account"""
+        # The checks and the delete share one unit of work, which holds the write lock and
+        # reads past the cache, so no deposit can land between checking the balance and deleting
+        with self.db.transaction():
+            # Check if account exists
+            account = self.get_account(account_id)
+            if not account:
+                raise ValueError(f"Account with ID {account_id} not found")
+            
+            # Check if account has zero balance
+            if account['balance'] != 0:
+                raise ValueError("Account must have zero balance before closing")
+            
+            # Check if account has any active loans
+            query = "SELECT COUNT(*) as count FROM loans WHERE account_id = ? AND status IN ('pending', 'active')"
+            result = self.db.execute_query(query, (account_id,), 'one')
+            
+            if result and result['count'] > 0:
+                raise ValueError("Cannot close account with active or pending loans")
+            
+            # Delete account (cascade will delete related transactions)
+            query = "DELETE FROM accounts WHERE account_id = ? AND balance = 0"
+            self.db.execute_query(query, (account_id,))
+            self.invalidate_cached_accounts([account_id])
         
         return True
     
@@ -230,11 +377,22 @@ class AccountManager:
         """
         loan_summary = self.db.execute_query(query, (account_id,), 'one')
         
+        transaction_summary = [dict(t) for t in transaction_summary] if transaction_summary else []
+        for summary in transaction_summary:
+            summary['total'] = from_cents(summary['total'])
+        
+        recent_transactions = [dict(t) for t in recent_transactions] if recent_transactions else []
+        for transaction in recent_transactions:
+            transaction['amount'] = from_cents(transaction['amount'])
+        
+        loan_summary = dict(loan_summary) if loan_summary else {'count': 0, 'total_remaining': 0}
+        loan_summary['total_remaining'] = from_cents(loan_summary['total_remaining'] or 0)
+        
         return {
             'account': account,
-            'transaction_summary': [dict(t) for t in transaction_summary] if transaction_summary else [],
-            'recent_transactions': [dict(t) for t in recent_transactions] if recent_transactions else [],
-            'loan_summary': dict(loan_summary) if loan_summary else {'count': 0, 'total_remaining': 0}
+            'transaction_summary': transaction_summary,
+            'recent_transactions': recent_transactions,
+            'loan_summary': loan_summary
         }
     
     def delete_account(self, account_id):
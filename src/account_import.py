@@ -0,0 +1,180 @@
+import argparse
+import csv
+import json
+import sys
+from contextlib import ExitStack
+from src.database import Database
+from src.account import AccountManager
+from src.account_numbers import AccountNumberAllocator
+from src.money import to_cents
+
+
+# Input formats by file suffix
+FORMATS = {'.csv': 'csv', '.jsonl': 'jsonl', '.ndjson': 'jsonl'}
+
+# Columns read from each input row
+ACCOUNT_FIELDS = ('owner_name', 'account_type', 'email', 'phone_number', 'initial_balance')
+
+
+def read_csv(stream):
+    """Yield (line_number, row) pairs from CSV text with a header row"""
+    reader = csv.DictReader(stream)
+    for row in reader:
+        yield reader.line_num, row
+
+
+def read_jsonl(stream):
+    """Yield (line_number, row) pairs from JSON Lines text, skipping blank lines"""
+    for line_number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            row = {'_error': f"Invalid JSON: {e}", '_raw': line.rstrip('\n')}
+        if not isinstance(row, dict):
+            row = {'_error': "Each line must be a JSON object", '_raw': line.rstrip('\n')}
+        yield line_number, row
+
+
+class AccountImporter:
+    """Stream accounts from CSV or JSONL into the database in chunks"""
+
+    def __init__(self, db=None, chunk_size=1000, allocator=None):
+        """
+        Initialize with database connection
+
+        Parameters:
+        - chunk_size: Rows inserted per transaction; memory use is bounded by it
+        - allocator: AccountNumberAllocator to draw numbers from, defaults to one for db
+        """
+        if chunk_size <= 0:
+            raise ValueError("Chunk size must be positive")
+
+        self.db = db if db else Database()
+        self.chunk_size = chunk_size
+        self.allocator = allocator if allocator else AccountNumberAllocator(self.db)
+        self.account_manager = AccountManager(self.db)
+
+    def import_file(self, source, file_format=None, reject_path=None):
+        """
+        Import accounts from a file path, or '-' for stdin
+
+        Parameters:
+        - file_format: 'csv' or 'jsonl', detected from the file suffix when omitted
+        - reject_path: Where rejected rows are written as JSON Lines with their
+          line number and error; rejects are only counted when omitted
+
+        Returns:
+        - {'imported': count, 'rejected': count}
+        """
+        if file_format is None:
+            suffix = '' if source == '-' else '.' + str(source).rsplit('.', 1)[-1].lower()
+            file_format = FORMATS.get(suffix)
+        if file_format not in ('csv', 'jsonl'):
+            raise ValueError("Import format must be 'csv' or 'jsonl'")
+
+        with ExitStack() as stack:
+            if source == '-':
+                stream = sys.stdin
+            else:
+                stream = stack.enter_context(open(source, newline='', encoding='utf-8'))
+
+            reject_file = None
+            if reject_path:
+                reject_file = stack.enter_context(open(reject_path, 'w', encoding='utf-8'))
+
+            rows = read_csv(stream) if file_format == 'csv' else read_jsonl(stream)
+            return self.import_rows(rows, reject_file)
+
+    def import_rows(self, rows, reject_file=None):
+        """
+        Validate and insert (line_number, row) pairs from any iterable
+
+        Rows are validated with the same rules as create_account. Each chunk of
+        valid rows gets its account numbers in one reservation and is inserted with
+        executemany in a single transaction; if that transaction fails, the whole
+        chunk is rejected and later chunks still run.
+        """
+        summary = {'imported': 0, 'rejected': 0}
+
+        chunk = []
+        for line_number, row in rows:
+            try:
+                chunk.append((line_number, row, self._prepare_row(row)))
+            except (ValueError, TypeError) as e:
+                self._reject(summary, reject_file, line_number, row, str(e))
+                continue
+
+            if len(chunk) >= self.chunk_size:
+                self._insert_chunk(chunk, summary, reject_file)
+                chunk = []
+
+        if chunk:
+            self._insert_chunk(chunk, summary, reject_file)
+
+        return summary
+
+    def _prepare_row(self, row):
+        """Validate one input row and return the values to insert, without the account number"""
+        if '_error' in row:
+            raise ValueError(row['_error'])
+
+        values = {field: row.get(field) for field in ACCOUNT_FIELDS}
+        for field, value in values.items():
+            # JSON can carry lists and objects; they must fail this row, not the chunk's insert
+            if field == 'initial_balance':
+                if value is not None and (isinstance(value, bool) or not isinstance(value, (str, int, float))):
+                    raise ValueError("initial_balance must be a number")
+            elif value is not None and not isinstance(value, str):
+                raise ValueError(f"{field} must be a string")
+            if isinstance(value, str):
+                values[field] = value.strip() or None
+
+        initial_balance = self.account_manager.validate_new_account(
+            values['owner_name'], values['account_type'], values['initial_balance'] or 0
+        )
+        return (values['owner_name'], values['account_type'], values['email'], values['phone_number'],
+                to_cents(initial_balance))
+
+    def _insert_chunk(self, chunk, summary, reject_file):
+        """Insert one chunk of validated rows in a single transaction"""
+        # Numbers are reserved before the transaction so the block is not tied to it
+        numbers = self.allocator.allocate(len(chunk))
+        now = self.db.get_current_timestamp()
+
+        try:
+            with self.db.transaction() as conn:
+                conn.executemany("""
+                    INSERT INTO accounts (
+                        account_number, owner_name, account_type,
+                        email, phone_number, balance, created_at, updated_at
+                    )
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """, [(number,) + values + (now, now) for number, (_, _, values) in zip(numbers, chunk)])
+        except Exception as e:
+            for line_number, row, _ in chunk:
+                self._reject(summary, reject_file, line_number, row, f"Import chunk failed: {e}")
+            return
+
+        summary['imported'] += len(chunk)
+
+    def _reject(self, summary, reject_file, line_number, row, error):
+        """Count a rejected row and write it to the reject file"""
+        summary['rejected'] += 1
+        if reject_file is not None:
+            record = {'line': line_number, 'error': error, 'row': row}
+            reject_file.write(json.dumps(record, default=str) + '\n')
+
+
+if __name__ == '__main__':
+    # Run from the project root, e.g. "python -m src.account_import accounts.csv --rejects rejects.jsonl"
+    parser = argparse.ArgumentParser(description="Bulk import accounts from CSV or JSONL")
+    parser.add_argument('source', help="Input file, or - for stdin")
+    parser.add_argument('--format', choices=('csv', 'jsonl'), help="Input format when it cannot be told from the suffix")
+    parser.add_argument('--rejects', help="File to write rejected rows to")
+    parser.add_argument('--chunk-size', type=int, default=1000)
+    args = parser.parse_args()
+
+    result = AccountImporter(chunk_size=args.chunk_size).import_file(args.source, args.format, args.rejects)
+    print(result)
@@ -0,0 +1,100 @@
+import threading
+
+
+# New numbers are prefix + zero-padded serial + Luhn check digit. Legacy numbers start with
+# '1000', so the default prefix can never produce one of them.
+DEFAULT_PREFIX = '20'
+
+
+def luhn_check_digit(digits):
+    """Compute the Luhn check digit for a string of digits"""
+    total = 0
+    # Double every second digit counting from the right, where the check digit will go
+    for position, digit in enumerate(reversed(digits)):
+        value = int(digit)
+        if position % 2 == 0:
+            value *= 2
+            if value > 9:
+                value -= 9
+        total += value
+    return str((10 - total % 10) % 10)
+
+
+def is_valid_account_number(account_number):
+    """Return True if an account number is all digits and its Luhn check digit matches"""
+    if not account_number or not account_number.isdigit() or len(account_number) < 2:
+        return False
+    return luhn_check_digit(account_number[:-1]) == account_number[-1]
+
+
+class AccountNumberAllocator:
+    """Hand out unique account numbers from a persisted sequence in pre-reserved blocks"""
+
+    def __init__(self, db, prefix=DEFAULT_PREFIX, serial_digits=8, block_size=100):
+        """
+        Initialize the allocator
+
+        Parameters:
+        - prefix: Leading digits of every number, each prefix has its own sequence
+        - serial_digits: Width of the zero-padded serial after the prefix
+        - block_size: Serials reserved per database round trip
+
+        Numbers in a reserved block that are never used (for example when the
+        process exits) are skipped, so the sequence can have gaps but never repeats.
+        """
+        if not prefix or not prefix.isdigit():
+            raise ValueError("Account number prefix must be digits")
+        if serial_digits <= 0 or block_size <= 0:
+            raise ValueError("Serial width and block size must be positive")
+
+        self.db = db
+        self.prefix = prefix
+        self.serial_digits = serial_digits
+        self.block_size = block_size
+        self.sequence_name = f"account_number:{prefix}"
+
+        self._next = 0
+        self._end = 0
+        self._lock = threading.Lock()
+
+    def next_number(self):
+        """Get the next account number, reserving a new block when the current one runs out"""
+        with self._lock:
+            if self._next >= self._end:
+                # Inside a unit of work the reservation shares its fate: a rollback would
+                # release the serials, so only one is taken and nothing is left in memory
+                size = 1 if self.db.in_transaction else self.block_size
+                self._next, self._end = self._reserve(size)
+
+            serial = self._next
+            self._next += 1
+
+        return self._format(serial)
+
+    def allocate(self, count):
+        """Get count account numbers at once with a single reservation"""
+        if count <= 0:
+            return []
+
+        start, end = self._reserve(count)
+        return [self._format(serial) for serial in range(start, end)]
+
+    def _reserve(self, size):
+        """Atomically claim the next size serials, returned as a (start, end) range"""
+        query = """
+            INSERT INTO sequences (name, next_value) VALUES (?, 1 + ?)
+            ON CONFLICT (name) DO UPDATE SET next_value = next_value + excluded.next_value - 1
+            RETURNING next_value
+        """
+        end = self.db.execute_query(query, (self.sequence_name, size), 'one')['next_value']
+        start = end - size
+
+        if end - 1 >= 10 ** self.serial_digits:
+            raise ValueError(f"Account number sequence for prefix {self.prefix} is exhausted")
+
+        return start, end
+
+    def _format(self, serial):
+        """Build the account number for a serial"""
+        body = f"{self.prefix}{serial:0{self.serial_digits}d}"
+        return body + luhn_check_digit(body)
@@ -0,0 +1,324 @@
+# NumPy is optional: schedules for many loans are computed as arrays when it is
+# installed and with a plain Python loop otherwise
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+HAS_NUMPY = np is not None
+
+
+def monthly_payment(principal, annual_rate, term_months):
+    """Calculate the level monthly payment for a loan (annual_rate in percent)"""
+    principal = float(principal)
+    monthly_rate = float(annual_rate) / 100 / 12
+
+    if term_months <= 0:
+        raise ValueError("Loan term must be positive")
+
+    if monthly_rate == 0:
+        return principal / term_months
+
+    # Standard loan formula: PMT = P * r / (1 - (1+r)^-n)
+    return principal * monthly_rate / (1 - (1 + monthly_rate) ** -term_months)
+
+
+def monthly_payments(principals, annual_rates, term_months):
+    """Calculate level monthly payments for many loans at once"""
+    if not HAS_NUMPY:
+        return [monthly_payment(p, r, n) for p, r, n in zip(principals, annual_rates, term_months)]
+
+    principals = np.asarray(principals, dtype=float)
+    rates = np.asarray(annual_rates, dtype=float) / 100 / 12
+    terms = np.asarray(term_months, dtype=float)
+    return _payments_np(principals, rates, terms)
+
+
+def _payments_np(principals, rates, terms):
+    """Vectorised PMT, falling back to straight-line repayment at 0%"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        amortized = principals * rates / (1 - (1 + rates) ** -terms)
+    return np.where(rates == 0, principals / terms, amortized)
+
+
+class AmortizationSchedule:
+    """Columnar amortization schedule covering one or more loans"""
+
+    COLUMNS = ('loan_id', 'period', 'payment', 'interest', 'principal', 'extra_payment', 'balance')
+
+    def __init__(self, columns):
+        """Initialize with a dict of equally long columns (lists or NumPy arrays), ordered by loan and period"""
+        self.columns = columns
+
+    def __len__(self):
+        return len(self.columns['period'])
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def to_dict(self):
+        """Get the columns as plain Python lists, ready to serialise"""
+        return {name: _as_list(values) for name, values in self.columns.items()}
+
+    def rows(self):
+        """Iterate the schedule one period at a time as dicts"""
+        columns = self.to_dict()
+        for values in zip(*(columns[name] for name in self.COLUMNS)):
+            yield dict(zip(self.COLUMNS, values))
+
+    def totals_by_period(self, column, max_period):
+        """Sum a column across all loans for periods 1..max_period, returned as a list"""
+        periods = self.columns['period']
+        values = self.columns[column]
+
+        if HAS_NUMPY and not isinstance(periods, list):
+            mask = periods <= max_period
+            totals = np.bincount(periods[mask].astype(int), weights=values[mask], minlength=max_period + 1)
+            return totals[1:].tolist()
+
+        totals = [0.0] * max_period
+        for period, value in zip(periods, values):
+            if period <= max_period:
+                totals[period - 1] += value
+        return totals
+
+    def for_loan(self, loan_id):
+        """Get the part of the schedule belonging to one loan"""
+        if HAS_NUMPY and not isinstance(self.columns['loan_id'], list):
+            mask = self.columns['loan_id'] == loan_id
+            return AmortizationSchedule({name: values[mask] for name, values in self.columns.items()})
+
+        keep = [i for i, value in enumerate(self.columns['loan_id']) if value == loan_id]
+        return AmortizationSchedule({name: [values[i] for i in keep] for name, values in self.columns.items()})
+
+
+def build_schedules(principals, annual_rates, term_months, loan_ids=None, extra_payments=None,
+                    rate_changes=None, use_numpy=None):
+    """
+    Build amortization schedules for many loans
+
+    Parameters:
+    - principals, annual_rates (percent), term_months: One entry per loan
+    - loan_ids: Identifiers for the loan_id column (defaults to 0..n-1)
+    - extra_payments: {loan_id: {period: amount}} paid on top of the regular payment,
+      shortening the loan
+    - rate_changes: {loan_id: {period: annual_rate}} effective from that period; the
+      payment is recalculated over the remaining term
+    - use_numpy: Force (True) or avoid (False) the NumPy path; defaults to HAS_NUMPY
+
+    Figures are floating point estimates rounded to cents, like calculate_monthly_payment.
+
+    Returns:
+    - AmortizationSchedule
+    """
+    principals = [float(p) for p in principals]
+    annual_rates = [float(r) for r in annual_rates]
+    term_months = [int(n) for n in term_months]
+    loan_ids = list(range(len(principals))) if loan_ids is None else list(loan_ids)
+    extra_payments = extra_payments or {}
+    rate_changes = rate_changes or {}
+
+    if not len(principals) == len(annual_rates) == len(term_months) == len(loan_ids):
+        raise ValueError("Every loan needs a principal, rate, term and id")
+    if any(p < 0 for p in principals):
+        raise ValueError("Loan principal cannot be negative")
+    if any(n <= 0 for n in term_months):
+        raise ValueError("Loan term must be positive")
+
+    if use_numpy is None:
+        use_numpy = HAS_NUMPY
+    if use_numpy and not HAS_NUMPY:
+        raise ValueError("NumPy is not installed")
+
+    if not use_numpy:
+        return _build_python(principals, annual_rates, term_months, loan_ids, extra_payments, rate_changes)
+
+    if not principals:
+        return AmortizationSchedule({name: np.array([]) for name in AmortizationSchedule.COLUMNS})
+
+    if extra_payments or rate_changes:
+        return _build_numpy_stepped(principals, annual_rates, term_months, loan_ids, extra_payments, rate_changes)
+    return _build_numpy_closed_form(principals, annual_rates, term_months, loan_ids)
+
+
+def iter_schedules(loans, chunk_size=10000, extra_payments=None, rate_changes=None, principal_field='loan_amount'):
+    """
+    Stream schedules for an iterable of loan dicts in chunks of chunk_size loans
+
+    Each loan needs loan_id, interest_rate, term_months and principal_field. Memory
+    stays bounded by the chunk size however many loans there are.
+    """
+    if chunk_size <= 0:
+        raise ValueError("Chunk size must be positive")
+
+    chunk = []
+    for loan in loans:
+        chunk.append(loan)
+        if len(chunk) >= chunk_size:
+            yield _build_chunk(chunk, extra_payments, rate_changes, principal_field)
+            chunk = []
+
+    if chunk:
+        yield _build_chunk(chunk, extra_payments, rate_changes, principal_field)
+
+
+def _build_chunk(loans, extra_payments, rate_changes, principal_field):
+    """Build the schedules of one chunk of loan dicts"""
+    loan_ids = [loan['loan_id'] for loan in loans]
+
+    # Only pass the events of loans in this chunk
+    extras = {i: extra_payments[i] for i in loan_ids if i in extra_payments} if extra_payments else None
+    changes = {i: rate_changes[i] for i in loan_ids if i in rate_changes} if rate_changes else None
+
+    return build_schedules(
+        [loan[principal_field] for loan in loans],
+        [loan['interest_rate'] for loan in loans],
+        [loan['term_months'] for loan in loans],
+        loan_ids=loan_ids,
+        extra_payments=extras,
+        rate_changes=changes
+    )
+
+
+def _build_python(principals, annual_rates, term_months, loan_ids, extra_payments, rate_changes):
+    """Period-by-period schedules without NumPy"""
+    columns = {name: [] for name in AmortizationSchedule.COLUMNS}
+
+    for principal, annual_rate, term, loan_id in zip(principals, annual_rates, term_months, loan_ids):
+        extras = extra_payments.get(loan_id, {})
+        changes = rate_changes.get(loan_id, {})
+
+        balance = principal
+        rate = annual_rate / 100 / 12
+        payment = monthly_payment(balance, annual_rate, term)
+
+        for period in range(1, term + 1):
+            if period in changes:
+                rate = changes[period] / 100 / 12
+                payment = monthly_payment(balance, changes[period], term - period + 1)
+
+            interest = balance * rate
+            # The last period clears whatever is left
+            principal_paid = balance if period == term else min(payment - interest, balance)
+            balance -= principal_paid
+            extra = min(float(extras.get(period, 0)), balance)
+            balance -= extra
+
+            columns['loan_id'].append(loan_id)
+            columns['period'].append(period)
+            columns['payment'].append(round(principal_paid + interest, 2))
+            columns['interest'].append(round(interest, 2))
+            columns['principal'].append(round(principal_paid, 2))
+            columns['extra_payment'].append(round(extra, 2))
+            columns['balance'].append(round(max(balance, 0.0), 2))
+
+            # Extra payments can retire the loan early
+            if balance < 0.005:
+                break
+
+    return AmortizationSchedule(columns)
+
+
+def _build_numpy_closed_form(principals, annual_rates, term_months, loan_ids):
+    """Schedules from the closed-form balance B_k = P(1+r)^k - M((1+r)^k - 1)/r, one array op per column"""
+    principal = np.asarray(principals, dtype=float)
+    rate = np.asarray(annual_rates, dtype=float) / 100 / 12
+    term = np.asarray(term_months)
+    payment = _payments_np(principal, rate, term.astype(float))
+
+    periods = np.arange(1, term.max() + 1)
+    growth = (1 + rate)[:, None] ** periods[None, :]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        amortized = principal[:, None] * growth - payment[:, None] * (growth - 1) / rate[:, None]
+    balance = np.where(rate[:, None] == 0, principal[:, None] - payment[:, None] * periods[None, :], amortized)
+
+    # The last period clears whatever is left, and rounding must not leave a negative balance
+    balance = np.where(periods[None, :] >= term[:, None], 0.0, np.maximum(balance, 0.0))
+    opening = np.concatenate([principal[:, None], balance[:, :-1]], axis=1)
+    interest = opening * rate[:, None]
+    principal_paid = opening - balance
+
+    # Flatten loan by loan, keeping each loan's own periods; like the stepped paths a loan
+    # that has nothing left to repay stops after its first period
+    mask = (periods[None, :] <= term[:, None]) & ((periods[None, :] == 1) | (opening >= 0.005))
+    return AmortizationSchedule({
+        'loan_id': np.broadcast_to(np.asarray(loan_ids)[:, None], mask.shape)[mask],
+        'period': np.broadcast_to(periods, mask.shape)[mask],
+        'payment': np.round((principal_paid + interest)[mask], 2),
+        'interest': np.round(interest[mask], 2),
+        'principal': np.round(principal_paid[mask], 2),
+        'extra_payment': np.zeros(int(mask.sum())),
+        'balance': np.round(balance[mask], 2)
+    })
+
+
+def _build_numpy_stepped(principals, annual_rates, term_months, loan_ids, extra_payments, rate_changes):
+    """Schedules with extra payments or rate changes, stepping every loan forward one period at a time"""
+    balance = np.asarray(principals, dtype=float)
+    rate = np.asarray(annual_rates, dtype=float) / 100 / 12
+    term = np.asarray(term_months)
+    payment = _payments_np(balance, rate, term.astype(float))
+    position = {loan_id: i for i, loan_id in enumerate(loan_ids)}
+
+    # Index the sparse events by period so each step only touches the loans affected
+    extras_by_period = {}
+    for loan_id, extras in extra_payments.items():
+        for period, amount in extras.items():
+            extras_by_period.setdefault(period, []).append((position[loan_id], float(amount)))
+    changes_by_period = {}
+    for loan_id, changes in rate_changes.items():
+        for period, annual_rate in changes.items():
+            # A change after the last period never takes effect, as in the Python path
+            if period <= term[position[loan_id]]:
+                changes_by_period.setdefault(period, []).append((position[loan_id], float(annual_rate)))
+
+    active = np.ones(len(balance), dtype=bool)
+    steps = []
+    for period in range(1, int(term.max()) + 1):
+        if period in changes_by_period:
+            index, new_rates = (np.array(values) for values in zip(*changes_by_period[period]))
+            index = index.astype(int)
+            rate[index] = new_rates / 100 / 12
+            payment[index] = _payments_np(balance[index], rate[index], (term[index] - period + 1).astype(float))
+
+        interest = balance * rate
+        principal_paid = np.where(term == period, balance, np.minimum(payment - interest, balance))
+        balance = balance - principal_paid
+
+        extra = np.zeros(len(balance))
+        if period in extras_by_period:
+            index, amounts = (np.array(values) for values in zip(*extras_by_period[period]))
+            np.add.at(extra, index.astype(int), amounts)
+        extra = np.minimum(extra, balance)
+        balance = balance - extra
+
+        rows = np.flatnonzero(active)
+        steps.append((rows, period, principal_paid[rows] + interest[rows], interest[rows],
+                       principal_paid[rows], extra[rows], np.maximum(balance[rows], 0.0)))
+
+        # Loans drop out at the end of their term or once extra payments retire them
+        active &= (term > period) & (balance >= 0.005)
+        if not active.any():
+            break
+
+    loan_index = np.concatenate([step[0] for step in steps])
+    period = np.concatenate([np.full(len(step[0]), step[1]) for step in steps])
+    order = np.lexsort((period, loan_index))
+
+    def column(i):
+        return np.round(np.concatenate([step[i] for step in steps])[order], 2)
+
+    return AmortizationSchedule({
+        'loan_id': np.asarray(loan_ids)[loan_index[order]],
+        'period': period[order],
+        'payment': column(2),
+        'interest': column(3),
+        'principal': column(4),
+        'extra_payment': column(5),
+        'balance': column(6)
+    })
+
+
+def _as_list(values):
+    """Convert a column to a list of Python scalars"""
+    return values.tolist() if hasattr(values, 'tolist') else list(values)
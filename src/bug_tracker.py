@@ -36,43 +36,6 @@ class BugTracker:
             
             # Add handler to logger
             self.logger.addHandler(file_handler)
-        
-        # Create bugs table if it doesn't exist
-        self._create_bugs_table()
-    
-    def _create_bugs_table(self):
-        """Create bugs table if it doesn't exist"""
-        try:
-            conn = self.db.connect()
-            cursor = conn.cursor()
-            
-            # Create bugs table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS bugs (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    title TEXT NOT NULL,
-                    description TEXT NOT NULL,
-                    severity TEXT NOT NULL,
-                    module TEXT,
-                    steps_to_reproduce TEXT,
-                    status TEXT NOT NULL DEFAULT 'open',
-                    reported_date TIMESTAMP NOT NULL,
-                    last_updated TIMESTAMP NOT NULL,
-                    fixed_date TIMESTAMP,
-                    closed_date TIMESTAMP,
-                    comments TEXT
-                )
-            ''')
-            
-            conn.commit()
-            return True
-        except Exception as e:
-            if conn:
-                conn.rollback()
-            self.logger.error(f"Error creating bugs table: {e}")
-            raise Exception(f"Error creating bugs table: {e}")
-        finally:
-            self.db.close()
     
     def report_bug(self, title, description, severity, module=None, steps_to_reproduce=None):
         """Report a new bug"""
@@ -0,0 +1,146 @@
+import collections
+import threading
+import time
+
+
+class LRUCache:
+    """Thread-safe in-process cache bounded by size, with optional expiry"""
+
+    def __init__(self, maxsize=1024, ttl=None):
+        """
+        Initialize the cache
+
+        Parameters:
+        - maxsize: Most entries kept; the least recently used is evicted first
+        - ttl: Seconds an entry stays valid, or None to keep it until evicted
+        """
+        if maxsize <= 0:
+            raise ValueError("Cache size must be positive")
+
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._metrics = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0}
+
+    def get(self, key, default=None):
+        """Return the cached value for key, or default if missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._metrics['misses'] += 1
+                return default
+
+            value, expires = entry
+            if expires is not None and expires <= time.monotonic():
+                del self._entries[key]
+                self._metrics['expirations'] += 1
+                self._metrics['misses'] += 1
+                return default
+
+            self._entries.move_to_end(key)
+            self._metrics['hits'] += 1
+            return value
+
+    def set(self, key, value):
+        """Store a value, evicting the least recently used entry when full"""
+        expires = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._entries[key] = (value, expires)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self._metrics['evictions'] += 1
+
+    def invalidate(self, key):
+        """Drop one entry if present"""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """Drop every entry"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Get the size, hit rate and eviction counters of the cache"""
+        with self._lock:
+            return _stats(self._metrics, size=len(self._entries), maxsize=self.maxsize)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+
+def _stats(metrics, **extra):
+    """Build a stats dict with the hit rate from raw counters"""
+    lookups = metrics['hits'] + metrics['misses']
+    stats = dict(metrics, **extra)
+    stats['hit_rate'] = metrics['hits'] / lookups if lookups else 0.0
+    return stats
+
+
+class AccountCache:
+    """Read-through cache of account rows keyed by account id and account number"""
+
+    def __init__(self, backend=None):
+        """
+        Initialize with a cache backend
+
+        Parameters:
+        - backend: Any object with get, set, invalidate, clear and stats, defaulting to
+          an LRUCache. Entries live in this process only: other workers see a write
+          when their entry expires, so keep the backend's ttl short.
+        """
+        self.backend = backend if backend is not None else LRUCache(maxsize=10000, ttl=60)
+        # Bumped by every invalidation, so a read that raced a write does not re-cache the old row
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def get(self, account_id):
+        """Get a copy of a cached account, or None"""
+        account = self.backend.get(f"id:{account_id}")
+        # Callers format fields in place, so they never get the cached dict itself
+        return dict(account) if account is not None else None
+
+    def get_id(self, account_number):
+        """Get the account id cached for an account number, or None"""
+        return self.backend.get(f"number:{account_number}")
+
+    def generation(self):
+        """Get the token to pass to put(), taken before the account row is read"""
+        return self._generation
+
+    def put(self, account, generation):
+        """
+        Cache an account under its id and its number
+
+        Nothing is stored if any account was invalidated since generation was
+        taken, since the row may have been read before that write.
+
+        Returns:
+        - Whether the account was cached
+        """
+        with self._lock:
+            if generation != self._generation:
+                return False
+            self.backend.set(f"id:{account['account_id']}", dict(account))
+            # Account numbers never change, so the number only maps to the id
+            self.backend.set(f"number:{account['account_number']}", account['account_id'])
+        return True
+
+    def invalidate(self, account_id):
+        """Drop a cached account"""
+        with self._lock:
+            self._generation += 1
+            self.backend.invalidate(f"id:{account_id}")
+
+    def clear(self):
+        """Drop every cached account"""
+        with self._lock:
+            self._generation += 1
+            self.backend.clear()
+
+    def stats(self):
+        """Get the backend's hit rate and eviction counters"""
+        return self.backend.stats()
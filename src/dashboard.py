@@ -0,0 +1,70 @@
+import threading
+import time
+from src.database import Database
+
+
+class DashboardStats:
+    """Compute the admin dashboard counters with a few aggregate queries"""
+
+    def __init__(self, db=None, ttl=0):
+        """
+        Initialize with database connection
+
+        Parameters:
+        - ttl: Seconds a computed snapshot is served before it is recomputed (0 disables caching)
+        """
+        self.db = db if db else Database()
+        self.ttl = ttl
+        self._snapshot = None
+        self._computed_at = 0.0
+        self._lock = threading.Lock()
+
+    def get_stats(self, refresh=False):
+        """
+        Get the dashboard counters
+
+        Returns:
+        - Dict with total_accounts, total_transactions, active_loans, open_bugs,
+          per-status loans_by_status and bugs_by_status counts and generated_at
+        """
+        with self._lock:
+            fresh = self._snapshot is not None and time.monotonic() - self._computed_at < self.ttl
+            if refresh or not fresh:
+                self._snapshot = self._compute()
+                self._computed_at = time.monotonic()
+
+            return dict(self._snapshot)
+
+    def invalidate(self):
+        """Drop the cached snapshot so the next call recomputes it"""
+        with self._lock:
+            self._snapshot = None
+
+    def _compute(self):
+        """Run the aggregate queries behind the dashboard"""
+        # Both totals in one round trip; each COUNT(*) is answered from the smallest index
+        totals = self.db.execute_query("""
+            SELECT
+                (SELECT COUNT(*) FROM accounts) AS total_accounts,
+                (SELECT COUNT(*) FROM transactions) AS total_transactions
+        """, fetch_mode='one')
+
+        loans = self.db.execute_query(
+            "SELECT status, COUNT(*) AS count FROM loans GROUP BY status", fetch_mode='all'
+        )
+        loans_by_status = {row['status']: row['count'] for row in loans or []}
+
+        bugs = self.db.execute_query(
+            "SELECT status, COUNT(*) AS count FROM bugs GROUP BY status", fetch_mode='all'
+        )
+        bugs_by_status = {row['status']: row['count'] for row in bugs or []}
+
+        return {
+            'total_accounts': totals['total_accounts'],
+            'total_transactions': totals['total_transactions'],
+            'active_loans': loans_by_status.get('active', 0),
+            'open_bugs': bugs_by_status.get('open', 0),
+            'loans_by_status': loans_by_status,
+            'bugs_by_status': bugs_by_status,
+            'generated_at': self.db.get_current_timestamp()
+        }
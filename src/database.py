@@ -1,14 +1,134 @@
 import sqlite3
 import datetime
 import os
+import queue
+import threading
+from contextlib import contextmanager
 from pathlib import Path
+from src.migrations import SchemaMigrator
+from src.account_numbers import AccountNumberAllocator
+
+
+# SQLite tuning applied once to every new connection, keyed by profile name
+PRAGMA_PROFILES = {
+    # WAL lets readers run alongside the writer; FULL syncs every commit
+    'durable': {
+        'busy_timeout': 5000,
+        'journal_mode': 'WAL',
+        'synchronous': 'FULL',
+        'cache_size': -16000,
+        'temp_store': 'MEMORY',
+        'mmap_size': 0,
+    },
+    # NORMAL only syncs at checkpoints: a power loss can drop the last commits but never corrupts
+    'fast': {
+        'busy_timeout': 5000,
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'cache_size': -64000,
+        'temp_store': 'MEMORY',
+        'mmap_size': 268435456,
+    },
+}
+
+
+class ConnectionPool:
+    """Thread-safe pool of reusable SQLite connections"""
+    
+    def __init__(self, factory, size=5, timeout=30.0):
+        """Initialize with a connection factory and a maximum pool size"""
+        if size < 1:
+            raise ValueError("Connection pool size must be at least 1")
+        
+        self.factory = factory
+        self.size = size
+        self.timeout = timeout
+        
+        # Idle connections are reused most-recently-released first
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+    
+    def acquire(self):
+        """Borrow a healthy connection, creating one if the pool is not full"""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = self._create_if_room()
+                if conn is None:
+                    # Pool is exhausted, wait for another thread to release one
+                    try:
+                        conn = self._idle.get(timeout=self.timeout)
+                    except queue.Empty:
+                        raise Exception(f"Timed out waiting for a database connection after {self.timeout}s")
+            
+            if self._is_healthy(conn):
+                return conn
+            
+            self._discard(conn)
+    
+    def release(self, conn):
+        """Return a connection to the pool"""
+        if conn is None:
+            return
+        
+        try:
+            # Never hand out a connection with a half-finished transaction
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            self._discard(conn)
+            return
+        
+        self._idle.put(conn)
+    
+    def close_all(self):
+        """Close every idle connection in the pool"""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(conn)
+    
+    def _create_if_room(self):
+        """Create a new connection unless the pool is already at capacity"""
+        with self._lock:
+            if self._created >= self.size:
+                return None
+            self._created += 1
+        
+        try:
+            return self.factory()
+        except Exception:
+            with self._lock:
+                self._created -= 1
+            raise
+    
+    def _is_healthy(self, conn):
+        """Check that a pooled connection is still usable"""
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+    
+    def _discard(self, conn):
+        """Close a connection and free its slot in the pool"""
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+        with self._lock:
+            self._created -= 1
 
 
 class Database:
     """Handle database operations for the banking system"""
     
-    def __init__(self, db_path=None):
-        """Initialize with a database path"""
+    def __init__(self, db_path=None, pool_size=5, pool_timeout=30.0, pragma_profile='durable', pragmas=None):
+        """Initialize with a database path, connection pool settings and a pragma profile"""
         if db_path is None:
             # Default to the data directory in the project root
             self.db_path = Path(__file__).parent.parent / 'data' / 'banking.db'
@@ -17,104 +137,80 @@ class Database:
         
         # Create directory if it doesn't exist
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
-          # Initialize database
+        
+        # Resolve the pragma profile, with any explicit overrides on top
+        if pragma_profile not in PRAGMA_PROFILES:
+            raise ValueError(f"Invalid pragma profile. Must be one of: {', '.join(PRAGMA_PROFILES)}")
+        self.pragmas = dict(PRAGMA_PROFILES[pragma_profile])
+        self.pragmas.update(pragmas or {})
+        
+        for name, value in self.pragmas.items():
+            if name not in PRAGMA_PROFILES['durable'] or not str(value).lstrip('-').isalnum():
+                raise ValueError(f"Invalid pragma setting: {name} = {value}")
+        
+        # Connections are shared by every manager using this database
+        self.pool = ConnectionPool(self._create_connection, size=pool_size, timeout=pool_timeout)
+        
+        # Open unit of work per thread, see transaction()
+        self._local = threading.local()
+        
+        # Created on first use; replace it to change the prefix or block size
+        self.account_number_allocator = None
+        
+        # Optional AccountCache for account lookups; None disables caching
+        self.account_cache = None
+        
+        # Bring the schema up to date (a no-op once it is current)
         self.conn = None
-        self.initialize_database()
         self.migrate_database()
     
-    def connect(self):
-        """Connect to the database"""
-        self.conn = sqlite3.connect(self.db_path)
+    def _create_connection(self):
+        """Open and configure a new connection for the pool"""
+        # Autocommit mode: transactions are only opened explicitly by begin_transaction()
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+        # Apply the tuning profile
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name} = {value}")
         # Enable foreign keys
-        self.conn.execute("PRAGMA foreign_keys = ON")
+        conn.execute("PRAGMA foreign_keys = ON")
         # Return dictionary-like rows
-        self.conn.row_factory = sqlite3.Row
+        conn.row_factory = sqlite3.Row
+        return conn
+    
+    @contextmanager
+    def connection(self):
+        """Borrow a pooled connection for the duration of a with block"""
+        state = self._transaction_state()
+        if state.depth > 0:
+            # Join the unit of work already open on this thread
+            yield state.conn
+            return
+        
+        conn = self.pool.acquire()
+        try:
+            yield conn
+        finally:
+            self.pool.release(conn)
+    
+    def connect(self):
+        """Borrow a connection from the pool until close() is called"""
+        self.conn = self.pool.acquire()
         return self.conn
     
     def close(self):
-        """Close the database connection"""
+        """Return the borrowed connection to the pool"""
         if self.conn:
-            self.conn.close()
+            self.pool.release(self.conn)
             self.conn = None
     
+    def close_all(self):
+        """Close all idle pooled connections"""
+        self.close()
+        self.pool.close_all()
+    
     def initialize_database(self):
         """Create database tables if they don't exist"""
-        try:
-            conn = self.connect()
-            cursor = conn.cursor()
-            
-            # Create accounts table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS accounts (
-                    account_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    account_number TEXT UNIQUE NOT NULL,
-                    owner_name TEXT NOT NULL,
-                    account_type TEXT NOT NULL,
-                    email TEXT,
-                    phone_number TEXT,
-                    balance REAL NOT NULL DEFAULT 0.0,
-                    created_at TIMESTAMP NOT NULL,
-                    updated_at TIMESTAMP NOT NULL
-                )
-            ''')
-              # Create transactions table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS transactions (
-                    transaction_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    account_id INTEGER NOT NULL,
-                    transaction_type TEXT NOT NULL,
-                    amount REAL NOT NULL,
-                    description TEXT,
-                    transaction_date TIMESTAMP NOT NULL,
-                    related_transaction_id INTEGER,
-                    related_account_id INTEGER,
-                    FOREIGN KEY (account_id) REFERENCES accounts(account_id) ON DELETE CASCADE,
-                    FOREIGN KEY (related_transaction_id) REFERENCES transactions(transaction_id),
-                    FOREIGN KEY (related_account_id) REFERENCES accounts(account_id)
-                )
-            ''')
-              # Create loans table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS loans (
-                    loan_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    account_id INTEGER NOT NULL,
-                    loan_amount REAL NOT NULL,
-                    interest_rate REAL NOT NULL,
-                    term_months INTEGER NOT NULL,
-                    remaining_amount REAL NOT NULL,
-                    status TEXT NOT NULL,
-                    application_date TIMESTAMP NOT NULL,
-                    start_date TIMESTAMP,
-                    end_date TIMESTAMP,
-                    last_payment_date TIMESTAMP,
-                    FOREIGN KEY (account_id) REFERENCES accounts(account_id) ON DELETE CASCADE
-                )
-            ''')
-              # Create users table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS users (
-                    user_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    username TEXT UNIQUE NOT NULL,
-                    password_hash TEXT NOT NULL,
-                    email TEXT UNIQUE NOT NULL,
-                    full_name TEXT NOT NULL,
-                    user_type TEXT NOT NULL DEFAULT 'customer',
-                    is_active BOOLEAN DEFAULT 1,
-                    created_at TIMESTAMP NOT NULL,
-                    last_login TIMESTAMP,
-                    account_id INTEGER,
-                    FOREIGN KEY (account_id) REFERENCES accounts(account_id) ON DELETE SET NULL
-                )
-            ''')
-            
-            conn.commit()
-            return True
-        except Exception as e:
-            if conn:
-                conn.rollback()
-            raise Exception(f"Database initialization error: {e}")
-        finally:
-            self.close()
+        return self.migrate_database()
     
     def execute_query(self, query, params=(), fetch_mode=None):
         """
@@ -130,33 +226,30 @@ class Database:
         - For SELECT: The fetched row(s)
         - For UPDATE/DELETE: The number of affected rows
         """
-        try:
-            conn = self.connect()
+        with self.connection() as conn:
             cursor = conn.cursor()
-            
-            cursor.execute(query, params)
-            
-            if fetch_mode == 'one':
-                result = cursor.fetchone()
-            elif fetch_mode == 'all':
-                result = cursor.fetchall()
-            else:
-                # For INSERT, return the last inserted row ID
-                if query.strip().upper().startswith('INSERT'):
-                    result = cursor.lastrowid
+            try:
+                cursor.execute(query, params)
+                
+                if fetch_mode == 'one':
+                    result = cursor.fetchone()
+                elif fetch_mode == 'all':
+                    result = cursor.fetchall()
                 else:
-                    # For UPDATE/DELETE, return the number of affected rows
-                    result = cursor.rowcount
+                    # For INSERT, return the last inserted row ID
+                    if query.strip().upper().startswith('INSERT'):
+                        result = cursor.lastrowid
+                    else:
+                        # For UPDATE/DELETE, return the number of affected rows
+                        result = cursor.rowcount
                 
-                conn.commit()
-            
-            return result
-        except Exception as e:
-            if conn and not fetch_mode:
-                conn.rollback()
-            raise Exception(f"Database query error: {e}")
-        finally:
-            self.close()
+                # Writes autocommit unless an outer transaction() owns the commit
+                return result
+            except Exception as e:
+                raise Exception(f"Database query error: {e}")
+            finally:
+                # Finish the statement so UPDATE ... RETURNING commits in autocommit mode
+                cursor.close()
     
     def get_current_timestamp(self):
         """Get the current timestamp in a consistent format"""
@@ -164,13 +257,11 @@ class Database:
     
     def generate_account_number(self):
         """Generate a unique account number"""
-        # Get current timestamp for uniqueness
-        timestamp = int(datetime.datetime.now().timestamp())
-        
-        # Generate a 10-digit account number
-        account_number = f"1000{timestamp % 10000000:07d}"
+        # Numbers come from a persisted sequence in reserved blocks, see AccountNumberAllocator
+        if self.account_number_allocator is None:
+            self.account_number_allocator = AccountNumberAllocator(self)
         
-        return account_number
+        return self.account_number_allocator.next_number()
     
     def backup_database(self, backup_path=None):
         """Create a backup of the database"""
@@ -184,22 +275,19 @@ class Database:
             backup_path = backup_dir / f"banking_backup_{timestamp}.db"
         
         try:
-            conn = self.connect()
-            
-            # Create a new database connection for the backup
-            backup_conn = sqlite3.connect(backup_path)
-            
-            # Copy database to backup
-            conn.backup(backup_conn)
-            
-            # Close backup connection
-            backup_conn.close()
+            with self.connection() as conn:
+                # Create a new database connection for the backup
+                backup_conn = sqlite3.connect(backup_path)
+                
+                # Copy database to backup
+                conn.backup(backup_conn)
+                
+                # Close backup connection
+                backup_conn.close()
             
             return str(backup_path)
         except Exception as e:
             raise Exception(f"Database backup error: {e}")
-        finally:
-            self.close()
     
     def restore_database(self, backup_path):
         """Restore database from a backup"""
@@ -208,7 +296,7 @@ class Database:
         
         try:
             # Close any existing connections
-            self.close()
+            self.close_all()
             
             # Connect to the backup database
             backup_conn = sqlite3.connect(backup_path)
@@ -223,58 +311,124 @@ class Database:
             backup_conn.close()
             conn.close()
             
+            # Every cached account may differ from the restored rows
+            if self.account_cache is not None:
+                self.account_cache.clear()
+            
             return True
         except Exception as e:
             raise Exception(f"Database restore error: {e}")
     
+    def _transaction_state(self):
+        """Get the unit-of-work state for the current thread"""
+        state = self._local
+        if not hasattr(state, 'depth'):
+            state.conn = None
+            state.depth = 0
+            state.callbacks = []
+        return state
+    
+    @property
+    def in_transaction(self):
+        """Whether the current thread has an open unit of work"""
+        return self._transaction_state().depth > 0
+    
     def begin_transaction(self):
-        """Begin a database transaction"""
-        try:
-            self.conn = self.connect()
-            return self.conn
-        except Exception as e:
-            self.close()
-            raise Exception(f"Error beginning transaction: {e}")
+        """Begin a database transaction, or a savepoint if one is already open"""
+        state = self._transaction_state()
+        
+        if state.depth == 0:
+            conn = self.pool.acquire()
+            try:
+                # Take the write lock up front so the unit of work cannot deadlock on upgrade
+                conn.execute("BEGIN IMMEDIATE")
+            except Exception as e:
+                self.pool.release(conn)
+                raise Exception(f"Error beginning transaction: {e}")
+            state.conn = conn
+        else:
+            state.conn.execute(f"SAVEPOINT sp_{state.depth}")
+        
+        state.depth += 1
+        return state.conn
     
     def commit_transaction(self):
-        """Commit the current transaction"""
-        if self.conn:
-            try:
-                self.conn.commit()
-            finally:
-                self.close()
+        """Commit the current transaction or release the innermost savepoint"""
+        state = self._transaction_state()
+        if state.depth == 0:
+            return
+        
+        state.depth -= 1
+        if state.depth > 0:
+            state.conn.execute(f"RELEASE sp_{state.depth}")
+            return
+        
+        conn = state.conn
+        state.conn = None
+        callbacks, state.callbacks = state.callbacks, []
+        try:
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            self.pool.release(conn)
+        
+        for callback in callbacks:
+            callback()
     
     def rollback_transaction(self):
-        """Rollback the current transaction"""
-        if self.conn:
-            try:
-                self.conn.rollback()
-            finally:
-                self.close()
-    
-    def migrate_database(self):
-        """Migrate database schema to handle any missing columns"""
+        """Rollback the current transaction or the innermost savepoint"""
+        state = self._transaction_state()
+        if state.depth == 0:
+            return
+        
+        state.depth -= 1
+        if state.depth > 0:
+            state.conn.execute(f"ROLLBACK TO sp_{state.depth}")
+            state.conn.execute(f"RELEASE sp_{state.depth}")
+            return
+        
+        conn = state.conn
+        state.conn = None
+        state.callbacks = []
         try:
-            conn = self.connect()
-            cursor = conn.cursor()
-            
-            # Check if related_account_id column exists in transactions table
-            cursor.execute("PRAGMA table_info(transactions)")
-            columns = [column[1] for column in cursor.fetchall()]
-            
-            if 'related_account_id' not in columns:
-                # Add the missing column
-                cursor.execute("ALTER TABLE transactions ADD COLUMN related_account_id INTEGER")
-                cursor.execute("ALTER TABLE transactions ADD CONSTRAINT fk_related_account FOREIGN KEY (related_account_id) REFERENCES accounts(account_id)")
-                conn.commit()
-                print("Database migrated: added related_account_id column to transactions table")
-            
-            return True
-        except Exception as e:
-            if conn:
-                conn.rollback()
-            # Ignore errors if column already exists or other non-critical issues
-            print(f"Migration note: {e}")
-            return True
+            conn.rollback()
         finally:
-            self.close()
\ No newline at end of file
+            self.pool.release(conn)
+    
+    def after_commit(self, callback):
+        """
+        Run a callback once the current unit of work commits
+        
+        Outside a transaction the callback runs immediately. It is dropped if the
+        transaction rolls back.
+        """
+        state = self._transaction_state()
+        if state.depth == 0:
+            callback()
+        else:
+            state.callbacks.append(callback)
+    
+    @contextmanager
+    def transaction(self):
+        """
+        Run the enclosed queries as a single unit of work
+        
+        Every execute_query call made by this thread inside the block joins the
+        same connection and is committed once on exit. Nested blocks become
+        savepoints, so an inner failure only undoes the inner block.
+        """
+        conn = self.begin_transaction()
+        try:
+            yield conn
+        except BaseException:
+            self.rollback_transaction()
+            raise
+        else:
+            self.commit_transaction()
+    
+    def migrate_database(self):
+        """Upgrade the database schema to the latest version"""
+        SchemaMigrator(self).upgrade()
+        return True
@@ -0,0 +1,20 @@
+import datetime
+
+
+def as_date(value, default=None):
+    """
+    Normalise a date, a datetime or an ISO string to a date
+
+    Parameters:
+    - default: Returned when value is None; without one, None is rejected
+    """
+    if value is None and default is not None:
+        return default
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, datetime.date):
+        return value
+    try:
+        return datetime.date.fromisoformat(str(value)[:10])
+    except ValueError:
+        raise ValueError(f"Invalid date: {value}")
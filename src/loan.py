@@ -1,8 +1,14 @@
 from src.database import Database
 from src.account import AccountManager
 from src.transaction import TransactionManager
+from src.money import to_decimal, to_cents, from_cents
+from src.pagination import encode_cursor, decode_cursor
+from src.amortization import build_schedules, monthly_payment
 
 
+# Sequence bumped by every write to loan amounts or statuses, see mark_loan_book_changed()
+LOAN_BOOK_VERSION = 'loan_book_version'
+
 class LoanManager:
     """Handle operations related to loans"""
     
@@ -10,9 +16,17 @@ class LoanManager:
         """Initialize with a database connection"""
         self.db = db if db else Database()
     
+    def _loan_from_row(self, row):
+        """Convert a loans row to a dict with Decimal amounts"""
+        loan = dict(row)
+        loan['loan_amount'] = from_cents(loan['loan_amount'])
+        loan['remaining_amount'] = from_cents(loan['remaining_amount'])
+        return loan
+    
     def apply_for_loan(self, account_id, loan_amount, interest_rate, term_months):
         """Apply for a new loan"""
         # Validate loan parameters
+        loan_amount = to_decimal(loan_amount)
         if loan_amount <= 0:
             raise ValueError("Loan amount must be positive")
         
@@ -38,11 +52,13 @@ class LoanManager:
             VALUES (?, ?, ?, ?, ?, ?, ?)
         """
         params = (
-            account_id, loan_amount, interest_rate, term_months,
-            loan_amount, 'pending', self.db.get_current_timestamp()
+            account_id, to_cents(loan_amount), interest_rate, term_months,
+            to_cents(loan_amount), 'pending', self.db.get_current_timestamp()
         )
         
-        loan_id = self.db.execute_query(query, params)
+        with self.db.transaction():
+            loan_id = self.db.execute_query(query, params)
+            self.mark_loan_book_changed()
         
         # Return the newly created loan
         return self.get_loan(loan_id)
@@ -53,7 +69,7 @@ class LoanManager:
         loan = self.db.execute_query(query, (loan_id,), 'one')
         
         if loan:
-            return dict(loan)
+            return self._loan_from_row(loan)
         return None
     
     def get_account_loans(self, account_id):
@@ -61,7 +77,7 @@ class LoanManager:
         query = "SELECT * FROM loans WHERE account_id = ? ORDER BY application_date DESC"
         loans = self.db.execute_query(query, (account_id,), 'all')
         
-        return [dict(loan) for loan in loans] if loans else []
+        return [self._loan_from_row(loan) for loan in loans] if loans else []
     
     def get_all_loans(self, status=None):
         """Get all loans in the system, optionally filtered by status"""
@@ -72,7 +88,59 @@ class LoanManager:
             query = "SELECT * FROM loans ORDER BY application_date DESC"
             loans = self.db.execute_query(query, fetch_mode='all')
         
-        return [dict(loan) for loan in loans] if loans else []
+        return [self._loan_from_row(loan) for loan in loans] if loans else []
+    
+    def list_loans_with_accounts(self, status=None, account_id=None, cursor=None, limit=50):
+        """
+        Get one page of loans, newest first, with their account number and owner
+        
+        Parameters:
+        - status: Only return loans with this status
+        - account_id: Only return loans of this account
+        - cursor: next_cursor from the previous page
+        - limit: Maximum number of loans per page
+        
+        Returns:
+        - {'loans': [...], 'next_cursor': cursor for the following page or None}
+        """
+        if limit <= 0:
+            raise ValueError("Page size must be positive")
+        
+        query = """
+            SELECT l.*, a.account_number, a.owner_name
+            FROM loans l
+            JOIN accounts a ON a.account_id = l.account_id
+            WHERE 1=1
+        """
+        params = []
+        
+        if status:
+            query += " AND l.status = ?"
+            params.append(status)
+        
+        if account_id:
+            query += " AND l.account_id = ?"
+            params.append(account_id)
+        
+        # (application_date, loan_id) is unique and matches the index order, so pages are stable
+        if cursor:
+            last_date, last_id = decode_cursor(cursor, 2)
+            query += " AND (l.application_date, l.loan_id) < (?, ?)"
+            params.extend([last_date, last_id])
+        
+        # Fetch one extra row to find out whether another page exists
+        query += " ORDER BY l.application_date DESC, l.loan_id DESC LIMIT ?"
+        params.append(limit + 1)
+        
+        rows = self.db.execute_query(query, tuple(params), 'all')
+        loans = [self._loan_from_row(row) for row in rows] if rows else []
+        
+        next_cursor = None
+        if len(loans) > limit:
+            loans = loans[:limit]
+            next_cursor = encode_cursor(loans[-1]['application_date'], loans[-1]['loan_id'])
+        
+        return {'loans': loans, 'next_cursor': next_cursor}
     
     def update_loan_status(self, loan_id, new_status):
         """Update the status of a loan"""
@@ -87,58 +155,70 @@ class LoanManager:
         
         # Update status
         query = "UPDATE loans SET status = ? WHERE loan_id = ?"
-        self.db.execute_query(query, (new_status, loan_id))
+        with self.db.transaction():
+            self.db.execute_query(query, (new_status, loan_id))
+            self.mark_loan_book_changed()
         
         # Return the updated loan
         return self.get_loan(loan_id)
     
-    def approve_loan(self, loan_id):
-        """Approve a loan application and disburse funds"""
-        # Get loan info
-        loan = self.get_loan(loan_id)
-        if not loan:
+    def set_autopay(self, loan_id, enabled=True):
+        """Enroll a loan in (or remove it from) automatic monthly payments"""
+        query = "UPDATE loans SET autopay = ? WHERE loan_id = ? RETURNING loan_id"
+        if not self.db.execute_query(query, (1 if enabled else 0, loan_id), 'one'):
             raise ValueError(f"Loan with ID {loan_id} not found")
         
-        # Check if loan is in pending state
-        if loan['status'] != 'pending':
-            raise ValueError(f"Cannot approve loan that is not in pending state. Current status: {loan['status']}")
-        
-        # Get account info
-        account_manager = AccountManager(self.db)
-        account = account_manager.get_account(loan['account_id'])
-        
-        if not account:
-            raise ValueError(f"Account with ID {loan['account_id']} not found")
-          # Update loan status and dates
-        current_time = self.db.get_current_timestamp()
-        
-        # Calculate end date based on term_months using proper date arithmetic
-        # Adding months properly using datetime calculations
-        year_increase = (current_time.month + loan['term_months'] - 1) // 12
-        new_month = (current_time.month + loan['term_months'] - 1) % 12 + 1  # 1-based month
-        end_date = current_time.replace(year=current_time.year + year_increase, month=new_month)
-        
-        query = """
-            UPDATE loans 
-            SET status = 'active', start_date = ?, end_date = ?
-            WHERE loan_id = ?
-        """
-        self.db.execute_query(query, (current_time, end_date, loan_id))
-        
-        # Disburse loan amount to account
-        transaction_manager = TransactionManager(self.db)
-          # Record loan disbursement transaction
-        transaction = transaction_manager.record_transaction(
-            account_id=loan['account_id'],
-            transaction_type='deposit',
-            amount=loan['loan_amount'],
-            description=f"Loan disbursement for loan #{loan_id}"
-        )
+        return self.get_loan(loan_id)
+    
+    def approve_loan(self, loan_id):
+        """Approve a loan application and disburse funds"""
+        # Status change, disbursement and balance update commit together
+        with self.db.transaction():
+            # Get loan info
+            loan = self.get_loan(loan_id)
+            if not loan:
+                raise ValueError(f"Loan with ID {loan_id} not found")
+            
+            # Check if loan is in pending state
+            if loan['status'] != 'pending':
+                raise ValueError(f"Cannot approve loan that is not in pending state. Current status: {loan['status']}")
+            
+            account_manager = AccountManager(self.db)
+            
+            # Update loan status and dates
+            current_time = self.db.get_current_timestamp()
+            
+            # Calculate end date based on term_months using proper date arithmetic
+            # Adding months properly using datetime calculations
+            year_increase = (current_time.month + loan['term_months'] - 1) // 12
+            new_month = (current_time.month + loan['term_months'] - 1) % 12 + 1  # 1-based month
+            end_date = current_time.replace(year=current_time.year + year_increase, month=new_month)
+            
+            query = """
+                UPDATE loans 
+                SET status = 'active', start_date = ?, end_date = ?
+                WHERE loan_id = ?
+            """
+            self.db.execute_query(query, (current_time, end_date, loan_id))
+            self.mark_loan_book_changed()
+            
+            # Disburse loan amount to account
+            transaction_manager = TransactionManager(self.db)
+            
+            # Update account balance
+            new_balance = account_manager.apply_balance_delta(loan['account_id'], loan['loan_amount'])
+            
+            # Record loan disbursement transaction
+            transaction = transaction_manager.record_transaction(
+                account_id=loan['account_id'],
+                transaction_type='loan_disbursement',
+                amount=loan['loan_amount'],
+                description=f"Loan disbursement for loan #{loan_id}",
+                balance_after=new_balance,
+                loan_id=loan_id
+            )
         
-        # Update account balance
-        new_balance = account['balance'] + loan['loan_amount']
-        account_manager.update_balance(loan['account_id'], new_balance)
-          # Return updated loan
+        # Return updated loan
         updated_loan = self.get_loan(loan_id)
         
         return updated_loan
@@ -159,85 +239,93 @@ class LoanManager:
     
     def make_payment(self, loan_id, payment_amount):
         """Make a payment toward a loan"""
-        # Get loan info
-        loan = self.get_loan(loan_id)
-        if not loan:
-            raise ValueError(f"Loan with ID {loan_id} not found")
-        
-        # Check if loan is active
-        if loan['status'] != 'active':
-            raise ValueError(f"Cannot make payment on a loan that is not active. Current status: {loan['status']}")
-        
-        # Validate payment amount
-        if payment_amount <= 0:
-            raise ValueError("Payment amount must be positive")
-        
-        if payment_amount > loan['remaining_amount']:
-            raise ValueError(f"Payment amount (${payment_amount}) exceeds remaining loan balance (${loan['remaining_amount']})")
-        
-        # Get account info
-        account_manager = AccountManager(self.db)
-        account = account_manager.get_account(loan['account_id'])
-        
-        if not account:
-            raise ValueError(f"Account with ID {loan['account_id']} not found")
-        
-        # Check if account has sufficient funds
-        if payment_amount > account['balance']:
-            raise ValueError("Insufficient funds in account for loan payment")
-        
-        # Withdraw from account
-        transaction_manager = TransactionManager(self.db)        # Record loan payment transaction
-        transaction = transaction_manager.record_transaction(
-            account_id=loan['account_id'],
-            transaction_type='withdrawal',
-            amount=payment_amount,
-            description=f"Loan payment for loan #{loan_id}"
-        )
-        
-        # Update account balance
-        new_balance = account['balance'] - payment_amount
-        account_manager.update_balance(loan['account_id'], new_balance)
-        
-        # Update loan remaining amount
-        new_remaining = loan['remaining_amount'] - payment_amount
-        current_time = self.db.get_current_timestamp()
+        # Withdrawal, balance update and loan update commit together
+        with self.db.transaction():
+            # Get loan info
+            loan = self.get_loan(loan_id)
+            if not loan:
+                raise ValueError(f"Loan with ID {loan_id} not found")
+            
+            # Check if loan is active
+            if loan['status'] != 'active':
+                raise ValueError(f"Cannot make payment on a loan that is not active. Current status: {loan['status']}")
+            
+            # Validate payment amount
+            payment_amount = to_decimal(payment_amount)
+            if payment_amount <= 0:
+                raise ValueError("Payment amount must be positive")
+            
+            if payment_amount > loan['remaining_amount']:
+                raise ValueError(f"Payment amount (${payment_amount}) exceeds remaining loan balance (${loan['remaining_amount']})")
+            
+            # Withdraw from account, refusing to go below zero
+            account_manager = AccountManager(self.db)
+            new_balance = account_manager.apply_balance_delta(loan['account_id'], -payment_amount)
+            if new_balance is None:
+                raise ValueError("Insufficient funds in account for loan payment")
+            
+            # Record loan payment transaction
+            transaction_manager = TransactionManager(self.db)
+            transaction = transaction_manager.record_transaction(
+                account_id=loan['account_id'],
+                transaction_type='loan_payment',
+                amount=payment_amount,
+                description=f"Loan payment for loan #{loan_id}",
+                balance_after=new_balance,
+                loan_id=loan_id
+            )
+            
+            # Update loan remaining amount
+            new_remaining = loan['remaining_amount'] - payment_amount
+            current_time = self.db.get_current_timestamp()
+            
+            if new_remaining <= 0:
+                # Loan is paid off
+                query = """
+                    UPDATE loans 
+                    SET remaining_amount = 0, status = 'paid', last_payment_date = ?
+                    WHERE loan_id = ?
+                """
+                self.db.execute_query(query, (current_time, loan_id))
+            else:
+                # Loan still has remaining balance
+                query = """
+                    UPDATE loans 
+                    SET remaining_amount = ?, last_payment_date = ?
+                    WHERE loan_id = ?
+                """
+                self.db.execute_query(query, (to_cents(new_remaining), current_time, loan_id))
+            
+            self.mark_loan_book_changed()
         
-        if new_remaining <= 0:
-            # Loan is paid off
-            query = """
-                UPDATE loans 
-                SET remaining_amount = 0, status = 'paid', last_payment_date = ?
-                WHERE loan_id = ?
-            """
-            self.db.execute_query(query, (current_time, loan_id))
-        else:
-            # Loan still has remaining balance
-            query = """
-                UPDATE loans 
-                SET remaining_amount = ?, last_payment_date = ?
-                WHERE loan_id = ?
-            """
-            self.db.execute_query(query, (new_remaining, current_time, loan_id))
-          # Return updated loan
+        # Return updated loan
         updated_loan = self.get_loan(loan_id)
         
         return updated_loan
     
+    def mark_loan_book_changed(self):
+        """
+        Bump the loan book version so cached portfolio analytics are recomputed
+        
+        Every write that changes loan amounts or statuses calls this in its own unit
+        of work, so workers and batch jobs in other processes invalidate each other.
+        """
+        query = """
+            INSERT INTO sequences (name, next_value) VALUES (?, 1)
+            ON CONFLICT (name) DO UPDATE SET next_value = next_value + 1
+        """
+        self.db.execute_query(query, (LOAN_BOOK_VERSION,))
+    
+    def get_loan_book_version(self):
+        """Get the current loan book version, 0 before the first loan write"""
+        query = "SELECT next_value FROM sequences WHERE name = ?"
+        row = self.db.execute_query(query, (LOAN_BOOK_VERSION,), 'one')
+        return row['next_value'] if row else 0
+    
     def calculate_monthly_payment(self, loan_amount, interest_rate, term_months):
         """Calculate the monthly payment for a loan"""
-        # Convert annual interest rate to monthly
-        monthly_rate = interest_rate / 100 / 12
-        
-        if monthly_rate == 0:
-            # Handle 0% interest case
-            return loan_amount / term_months
-        
-        # Standard loan formula: PMT = P * (r * (1+r)^n) / ((1+r)^n - 1)
-        numerator = monthly_rate * ((1 + monthly_rate) ** term_months)
-        denominator = ((1 + monthly_rate) ** term_months) - 1
-        
-        return loan_amount * (numerator / denominator)
+        # The payment is an estimate, so the formula works in floating point
+        return monthly_payment(loan_amount, interest_rate, term_months)
     
     def get_loan_summary(self, loan_id):
         """Get a summary of a loan including payment schedule"""
@@ -255,41 +343,26 @@ class LoanManager:
             loan['loan_amount'], loan['interest_rate'], loan['term_months']
         )
         
+        # Schedule figures are estimates computed in floating point like the monthly payment
         total_payments = monthly_payment * loan['term_months']
-        total_interest = total_payments - loan['loan_amount']
+        total_interest = total_payments - float(loan['loan_amount'])
         
         # Get payment transactions
         transaction_manager = TransactionManager(self.db)
-        payments = transaction_manager.search_transactions(
-            account_id=loan['account_id'],
-            transaction_type='loan_payment',
-            description_contains=f"loan #{loan_id}"
-        )
+        payments = transaction_manager.get_loan_transactions(loan_id, transaction_type='loan_payment')
         
         # Build payment schedule
-        payment_schedule = []
-        remaining = loan['loan_amount']
-        
-        for month in range(1, loan['term_months'] + 1):
-            # Calculate interest for this month
-            interest_payment = remaining * (loan['interest_rate'] / 100 / 12)
-            principal_payment = monthly_payment - interest_payment
-            
-            # Handle final payment rounding issues
-            if month == loan['term_months']:
-                principal_payment = remaining
-                payment_amount = principal_payment + interest_payment
-            else:
-                payment_amount = monthly_payment
-                remaining -= principal_payment
-            
-            payment_schedule.append({
-                'month': month,
-                'payment_amount': payment_amount,
-                'principal_payment': principal_payment,
-                'interest_payment': interest_payment,
-                'remaining_balance': max(0, remaining)
-            })
+        schedule = build_schedules([loan['loan_amount']], [loan['interest_rate']], [loan['term_months']])
+        payment_schedule = [
+            {
+                'month': row['period'],
+                'payment_amount': row['payment'],
+                'principal_payment': row['principal'],
+                'interest_payment': row['interest'],
+                'remaining_balance': row['balance']
+            }
+            for row in schedule.rows()
+        ]
         
         return {
             'loan': loan,
@@ -0,0 +1,473 @@
+import datetime
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+
+def _baseline_schema(conn):
+    """Create the original banking tables"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS accounts (
+            account_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            account_number TEXT UNIQUE NOT NULL,
+            owner_name TEXT NOT NULL,
+            account_type TEXT NOT NULL,
+            email TEXT,
+            phone_number TEXT,
+            balance REAL NOT NULL DEFAULT 0.0,
+            created_at TIMESTAMP NOT NULL,
+            updated_at TIMESTAMP NOT NULL
+        )
+    ''')
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS transactions (
+            transaction_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            account_id INTEGER NOT NULL,
+            transaction_type TEXT NOT NULL,
+            amount REAL NOT NULL,
+            description TEXT,
+            transaction_date TIMESTAMP NOT NULL,
+            related_transaction_id INTEGER,
+            related_account_id INTEGER,
+            FOREIGN KEY (account_id) REFERENCES accounts(account_id) ON DELETE CASCADE,
+            FOREIGN KEY (related_transaction_id) REFERENCES transactions(transaction_id),
+            FOREIGN KEY (related_account_id) REFERENCES accounts(account_id)
+        )
+    ''')
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS loans (
+            loan_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            account_id INTEGER NOT NULL,
+            loan_amount REAL NOT NULL,
+            interest_rate REAL NOT NULL,
+            term_months INTEGER NOT NULL,
+            remaining_amount REAL NOT NULL,
+            status TEXT NOT NULL,
+            application_date TIMESTAMP NOT NULL,
+            start_date TIMESTAMP,
+            end_date TIMESTAMP,
+            last_payment_date TIMESTAMP,
+            FOREIGN KEY (account_id) REFERENCES accounts(account_id) ON DELETE CASCADE
+        )
+    ''')
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            user_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL,
+            email TEXT UNIQUE NOT NULL,
+            full_name TEXT NOT NULL,
+            user_type TEXT NOT NULL DEFAULT 'customer',
+            is_active BOOLEAN DEFAULT 1,
+            created_at TIMESTAMP NOT NULL,
+            last_login TIMESTAMP,
+            account_id INTEGER,
+            FOREIGN KEY (account_id) REFERENCES accounts(account_id) ON DELETE SET NULL
+        )
+    ''')
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS bugs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT NOT NULL,
+            description TEXT NOT NULL,
+            severity TEXT NOT NULL,
+            module TEXT,
+            steps_to_reproduce TEXT,
+            status TEXT NOT NULL DEFAULT 'open',
+            reported_date TIMESTAMP NOT NULL,
+            last_updated TIMESTAMP NOT NULL,
+            fixed_date TIMESTAMP,
+            closed_date TIMESTAMP,
+            comments TEXT
+        )
+    ''')
+
+
+def _related_account_column(conn):
+    """Add transactions.related_account_id to databases created before it existed"""
+    columns = [column[1] for column in conn.execute("PRAGMA table_info(transactions)")]
+
+    if 'related_account_id' not in columns:
+        conn.execute("ALTER TABLE transactions ADD COLUMN related_account_id INTEGER REFERENCES accounts(account_id)")
+
+
+def _secondary_indexes(conn):
+    """Index the transaction, loan and account query paths"""
+    # Ascending (account_id, transaction_date) also serves ORDER BY transaction_date DESC through a
+    # backward scan, with the rowid breaking ties in the same direction
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_transactions_account_date ON transactions (account_id, transaction_date)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_transactions_date ON transactions (transaction_date)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_transactions_type_date ON transactions (transaction_type, transaction_date)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_loans_account_application ON loans (account_id, application_date)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_loans_status_application ON loans (status, application_date)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_loans_application ON loans (application_date)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_accounts_created ON accounts (created_at)")
+
+
+def _rebuild_table(conn, table, create_sql, columns, select_columns):
+    """Recreate a table with a new definition, copying every row across"""
+    # Keep the AUTOINCREMENT high-water mark so deleted ids are never reused
+    sequence = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (table,)).fetchone()
+
+    conn.execute(create_sql.format(table=f"{table}_new"))
+    conn.execute(f"INSERT INTO {table}_new ({columns}) SELECT {select_columns} FROM {table}")
+    conn.execute(f"DROP TABLE {table}")
+    conn.execute(f"ALTER TABLE {table}_new RENAME TO {table}")
+
+    if sequence:
+        conn.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = ?", (sequence[0], table))
+
+
+def _integer_money_columns(conn):
+    """Store balances and amounts as integer cents instead of REAL"""
+    # A REAL column would coerce integers back to floats, so the tables are rebuilt
+    _rebuild_table(conn, 'accounts', '''
+        CREATE TABLE {table} (
+            account_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            account_number TEXT UNIQUE NOT NULL,
+            owner_name TEXT NOT NULL,
+            account_type TEXT NOT NULL,
+            email TEXT,
+            phone_number TEXT,
+            balance INTEGER NOT NULL DEFAULT 0,
+            created_at TIMESTAMP NOT NULL,
+            updated_at TIMESTAMP NOT NULL
+        )
+    ''',
+        "account_id, account_number, owner_name, account_type, email, phone_number, balance, created_at, updated_at",
+        "account_id, account_number, owner_name, account_type, email, phone_number, "
+        "CAST(ROUND(balance * 100) AS INTEGER), created_at, updated_at"
+    )
+
+    _rebuild_table(conn, 'transactions', '''
+        CREATE TABLE {table} (
+            transaction_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            account_id INTEGER NOT NULL,
+            transaction_type TEXT NOT NULL,
+            amount INTEGER NOT NULL,
+            description TEXT,
+            transaction_date TIMESTAMP NOT NULL,
+            related_transaction_id INTEGER,
+            related_account_id INTEGER,
+            FOREIGN KEY (account_id) REFERENCES accounts(account_id) ON DELETE CASCADE,
+            FOREIGN KEY (related_transaction_id) REFERENCES transactions(transaction_id),
+            FOREIGN KEY (related_account_id) REFERENCES accounts(account_id)
+        )
+    ''',
+        "transaction_id, account_id, transaction_type, amount, description, transaction_date, "
+        "related_transaction_id, related_account_id",
+        "transaction_id, account_id, transaction_type, CAST(ROUND(amount * 100) AS INTEGER), description, "
+        "transaction_date, related_transaction_id, related_account_id"
+    )
+
+    _rebuild_table(conn, 'loans', '''
+        CREATE TABLE {table} (
+            loan_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            account_id INTEGER NOT NULL,
+            loan_amount INTEGER NOT NULL,
+            interest_rate REAL NOT NULL,
+            term_months INTEGER NOT NULL,
+            remaining_amount INTEGER NOT NULL,
+            status TEXT NOT NULL,
+            application_date TIMESTAMP NOT NULL,
+            start_date TIMESTAMP,
+            end_date TIMESTAMP,
+            last_payment_date TIMESTAMP,
+            FOREIGN KEY (account_id) REFERENCES accounts(account_id) ON DELETE CASCADE
+        )
+    ''',
+        "loan_id, account_id, loan_amount, interest_rate, term_months, remaining_amount, status, "
+        "application_date, start_date, end_date, last_payment_date",
+        "loan_id, account_id, CAST(ROUND(loan_amount * 100) AS INTEGER), interest_rate, term_months, "
+        "CAST(ROUND(remaining_amount * 100) AS INTEGER), status, application_date, start_date, end_date, last_payment_date"
+    )
+
+    # Dropping the old tables dropped their indexes too
+    _secondary_indexes(conn)
+
+
+def _running_balances(conn):
+    """Store the balance after every ledger row and keep per-day balance snapshots"""
+    conn.execute("ALTER TABLE transactions ADD COLUMN balance_after INTEGER")
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS daily_balances (
+            account_id INTEGER NOT NULL,
+            balance_date DATE NOT NULL,
+            opening_balance INTEGER NOT NULL,
+            closing_balance INTEGER NOT NULL,
+            PRIMARY KEY (account_id, balance_date),
+            FOREIGN KEY (account_id) REFERENCES accounts(account_id) ON DELETE CASCADE
+        ) WITHOUT ROWID
+    ''')
+
+    signed_amount = "CASE WHEN transaction_type IN ('deposit', 'transfer_in', 'loan_disbursement') THEN amount ELSE -amount END"
+
+    # Opening balances were never recorded, so history is rebuilt backwards from the current
+    # balance: each row's balance_after is the balance minus every later movement
+    conn.execute(f'''
+        UPDATE transactions SET balance_after = history.balance_after
+        FROM (
+            SELECT t.transaction_id,
+                   a.balance - COALESCE(SUM({signed_amount}) OVER (
+                       PARTITION BY t.account_id
+                       ORDER BY t.transaction_date DESC, t.transaction_id DESC
+                       ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING
+                   ), 0) AS balance_after
+            FROM transactions t
+            JOIN accounts a ON a.account_id = t.account_id
+        ) AS history
+        WHERE history.transaction_id = transactions.transaction_id
+    ''')
+
+    conn.execute(f'''
+        INSERT OR REPLACE INTO daily_balances (account_id, balance_date, opening_balance, closing_balance)
+        SELECT account_id, balance_date,
+               MAX(CASE WHEN first_of_day = 1 THEN balance_after - signed_amount END),
+               MAX(CASE WHEN last_of_day = 1 THEN balance_after END)
+        FROM (
+            SELECT account_id, date(transaction_date) AS balance_date, balance_after,
+                   {signed_amount} AS signed_amount,
+                   ROW_NUMBER() OVER (
+                       PARTITION BY account_id, date(transaction_date) ORDER BY transaction_date, transaction_id
+                   ) AS first_of_day,
+                   ROW_NUMBER() OVER (
+                       PARTITION BY account_id, date(transaction_date) ORDER BY transaction_date DESC, transaction_id DESC
+                   ) AS last_of_day
+            FROM transactions
+        )
+        GROUP BY account_id, balance_date
+    ''')
+
+
+def _account_prefix_index(conn):
+    """Index owner names case-insensitively for typeahead prefix search"""
+    # LIKE is case-insensitive, so only a NOCASE index lets SQLite turn 'abc%' into a range seek
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_accounts_owner_name ON accounts (owner_name COLLATE NOCASE)")
+
+
+def _transaction_description_search(conn):
+    """Full-text index transaction descriptions with FTS5, kept in sync by triggers"""
+    # External content table: the index stores only tokens and reads text back from transactions
+    conn.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS transactions_fts USING fts5(
+            description,
+            content='transactions',
+            content_rowid='transaction_id'
+        )
+    ''')
+
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS transactions_fts_insert AFTER INSERT ON transactions BEGIN
+            INSERT INTO transactions_fts (rowid, description) VALUES (new.transaction_id, new.description);
+        END
+    ''')
+
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS transactions_fts_delete AFTER DELETE ON transactions BEGIN
+            INSERT INTO transactions_fts (transactions_fts, rowid, description)
+            VALUES ('delete', old.transaction_id, old.description);
+        END
+    ''')
+
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS transactions_fts_update AFTER UPDATE OF description ON transactions BEGIN
+            INSERT INTO transactions_fts (transactions_fts, rowid, description)
+            VALUES ('delete', old.transaction_id, old.description);
+            INSERT INTO transactions_fts (rowid, description) VALUES (new.transaction_id, new.description);
+        END
+    ''')
+
+    # Index the existing ledger
+    conn.execute("INSERT INTO transactions_fts (transactions_fts) VALUES ('rebuild')")
+
+
+def _transaction_loan_link(conn):
+    """Link loan disbursements and payments to their loan with transactions.loan_id"""
+    conn.execute("ALTER TABLE transactions ADD COLUMN loan_id INTEGER REFERENCES loans(loan_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_transactions_loan_date ON transactions (loan_id, transaction_date)")
+
+    # Earlier rows were typed deposit/withdrawal with the loan only named in the description.
+    # Only rows whose loan exists and belongs to the same account are relinked.
+    for prefix, old_type, new_type in (
+        ('Loan disbursement for loan #', 'deposit', 'loan_disbursement'),
+        ('Loan payment for loan #', 'withdrawal', 'loan_payment'),
+    ):
+        conn.execute('''
+            UPDATE transactions
+            SET loan_id = loans.loan_id, transaction_type = ?
+            FROM loans
+            WHERE transactions.transaction_type = ?
+              AND substr(transactions.description, 1, ?) = ?
+              AND loans.loan_id = CAST(substr(transactions.description, ?) AS INTEGER)
+              AND loans.account_id = transactions.account_id
+        ''', (new_type, old_type, len(prefix), prefix, len(prefix) + 1))
+
+
+def _loan_servicing(conn):
+    """Track interest accrual and autopay on loans, with checkpoints for the servicing job"""
+    conn.execute("ALTER TABLE loans ADD COLUMN last_accrual_date DATE")
+    conn.execute("ALTER TABLE loans ADD COLUMN autopay INTEGER NOT NULL DEFAULT 0")
+
+    # One row per business date and step, holding the last loan the step has finished
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS loan_servicing_checkpoints (
+            business_date DATE NOT NULL,
+            step TEXT NOT NULL,
+            last_loan_id INTEGER NOT NULL DEFAULT 0,
+            completed_at TIMESTAMP,
+            PRIMARY KEY (business_date, step)
+        ) WITHOUT ROWID
+    ''')
+
+
+def _sequences(conn):
+    """Add named sequences for allocating identifiers such as account numbers in blocks"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS sequences (
+            name TEXT PRIMARY KEY,
+            next_value INTEGER NOT NULL
+        ) WITHOUT ROWID
+    ''')
+
+
+def _transaction_rollups(conn):
+    """Keep per-account, per-day, per-type ledger aggregates for reporting"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS transaction_rollups (
+            account_id INTEGER NOT NULL,
+            rollup_date DATE NOT NULL,
+            transaction_type TEXT NOT NULL,
+            transaction_count INTEGER NOT NULL,
+            total INTEGER NOT NULL,
+            minimum INTEGER NOT NULL,
+            maximum INTEGER NOT NULL,
+            PRIMARY KEY (account_id, rollup_date, transaction_type),
+            FOREIGN KEY (account_id) REFERENCES accounts(account_id) ON DELETE CASCADE
+        ) WITHOUT ROWID
+    ''')
+    # Covers bank-wide date range reports, so they never leave the index
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_transaction_rollups_date
+        ON transaction_rollups (rollup_date, transaction_type, transaction_count, total, minimum, maximum)
+    ''')
+
+    conn.execute('''
+        INSERT OR REPLACE INTO transaction_rollups (
+            account_id, rollup_date, transaction_type, transaction_count, total, minimum, maximum
+        )
+        SELECT account_id, date(transaction_date), transaction_type,
+               COUNT(*), SUM(amount), MIN(amount), MAX(amount)
+        FROM transactions
+        GROUP BY account_id, date(transaction_date), transaction_type
+    ''')
+
+
+def _loan_status_id_index(conn):
+    """Index loans by status in primary key order for chunked walks over the active book"""
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_loans_status_id ON loans (status, loan_id)")
+
+
+# Ordered schema history as (version, description, migration). Released entries must never be
+# edited - append a new migration instead. Every migration must be safe to run on a database
+# that was created before the engine existed.
+MIGRATIONS = [
+    (1, 'baseline schema', _baseline_schema),
+    (2, 'transactions.related_account_id column', _related_account_column),
+    (3, 'secondary indexes', _secondary_indexes),
+    (4, 'integer cent money columns', _integer_money_columns),
+    (5, 'running balances and daily balance snapshots', _running_balances),
+    (6, 'account owner name prefix index', _account_prefix_index),
+    (7, 'transaction description full-text index', _transaction_description_search),
+    (8, 'transactions.loan_id link to loans', _transaction_loan_link),
+    (9, 'loan interest accrual, autopay and servicing checkpoints', _loan_servicing),
+    (10, 'sequences table for block allocation', _sequences),
+    (11, 'daily transaction rollups', _transaction_rollups),
+    (12, 'loans status and id index for servicing chunks', _loan_status_id_index),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+class SchemaMigrator:
+    """Bring a database up to the latest schema version"""
+
+    def __init__(self, db):
+        """Initialize with the database to migrate"""
+        self.db = db
+
+    def upgrade(self):
+        """
+        Apply every pending migration in a single pass
+
+        PRAGMA user_version mirrors the schema_version table, so an up-to-date
+        database is detected with one header read and no DDL at all. Otherwise
+        the migrations run under one write lock, with foreign keys disabled so
+        table rebuilds cannot cascade, and the version is re-checked after the
+        lock is taken in case another process already upgraded.
+
+        Returns the list of versions that were applied.
+        """
+        if self.db.in_transaction:
+            raise Exception("Schema migrations cannot run inside an open transaction")
+
+        with self.db.connection() as conn:
+            # Fast path: nothing to do
+            if conn.execute("PRAGMA user_version").fetchone()[0] == LATEST_VERSION:
+                return []
+
+            conn.execute("PRAGMA foreign_keys = OFF")
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    applied = self._apply_pending(conn)
+
+                    # Table rebuilds must not have left dangling references
+                    violations = conn.execute("PRAGMA foreign_key_check").fetchall()
+                    if violations:
+                        raise Exception(f"Foreign key violations after migration: {len(violations)}")
+
+                    conn.execute(f"PRAGMA user_version = {LATEST_VERSION}")
+                    conn.commit()
+                except Exception as e:
+                    conn.rollback()
+                    raise Exception(f"Database migration error: {e}")
+            finally:
+                conn.execute("PRAGMA foreign_keys = ON")
+
+        if applied:
+            logger.info("Database migrated to schema version %d (applied %s)",
+                        applied[-1], ", ".join(str(version) for version in applied))
+
+        return applied
+
+    def _apply_pending(self, conn):
+        """Run the migrations newer than the recorded version"""
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                description TEXT NOT NULL,
+                applied_at TIMESTAMP NOT NULL
+            )
+        ''')
+
+        current = conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0]
+
+        applied = []
+        for version, description, migration in MIGRATIONS:
+            if version <= current:
+                continue
+
+            migration(conn)
+            conn.execute(
+                "INSERT INTO schema_version (version, description, applied_at) VALUES (?, ?, ?)",
+                (version, description, datetime.datetime.now())
+            )
+            applied.append(version)
+
+        return applied
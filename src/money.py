@@ -0,0 +1,41 @@
+from decimal import Decimal, InvalidOperation, ROUND_HALF_EVEN
+
+
+# Amounts are stored as integer cents and exposed as Decimal with two places
+CENT = Decimal('0.01')
+
+
+def to_decimal(amount):
+    """Convert an amount (str, int, float or Decimal) to a Decimal rounded to cents"""
+    if isinstance(amount, Decimal):
+        value = amount
+    else:
+        try:
+            # repr() keeps floats like 0.1 from turning into 0.1000000000000000055...
+            value = Decimal(repr(amount) if isinstance(amount, float) else str(amount).strip())
+        except (InvalidOperation, ValueError):
+            raise ValueError(f"Invalid amount: {amount}")
+
+    if not value.is_finite():
+        raise ValueError(f"Invalid amount: {amount}")
+
+    return value.quantize(CENT, rounding=ROUND_HALF_EVEN)
+
+
+def to_cents(amount):
+    """Convert an amount to integer minor units for storage"""
+    return int(to_decimal(amount).scaleb(2))
+
+
+def from_cents(cents):
+    """Convert stored integer minor units to a Decimal amount"""
+    if cents is None:
+        return None
+    return Decimal(int(cents)).scaleb(-2).quantize(CENT)
+
+
+def average_from_cents(average_cents):
+    """Convert an AVG() over cent columns to a Decimal amount"""
+    if average_cents is None:
+        return None
+    return (Decimal(repr(average_cents)) / 100).quantize(CENT, rounding=ROUND_HALF_EVEN)
@@ -0,0 +1,39 @@
+import base64
+import datetime
+import json
+
+
+def encode_cursor(*values):
+    """Encode the sort key of the last row on a page as an opaque cursor"""
+    payload = json.dumps(list(values), separators=(',', ':'), default=str)
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, size):
+    """
+    Decode a cursor created by encode_cursor into a list of size values
+
+    Every cursor is an ISO timestamp sort key followed by an integer row id, and
+    anything else raises ValueError before it can reach a query.
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+    except (ValueError, TypeError, UnicodeDecodeError):
+        raise ValueError("Invalid pagination cursor")
+
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError("Invalid pagination cursor")
+
+    *timestamps, row_id = values
+    if isinstance(row_id, bool) or not isinstance(row_id, int):
+        raise ValueError("Invalid pagination cursor")
+    for timestamp in timestamps:
+        if not isinstance(timestamp, str):
+            raise ValueError("Invalid pagination cursor")
+        try:
+            datetime.datetime.fromisoformat(timestamp)
+        except ValueError:
+            raise ValueError("Invalid pagination cursor")
+
+    return values
@@ -0,0 +1,174 @@
+import base64
+import collections
+import hashlib
+import hmac
+import os
+import threading
+import time
+
+
+# Stored hashes are '$'-separated with the scheme first, so the format can change over time:
+#   scrypt$<n>$<r>$<p>$<salt>$<hash>
+#   pbkdf2_sha256$<iterations>$<salt>$<hash>
+# Hashes without a scheme are the original unsalted SHA-256 hex digests.
+SCHEMES = ('scrypt', 'pbkdf2_sha256')
+
+
+def _b64encode(data):
+    """Encode bytes as base64 text"""
+    return base64.b64encode(data).decode('ascii')
+
+
+def _b64decode(text):
+    """Decode base64 text to bytes"""
+    return base64.b64decode(text.encode('ascii'))
+
+
+class PasswordHasher:
+    """Salted KDF password hashing with a verification cache"""
+
+    def __init__(self, scheme='scrypt', scrypt_n=2 ** 14, scrypt_r=8, scrypt_p=1, pbkdf2_iterations=600000,
+                 cache_ttl=300, cache_size=1024):
+        """
+        Initialize the hasher
+
+        Parameters:
+        - scheme: 'scrypt' or 'pbkdf2_sha256', used for new hashes
+        - scrypt_n, scrypt_r, scrypt_p, pbkdf2_iterations: Cost of new hashes; older
+          hashes keep verifying and are flagged by needs_rehash
+        - cache_ttl: Seconds a successful verification is remembered (0 disables)
+        - cache_size: Most remembered verifications
+
+        Every KDF runs on the calling thread. hashlib releases the GIL while it works,
+        so threaded workers check passwords in parallel; login throughput is set by
+        the cost parameters and the cache, not by a separate pool.
+        """
+        if scheme not in SCHEMES:
+            raise ValueError(f"Invalid password scheme. Must be one of: {', '.join(SCHEMES)}")
+
+        self.scheme = scheme
+        self.scrypt_params = (scrypt_n, scrypt_r, scrypt_p)
+        self.pbkdf2_iterations = pbkdf2_iterations
+        self.cache_ttl = cache_ttl
+        self.cache_size = cache_size
+
+        # Cache keys are keyed HMACs, so neither passwords nor a fast offline oracle are kept
+        self._cache_key = os.urandom(32)
+        self._cache = collections.OrderedDict()
+        self._cache_lock = threading.Lock()
+
+        self._dummy_hash = None
+
+    def hash(self, password):
+        """Hash a password with a fresh salt using the configured scheme and cost"""
+        salt = os.urandom(16)
+        if self.scheme == 'scrypt':
+            n, r, p = self.scrypt_params
+            derived = self._scrypt(password, salt, n, r, p)
+            return f"scrypt${n}${r}${p}${_b64encode(salt)}${_b64encode(derived)}"
+
+        derived = hashlib.pbkdf2_hmac('sha256', password.encode(), salt, self.pbkdf2_iterations)
+        return f"pbkdf2_sha256${self.pbkdf2_iterations}${_b64encode(salt)}${_b64encode(derived)}"
+
+    def verify(self, password, password_hash):
+        """
+        Check a password against a stored hash of any supported version
+
+        Recent successful checks are answered from the cache without running the KDF.
+        """
+        if not password_hash:
+            return False
+
+        cache_key = self._cache_entry_key(password, password_hash)
+        if self._cache_hit(cache_key):
+            return True
+
+        matched = self._verify(password, password_hash)
+        if matched:
+            self._cache_store(cache_key)
+        return matched
+
+    def burn(self, password):
+        """Spend the same time as a real check, so unknown usernames cannot be told apart"""
+        self._verify(password, self._get_dummy_hash())
+        return False
+
+    def needs_rehash(self, password_hash):
+        """Return True if a stored hash uses an older scheme or cost than the current settings"""
+        parts = password_hash.split('$')
+        if parts[0] != self.scheme:
+            return True
+        if self.scheme == 'scrypt':
+            return tuple(int(value) for value in parts[1:4]) != self.scrypt_params
+        return int(parts[1]) != self.pbkdf2_iterations
+
+    def clear_cache(self):
+        """Forget every remembered verification"""
+        with self._cache_lock:
+            self._cache.clear()
+
+    def _verify(self, password, password_hash):
+        """Recompute the hash with the stored parameters and compare in constant time"""
+        parts = password_hash.split('$')
+        try:
+            if parts[0] == 'scrypt' and len(parts) == 6:
+                n, r, p = (int(value) for value in parts[1:4])
+                expected = _b64decode(parts[5])
+                derived = self._scrypt(password, _b64decode(parts[4]), n, r, p, len(expected))
+            elif parts[0] == 'pbkdf2_sha256' and len(parts) == 4:
+                expected = _b64decode(parts[3])
+                derived = hashlib.pbkdf2_hmac('sha256', password.encode(), _b64decode(parts[2]), int(parts[1]),
+                                              len(expected))
+            elif len(parts) == 1:
+                # Legacy unsalted SHA-256 hex digest; the dummy KDF keeps it as slow as a real hash,
+                # so users who have not logged in since the upgrade cannot be picked out by timing
+                self._verify(password, self._get_dummy_hash())
+                expected = password_hash.encode()
+                derived = hashlib.sha256(password.encode()).hexdigest().encode()
+            else:
+                return False
+        except ValueError:
+            return False
+
+        return hmac.compare_digest(derived, expected)
+
+    def _scrypt(self, password, salt, n, r, p, dklen=64):
+        """Derive an scrypt key"""
+        # OpenSSL's default memory cap is 32MB, allow what the parameters need plus headroom
+        return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, dklen=dklen,
+                              maxmem=256 * n * r * p + 2 ** 20)
+
+    def _get_dummy_hash(self):
+        """Hash a random password at the current cost on first use, for checks that must not be fast"""
+        if self._dummy_hash is None:
+            self._dummy_hash = self.hash(os.urandom(16).hex())
+        return self._dummy_hash
+
+    def _cache_entry_key(self, password, password_hash):
+        """Key a password and hash pair for the verification cache"""
+        message = password_hash.encode() + b'\0' + password.encode()
+        return hmac.new(self._cache_key, message, hashlib.sha256).digest()
+
+    def _cache_hit(self, key):
+        """Return True if the key was verified within the last cache_ttl seconds"""
+        if self.cache_ttl <= 0:
+            return False
+        with self._cache_lock:
+            expires = self._cache.get(key)
+            if expires is None:
+                return False
+            if expires <= time.monotonic():
+                del self._cache[key]
+                return False
+            self._cache.move_to_end(key)
+            return True
+
+    def _cache_store(self, key):
+        """Remember a successful verification, evicting the least recently used"""
+        if self.cache_ttl <= 0:
+            return
+        with self._cache_lock:
+            self._cache[key] = time.monotonic() + self.cache_ttl
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
@@ -0,0 +1,227 @@
+import datetime
+import threading
+from src.database import Database
+from src.money import to_decimal, from_cents
+from src.dates import as_date
+from src.amortization import iter_schedules
+from src.loan import LoanManager
+
+
+# Term buckets used for exposure reporting as (longest term in months, label)
+TERM_BUCKETS = ((12, '0-12'), (36, '13-36'), (60, '37-60'), (None, '61+'))
+
+# Days-past-due buckets used for the delinquency summary
+DELINQUENCY_BUCKETS = ((30, '1-30'), (60, '31-60'), (90, '61-90'), (None, '90+'))
+
+
+class LoanPortfolio:
+    """Portfolio-level loan analytics computed in SQL and cached until the loan book changes"""
+
+    def __init__(self, db=None, chunk_size=10000):
+        """
+        Initialize with database connection
+
+        Parameters:
+        - chunk_size: Number of loans projected at a time for cash flow forecasts
+        """
+        self.db = db if db else Database()
+        self.chunk_size = chunk_size
+        self.loan_manager = LoanManager(self.db)
+        self._cache = {}
+        self._cache_date = None
+        self._cache_version = None
+        self._lock = threading.Lock()
+
+    def get_exposure(self):
+        """
+        Get outstanding exposure grouped by loan status and term bucket
+
+        Returns:
+        - List of dicts with status, term_bucket, loan_count, principal and outstanding
+        """
+        return self._cached(('exposure',), self._compute_exposure)
+
+    def get_delinquent_loans(self, as_of=None, grace_days=0):
+        """
+        Find active loans whose next monthly payment is overdue
+
+        A payment is due one month after the last payment, or after the start date
+        if nothing has been paid yet. Loans are delinquent once that date plus
+        grace_days has passed.
+
+        Returns:
+        - List of dicts with loan_id, account_id, outstanding, due_date, days_past_due
+          and missed_payments, most overdue first
+        """
+        as_of = as_date(as_of, datetime.date.today())
+        return self._cached(('delinquent', as_of, grace_days), lambda: self._compute_delinquent(as_of, grace_days))
+
+    def get_delinquency_summary(self, as_of=None, grace_days=0):
+        """Get the count and outstanding amount of delinquent loans per days-past-due bucket"""
+        buckets = {label: {'bucket': label, 'loan_count': 0, 'outstanding': from_cents(0)}
+                   for _, label in DELINQUENCY_BUCKETS}
+
+        for loan in self.get_delinquent_loans(as_of, grace_days):
+            label = next(label for limit, label in DELINQUENCY_BUCKETS
+                         if limit is None or loan['days_past_due'] <= limit)
+            buckets[label]['loan_count'] += 1
+            buckets[label]['outstanding'] += loan['outstanding']
+
+        return list(buckets.values())
+
+    def get_projected_cash_flow(self, months=12, as_of=None):
+        """
+        Project the monthly payments expected from active loans
+
+        Each loan's remaining amount is amortized over the months left in its term,
+        chunk by chunk, and the payments are totalled per calendar month.
+
+        Returns:
+        - List of dicts with month ('YYYY-MM'), expected_inflow, interest and principal
+        """
+        if months <= 0:
+            raise ValueError("Projection must cover at least one month")
+
+        as_of = as_date(as_of, datetime.date.today())
+        return self._cached(('cash_flow', as_of, months), lambda: self._compute_cash_flow(as_of, months))
+
+    def invalidate(self):
+        """Drop every cached result"""
+        with self._lock:
+            self._cache = {}
+
+    def _cached(self, key, compute):
+        """Return a cached result, computing it on first use after any loan write or a new day"""
+        today = datetime.date.today()
+        # One primary key lookup; loan writes anywhere bump the version in their own transaction
+        version = self.loan_manager.get_loan_book_version()
+        with self._lock:
+            if self._cache_date != today or self._cache_version != version:
+                self._cache = {}
+                self._cache_date = today
+                self._cache_version = version
+
+            if key not in self._cache:
+                self._cache[key] = compute()
+
+            return self._cache[key]
+
+    def _compute_exposure(self):
+        """Aggregate loan amounts by status and term bucket in one query"""
+        bucket_sql = "CASE"
+        for limit, label in TERM_BUCKETS:
+            if limit is None:
+                bucket_sql += f" ELSE '{label}' END"
+            else:
+                bucket_sql += f" WHEN term_months <= {limit} THEN '{label}'"
+
+        query = f"""
+            SELECT
+                status,
+                {bucket_sql} AS term_bucket,
+                COUNT(*) AS loan_count,
+                SUM(loan_amount) AS principal,
+                SUM(remaining_amount) AS outstanding
+            FROM loans
+            GROUP BY status, term_bucket
+            ORDER BY status, MIN(term_months)
+        """
+        rows = self.db.execute_query(query, fetch_mode='all')
+
+        exposure = []
+        for row in rows or []:
+            item = dict(row)
+            item['principal'] = from_cents(item['principal'])
+            item['outstanding'] = from_cents(item['outstanding'])
+            exposure.append(item)
+
+        return exposure
+
+    def _compute_delinquent(self, as_of, grace_days):
+        """Select overdue active loans, served by the status index"""
+        query = """
+            SELECT loan_id, account_id, remaining_amount, start_date, last_payment_date,
+                   date(COALESCE(last_payment_date, start_date), '+1 month') AS due_date
+            FROM loans
+            WHERE status = 'active'
+              AND date(COALESCE(last_payment_date, start_date), '+1 month', ?) < ?
+            ORDER BY due_date, loan_id
+        """
+        rows = self.db.execute_query(query, (f"+{int(grace_days)} days", as_of.isoformat()), 'all')
+
+        delinquent = []
+        for row in rows or []:
+            due_date = datetime.date.fromisoformat(row['due_date'])
+            delinquent.append({
+                'loan_id': row['loan_id'],
+                'account_id': row['account_id'],
+                'outstanding': from_cents(row['remaining_amount']),
+                'due_date': row['due_date'],
+                'days_past_due': (as_of - due_date).days,
+                'missed_payments': self._months_between(due_date, as_of) + 1
+            })
+
+        return delinquent
+
+    def _compute_cash_flow(self, as_of, months):
+        """Amortize active loans chunk by chunk and total their payments per month"""
+        totals = {column: [0.0] * months for column in ('payment', 'interest', 'principal')}
+
+        loans = self._iter_active_loans(as_of)
+        for schedule in iter_schedules(loans, chunk_size=self.chunk_size, principal_field='remaining_amount'):
+            for column, running in totals.items():
+                for i, value in enumerate(schedule.totals_by_period(column, months)):
+                    running[i] += value
+
+        cash_flow = []
+        for i in range(months):
+            month = self._add_months(as_of, i + 1)
+            cash_flow.append({
+                'month': month.strftime('%Y-%m'),
+                'expected_inflow': to_decimal(totals['payment'][i]),
+                'interest': to_decimal(totals['interest'][i]),
+                'principal': to_decimal(totals['principal'][i])
+            })
+
+        return cash_flow
+
+    def _iter_active_loans(self, as_of):
+        """Stream active loans in primary key order with the months left in their term"""
+        last_id = 0
+        while True:
+            query = """
+                SELECT loan_id, remaining_amount, interest_rate, term_months, start_date
+                FROM loans
+                WHERE status = 'active' AND remaining_amount > 0 AND loan_id > ?
+                ORDER BY loan_id
+                LIMIT ?
+            """
+            rows = self.db.execute_query(query, (last_id, self.chunk_size), 'all')
+            if not rows:
+                return
+
+            for row in rows:
+                elapsed = 0
+                if row['start_date']:
+                    elapsed = self._months_between(datetime.date.fromisoformat(row['start_date'][:10]), as_of)
+
+                yield {
+                    'loan_id': row['loan_id'],
+                    'remaining_amount': from_cents(row['remaining_amount']),
+                    'interest_rate': row['interest_rate'],
+                    'term_months': max(row['term_months'] - elapsed, 1)
+                }
+
+            last_id = rows[-1]['loan_id']
+
+    def _months_between(self, start, end):
+        """Count the whole months from start to end (0 if end is earlier)"""
+        months = (end.year - start.year) * 12 + end.month - start.month
+        if end.day < start.day:
+            months -= 1
+        return max(months, 0)
+
+    def _add_months(self, day, months):
+        """Move a date forward by whole months, landing on the first of the month"""
+        index = day.year * 12 + day.month - 1 + months
+        return datetime.date(index // 12, index % 12 + 1, 1)
@@ -0,0 +1,208 @@
+import datetime
+import sys
+from src.database import Database
+from src.transaction import TransactionManager
+from src.loan import LoanManager
+from src.money import to_cents, from_cents
+from src.dates import as_date
+from src.amortization import monthly_payment
+
+
+# Servicing steps in the order they run for a business date
+SERVICING_STEPS = ('accrue', 'autopay', 'default')
+
+
+class LoanServicingJob:
+    """Daily batch job that accrues interest, collects autopay and flags defaults"""
+
+    def __init__(self, db=None, chunk_size=1000, default_after_days=90):
+        """
+        Initialize with database connection
+
+        Parameters:
+        - chunk_size: Number of loans processed per database transaction
+        - default_after_days: Days a payment may be overdue before the loan is defaulted
+        """
+        if chunk_size <= 0:
+            raise ValueError("Chunk size must be positive")
+
+        self.db = db if db else Database()
+        self.chunk_size = chunk_size
+        self.default_after_days = default_after_days
+        self.transaction_manager = TransactionManager(self.db)
+        self.loan_manager = LoanManager(self.db)
+
+    def run(self, business_date=None):
+        """
+        Service every active loan for a business date
+
+        Each step walks active loans in loan_id order, one chunk per transaction,
+        and saves its position in loan_servicing_checkpoints in the same
+        transaction. An interrupted run resumes after the last committed chunk,
+        and re-running a finished date does nothing.
+
+        Returns:
+        - Counts of the work done by this run: accrued, collected, collected_amount,
+          autopay_failed (loan ids with insufficient funds) and defaulted
+        """
+        business_date = as_date(business_date, datetime.date.today())
+        summary = {
+            'business_date': business_date.isoformat(),
+            'accrued': 0,
+            'collected': 0,
+            'collected_amount': from_cents(0),
+            'autopay_failed': [],
+            'defaulted': 0
+        }
+
+        handlers = {'accrue': self._accrue_chunk, 'autopay': self._autopay_chunk, 'default': self._default_chunk}
+        for step in SERVICING_STEPS:
+            while self._run_chunk(business_date, step, handlers[step], summary):
+                pass
+
+        return summary
+
+    def get_checkpoints(self, business_date):
+        """Get the saved progress of every step for a business date"""
+        query = "SELECT * FROM loan_servicing_checkpoints WHERE business_date = ? ORDER BY step"
+        rows = self.db.execute_query(query, (as_date(business_date, datetime.date.today()).isoformat(),), 'all')
+        return [dict(row) for row in rows] if rows else []
+
+    def _run_chunk(self, business_date, step, handler, summary):
+        """Process the next chunk of a step; returns False once the step is complete"""
+        day = business_date.isoformat()
+        with self.db.transaction() as conn:
+            # Reading the checkpoint under the write lock keeps concurrent runs from overlapping
+            checkpoint = conn.execute(
+                "SELECT last_loan_id, completed_at FROM loan_servicing_checkpoints WHERE business_date = ? AND step = ?",
+                (day, step)
+            ).fetchone()
+            if checkpoint and checkpoint['completed_at']:
+                return False
+
+            last_loan_id = checkpoint['last_loan_id'] if checkpoint else 0
+            rows = conn.execute(
+                "SELECT loan_id FROM loans WHERE status = 'active' AND loan_id > ? ORDER BY loan_id LIMIT ?",
+                (last_loan_id, self.chunk_size)
+            ).fetchall()
+
+            completed_at = None
+            if rows:
+                handler(conn, business_date, last_loan_id, rows[-1]['loan_id'], summary)
+                last_loan_id = rows[-1]['loan_id']
+                self.loan_manager.mark_loan_book_changed()
+            else:
+                completed_at = self.db.get_current_timestamp()
+
+            conn.execute("""
+                INSERT INTO loan_servicing_checkpoints (business_date, step, last_loan_id, completed_at)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT (business_date, step) DO UPDATE
+                SET last_loan_id = excluded.last_loan_id, completed_at = excluded.completed_at
+            """, (day, step, last_loan_id, completed_at))
+
+        return completed_at is None
+
+    def _accrue_chunk(self, conn, business_date, first_after, last_loan_id, summary):
+        """Add simple daily interest since the last accrual to each loan in the chunk"""
+        # last_accrual_date moves to the business date, so a re-run accrues nothing
+        cursor = conn.execute("""
+            UPDATE loans
+            SET remaining_amount = remaining_amount + CAST(ROUND(
+                    remaining_amount * interest_rate / 36500.0
+                    * (julianday(?) - julianday(COALESCE(last_accrual_date, date(start_date))))
+                ) AS INTEGER),
+                last_accrual_date = ?
+            WHERE loan_id > ? AND loan_id <= ?
+              AND status = 'active'
+              AND COALESCE(last_accrual_date, date(start_date)) < ?
+        """, (business_date.isoformat(), business_date.isoformat(), first_after, last_loan_id, business_date.isoformat()))
+        summary['accrued'] += cursor.rowcount
+
+    def _autopay_chunk(self, conn, business_date, first_after, last_loan_id, summary):
+        """Debit the scheduled payment from the linked account of every autopay loan that is due"""
+        due = conn.execute("""
+            SELECT l.loan_id, l.account_id, l.loan_amount, l.interest_rate, l.term_months,
+                   l.remaining_amount, a.balance,
+                   date(COALESCE(l.last_payment_date, l.start_date), '+1 month') AS due_date
+            FROM loans l
+            JOIN accounts a ON a.account_id = l.account_id
+            WHERE l.loan_id > ? AND l.loan_id <= ?
+              AND l.status = 'active' AND l.autopay = 1
+              AND date(COALESCE(l.last_payment_date, l.start_date), '+1 month') <= ?
+            ORDER BY l.loan_id
+        """, (first_after, last_loan_id, business_date.isoformat())).fetchall()
+        if not due:
+            return
+
+        balances = {row['account_id']: row['balance'] for row in due}
+        ledger_rows = []
+        loan_updates = []
+
+        # Payments are posted when they are collected: balance_after is the balance now, so a
+        # back-dated run must not slot rows in before later ledger entries. The loan schedule
+        # still advances by due date below.
+        posted_at = self.db.get_current_timestamp()
+
+        for row in due:
+            installment = to_cents(monthly_payment(from_cents(row['loan_amount']), row['interest_rate'], row['term_months']))
+            cents = min(installment, row['remaining_amount'])
+            if balances[row['account_id']] < cents:
+                summary['autopay_failed'].append(row['loan_id'])
+                continue
+
+            balances[row['account_id']] -= cents
+            remaining = row['remaining_amount'] - cents
+            ledger_rows.append((
+                row['account_id'], 'loan_payment', cents, f"Loan payment for loan #{row['loan_id']}",
+                posted_at, balances[row['account_id']], row['loan_id']
+            ))
+            # The payment covers its due date, so the schedule does not drift when the job runs late
+            loan_updates.append((remaining, f"{row['due_date']} 00:00:00", remaining, row['loan_id']))
+
+            summary['collected'] += 1
+            summary['collected_amount'] += from_cents(cents)
+
+        if not ledger_rows:
+            return
+
+        now = self.db.get_current_timestamp()
+        touched = {row[0] for row in ledger_rows}
+        conn.executemany(
+            "UPDATE accounts SET balance = ?, updated_at = ? WHERE account_id = ?",
+            [(balances[account_id], now, account_id) for account_id in touched]
+        )
+        self.transaction_manager.account_manager.invalidate_cached_accounts(touched)
+        conn.executemany("""
+            INSERT INTO transactions (
+                account_id, transaction_type, amount, description,
+                transaction_date, balance_after, loan_id
+            )
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, ledger_rows)
+        self.transaction_manager.record_ledger_aggregates(conn, [
+            (row[0], row[1], row[2], row[4], row[5]) for row in ledger_rows
+        ])
+        conn.executemany("""
+            UPDATE loans
+            SET remaining_amount = ?, last_payment_date = ?,
+                status = CASE WHEN ? <= 0 THEN 'paid' ELSE status END
+            WHERE loan_id = ?
+        """, loan_updates)
+
+    def _default_chunk(self, conn, business_date, first_after, last_loan_id, summary):
+        """Mark loans defaulted once their payment is overdue by more than default_after_days"""
+        cursor = conn.execute("""
+            UPDATE loans
+            SET status = 'defaulted'
+            WHERE loan_id > ? AND loan_id <= ?
+              AND status = 'active'
+              AND date(COALESCE(last_payment_date, start_date), '+1 month', ?) < ?
+        """, (first_after, last_loan_id, f"+{int(self.default_after_days)} days", business_date.isoformat()))
+        summary['defaulted'] += cursor.rowcount
+
+
+if __name__ == '__main__':
+    # Run from the project root, e.g. "python -m src.servicing 2026-05-01"
+    result = LoanServicingJob().run(sys.argv[1] if len(sys.argv) > 1 else None)
+    print(result)
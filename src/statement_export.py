@@ -0,0 +1,196 @@
+import csv
+import datetime
+import io
+import json
+from src.database import Database
+from src.money import from_cents
+from src.dates import as_date
+
+# Parquet output is optional and only available when pyarrow is installed
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    HAS_PYARROW = True
+except ImportError:
+    pa = None
+    pq = None
+    HAS_PYARROW = False
+
+
+# Columns written for every ledger row, in file order
+EXPORT_COLUMNS = (
+    'transaction_id', 'account_id', 'transaction_date', 'transaction_type', 'amount',
+    'balance_after', 'description', 'related_account_id', 'loan_id'
+)
+
+EXPORT_FORMATS = ('csv', 'jsonl', 'parquet')
+
+
+class StatementExporter:
+    """Stream ledger rows for an account or a date range to CSV, JSONL or Parquet"""
+
+    def __init__(self, db=None, batch_size=1000):
+        """
+        Initialize with database connection
+
+        Parameters:
+        - batch_size: Rows read per query; memory use is bounded by it, not by the export size
+        """
+        if batch_size <= 0:
+            raise ValueError("Batch size must be positive")
+
+        self.db = db if db else Database()
+        self.batch_size = batch_size
+
+    def iter_batches(self, account_id=None, start_date=None, end_date=None):
+        """
+        Yield lists of ledger rows, oldest first
+
+        Each batch is its own keyset query on (transaction_date, transaction_id), so
+        no connection or read snapshot is held while the caller consumes a batch.
+        Arguments are checked immediately, before the first batch is requested.
+
+        Parameters:
+        - account_id: Only export this account
+        - start_date, end_date: First and last day to export (inclusive), as dates or 'YYYY-MM-DD'
+        """
+        query = f"SELECT {', '.join(EXPORT_COLUMNS)} FROM transactions WHERE 1=1"
+        params = []
+
+        if account_id is not None:
+            query += " AND account_id = ?"
+            params.append(account_id)
+
+        if start_date:
+            query += " AND transaction_date >= ?"
+            params.append(as_date(start_date).isoformat())
+
+        if end_date:
+            query += " AND transaction_date < ?"
+            params.append((as_date(end_date) + datetime.timedelta(days=1)).isoformat())
+
+        return self._fetch_batches(query, params)
+
+    def _fetch_batches(self, query, params):
+        """Run a filtered export query one keyset batch at a time"""
+        last = None
+        while True:
+            batch_query, batch_params = query, list(params)
+            if last:
+                batch_query += " AND (transaction_date, transaction_id) > (?, ?)"
+                batch_params.extend(last)
+            batch_query += " ORDER BY transaction_date, transaction_id LIMIT ?"
+            batch_params.append(self.batch_size)
+
+            rows = self.db.execute_query(batch_query, tuple(batch_params), 'all')
+            if not rows:
+                return
+
+            batch = []
+            for row in rows:
+                record = dict(row)
+                record['amount'] = from_cents(record['amount'])
+                record['balance_after'] = from_cents(record['balance_after'])
+                batch.append(record)
+            yield batch
+
+            if len(rows) < self.batch_size:
+                return
+            last = (rows[-1]['transaction_date'], rows[-1]['transaction_id'])
+
+    def iter_csv(self, account_id=None, start_date=None, end_date=None):
+        """Return a generator of CSV text, the header and then one chunk per batch"""
+        return self._csv_chunks(self.iter_batches(account_id, start_date, end_date))
+
+    def iter_jsonl(self, account_id=None, start_date=None, end_date=None):
+        """Return a generator of JSON Lines text, one chunk per batch"""
+        return (self._jsonl_text(batch) for batch in self.iter_batches(account_id, start_date, end_date))
+
+    def export(self, destination, file_format='csv', account_id=None, start_date=None, end_date=None):
+        """
+        Write an export to a path or an open file
+
+        Parquet needs pyarrow and a path or binary file; each batch becomes a row group.
+
+        Returns:
+        - The number of ledger rows written
+        """
+        if file_format not in EXPORT_FORMATS:
+            raise ValueError(f"Invalid export format. Must be one of: {', '.join(EXPORT_FORMATS)}")
+
+        if file_format == 'parquet':
+            return self._export_parquet(destination, account_id, start_date, end_date)
+
+        owns_file = isinstance(destination, str) or hasattr(destination, '__fspath__')
+        stream = open(destination, 'w', newline='', encoding='utf-8') if owns_file else destination
+
+        count = 0
+        try:
+            batches = self.iter_batches(account_id, start_date, end_date)
+            if file_format == 'csv':
+                writer = csv.writer(stream)
+                writer.writerow(EXPORT_COLUMNS)
+                for batch in batches:
+                    writer.writerows(self._csv_rows(batch))
+                    count += len(batch)
+            else:
+                for batch in batches:
+                    stream.write(self._jsonl_text(batch))
+                    count += len(batch)
+        finally:
+            if owns_file:
+                stream.close()
+
+        return count
+
+    def _export_parquet(self, destination, account_id, start_date, end_date):
+        """Write batches as Parquet row groups"""
+        if not HAS_PYARROW:
+            raise ValueError("Parquet export requires pyarrow")
+
+        schema = pa.schema([
+            ('transaction_id', pa.int64()),
+            ('account_id', pa.int64()),
+            ('transaction_date', pa.string()),
+            ('transaction_type', pa.string()),
+            ('amount', pa.decimal128(18, 2)),
+            ('balance_after', pa.decimal128(18, 2)),
+            ('description', pa.string()),
+            ('related_account_id', pa.int64()),
+            ('loan_id', pa.int64()),
+        ])
+
+        count = 0
+        with pq.ParquetWriter(destination, schema) as writer:
+            for batch in self.iter_batches(account_id, start_date, end_date):
+                columns = {column: [record[column] for record in batch] for column in EXPORT_COLUMNS}
+                writer.write_table(pa.table(columns, schema=schema))
+                count += len(batch)
+        return count
+
+    def _csv_chunks(self, batches):
+        """Yield the CSV header, then the rows of each batch as text"""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+
+        writer.writerow(EXPORT_COLUMNS)
+        yield self._drain(buffer)
+
+        for batch in batches:
+            writer.writerows(self._csv_rows(batch))
+            yield self._drain(buffer)
+
+    def _csv_rows(self, batch):
+        """Order each record's values as EXPORT_COLUMNS"""
+        return ([record[column] for column in EXPORT_COLUMNS] for record in batch)
+
+    def _jsonl_text(self, batch):
+        """Serialise a batch as JSON Lines, with amounts as strings so no precision is lost"""
+        return ''.join(json.dumps(record, default=str) + '\n' for record in batch)
+
+    def _drain(self, buffer):
+        """Return and clear the text written to a buffer"""
+        text = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return text
@@ -1,5 +1,14 @@
 ﻿from src.database import Database
 from src.account import AccountManager
+from src.money import to_decimal, to_cents, from_cents, average_from_cents
+from src.pagination import encode_cursor, decode_cursor
+from src.dates import as_date
+import datetime
+import re
+
+
+# Transaction types that add to the account balance; every other type takes money out
+CREDIT_TYPES = ("deposit", "transfer_in", "loan_disbursement")
 
 
 class TransactionManager:
@@ -10,31 +19,35 @@ class TransactionManager:
         self.db = db if db else Database()
         self.account_manager = AccountManager(self.db)
     
+    def _transaction_from_row(self, row):
+        """Convert a transactions row to a dict with a Decimal amount"""
+        transaction = dict(row)
+        transaction['amount'] = from_cents(transaction['amount'])
+        transaction['balance_after'] = from_cents(transaction.get('balance_after'))
+        return transaction
+    
     def deposit(self, account_id, amount, description=None):
         """Make a deposit to an account"""
         # Validate input
+        amount = to_decimal(amount)
         if amount <= 0:
             raise ValueError("Deposit amount must be positive")
         
-        # Get account
-        account = self.account_manager.get_account(account_id)
-        if not account:
-            raise ValueError(f"Account with ID {account_id} not found")
-        
-        # Update account balance
-        new_balance = account["balance"] + amount
-        self.account_manager.update_balance(account_id, new_balance)
-        
-        # Record transaction
-        transaction_data = {
-            "account_id": account_id,
-            "transaction_type": "deposit",
-            "amount": amount,
-            "description": description or "Deposit",
-            "related_account_id": None
-        }
-        
-        transaction_id = self.record_transaction(**transaction_data)
+        with self.db.transaction():
+            # Update account balance
+            new_balance = self.account_manager.apply_balance_delta(account_id, amount)
+            
+            # Record transaction
+            transaction_data = {
+                "account_id": account_id,
+                "transaction_type": "deposit",
+                "amount": amount,
+                "description": description or "Deposit",
+                "related_account_id": None,
+                "balance_after": new_balance
+            }
+            
+            transaction_id = self.record_transaction(**transaction_data)
         
         return {
             "transaction_id": transaction_id,
@@ -49,32 +62,27 @@ class TransactionManager:
     def withdraw(self, account_id, amount, description=None):
         """Make a withdrawal from an account"""
         # Validate input
+        amount = to_decimal(amount)
         if amount <= 0:
             raise ValueError("Withdrawal amount must be positive")
         
-        # Get account
-        account = self.account_manager.get_account(account_id)
-        if not account:
-            raise ValueError(f"Account with ID {account_id} not found")
-        
-        # Check sufficient balance
-        if account["balance"] < amount:
-            raise ValueError("Insufficient funds for withdrawal")
-        
-        # Update account balance
-        new_balance = account["balance"] - amount
-        self.account_manager.update_balance(account_id, new_balance)
-        
-        # Record transaction
-        transaction_data = {
-            "account_id": account_id,
-            "transaction_type": "withdrawal",
-            "amount": amount,
-            "description": description or "Withdrawal",
-            "related_account_id": None
-        }
-        
-        transaction_id = self.record_transaction(**transaction_data)
+        with self.db.transaction():
+            # Update account balance, refusing to go below zero
+            new_balance = self.account_manager.apply_balance_delta(account_id, -amount)
+            if new_balance is None:
+                raise ValueError("Insufficient funds for withdrawal")
+            
+            # Record transaction
+            transaction_data = {
+                "account_id": account_id,
+                "transaction_type": "withdrawal",
+                "amount": amount,
+                "description": description or "Withdrawal",
+                "related_account_id": None,
+                "balance_after": new_balance
+            }
+            
+            transaction_id = self.record_transaction(**transaction_data)
         
         return {
             "transaction_id": transaction_id,
@@ -89,110 +97,374 @@ class TransactionManager:
     def transfer(self, from_account_id, to_account_id, amount, description=None):
         """Transfer funds between accounts"""
         # Validate input
+        amount = to_decimal(amount)
         if amount <= 0:
             raise ValueError("Transfer amount must be positive")
         
         if from_account_id == to_account_id:
             raise ValueError("Cannot transfer to the same account")
         
-        # Get accounts
-        from_account = self.account_manager.get_account(from_account_id)
-        if not from_account:
-            raise ValueError(f"Source account with ID {from_account_id} not found")
+        # Use a single unit of work so both legs commit or roll back together
+        try:
+            with self.db.transaction():
+                # Update source account balance, refusing to go below zero
+                new_from_balance = self.account_manager.apply_balance_delta(from_account_id, -amount)
+                if new_from_balance is None:
+                    raise ValueError("Insufficient funds for transfer")
+                
+                # Update destination account balance
+                new_to_balance = self.account_manager.apply_balance_delta(to_account_id, amount)
+                
+                # Record outgoing transaction
+                outgoing_data = {
+                    "account_id": from_account_id,
+                    "transaction_type": "transfer_out",
+                    "amount": amount,
+                    "description": description or f"Transfer to account {to_account_id}",
+                    "related_account_id": to_account_id,
+                    "balance_after": new_from_balance
+                }
+                outgoing_id = self.record_transaction(**outgoing_data)
+                
+                # Record incoming transaction
+                incoming_data = {
+                    "account_id": to_account_id,
+                    "transaction_type": "transfer_in",
+                    "amount": amount,
+                    "description": description or f"Transfer from account {from_account_id}",
+                    "related_account_id": from_account_id,
+                    "balance_after": new_to_balance
+                }
+                incoming_id = self.record_transaction(**incoming_data)
+        except ValueError:
+            raise
+        except Exception as e:
+            raise Exception(f"Transfer failed: {e}")
         
-        to_account = self.account_manager.get_account(to_account_id)
-        if not to_account:
-            raise ValueError(f"Destination account with ID {to_account_id} not found")
+        return {
+            "outgoing_transaction_id": outgoing_id,
+            "incoming_transaction_id": incoming_id,
+            "from_account": from_account_id,
+            "to_account": to_account_id,
+            "amount": amount,
+            "from_new_balance": new_from_balance,
+            "to_new_balance": new_to_balance,
+            "timestamp": self.db.get_current_timestamp()
+        }
+    
+    def record_transaction(self, account_id, transaction_type, amount, description=None, related_account_id=None,
+                           balance_after=None, loan_id=None):
+        """
+        Record a transaction in the database
         
-        # Check sufficient balance
-        if from_account["balance"] < amount:
-            raise ValueError("Insufficient funds for transfer")
+        Call this after the account balance has been changed and inside the same
+        db.transaction(), so the row's balance_after and the day's balance snapshot
+        reflect the new balance. When balance_after is not given it is read back
+        from the account. Loan disbursements and payments pass their loan_id.
+        """
+        valid_types = ["deposit", "withdrawal", "transfer_in", "transfer_out", "loan_disbursement", "loan_payment"]
         
-        # Use a transaction to ensure atomicity
-        conn = self.db.begin_transaction()
-        try:
-            # Update source account balance
-            new_from_balance = from_account["balance"] - amount
-            self.account_manager.update_balance(from_account_id, new_from_balance)
-            
-            # Update destination account balance
-            new_to_balance = to_account["balance"] + amount
-            self.account_manager.update_balance(to_account_id, new_to_balance)
+        if transaction_type not in valid_types:
+            raise ValueError(f"Invalid transaction type. Must be one of: {', '.join(valid_types)}")
+        
+        cents = to_cents(amount)
+        
+        with self.db.transaction() as conn:
+            if balance_after is None:
+                account = self.db.execute_query(
+                    "SELECT balance FROM accounts WHERE account_id = ?", (account_id,), "one"
+                )
+                if not account:
+                    raise ValueError(f"Account with ID {account_id} not found")
+                balance_after_cents = account["balance"]
+            else:
+                balance_after_cents = to_cents(balance_after)
             
-            # Record outgoing transaction
-            outgoing_data = {
-                "account_id": from_account_id,
-                "transaction_type": "transfer_out",
-                "amount": amount,
-                "description": description or f"Transfer to account {to_account_id}",
-                "related_account_id": to_account_id
-            }
-            outgoing_id = self.record_transaction(**outgoing_data)
+            timestamp = self.db.get_current_timestamp()
             
-            # Record incoming transaction
-            incoming_data = {
-                "account_id": to_account_id,
-                "transaction_type": "transfer_in",
-                "amount": amount,
-                "description": description or f"Transfer from account {from_account_id}",
-                "related_account_id": from_account_id
-            }
-            incoming_id = self.record_transaction(**incoming_data)
+            query = """
+                INSERT INTO transactions (
+                    account_id, transaction_type, amount, 
+                    description, related_account_id, transaction_date, balance_after, loan_id
+                ) 
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """
+            params = (
+                account_id,
+                transaction_type,
+                cents,
+                description or transaction_type.replace("_", " ").capitalize(),
+                related_account_id,
+                timestamp,
+                balance_after_cents,
+                loan_id
+            )
             
-            self.db.commit_transaction()
+            transaction_id = self.db.execute_query(query, params)
             
-            return {
-                "outgoing_transaction_id": outgoing_id,
-                "incoming_transaction_id": incoming_id,
-                "from_account": from_account_id,
-                "to_account": to_account_id,
-                "amount": amount,
-                "from_new_balance": new_from_balance,
-                "to_new_balance": new_to_balance,
-                "timestamp": self.db.get_current_timestamp()
-            }
-        except Exception as e:
-            self.db.rollback_transaction()
-            raise Exception(f"Transfer failed: {e}")
+            self.record_ledger_aggregates(conn, [(account_id, transaction_type, cents, timestamp, balance_after_cents)])
+        
+        return transaction_id
     
-    def record_transaction(self, account_id, transaction_type, amount, description=None, related_account_id=None):
-        """Record a transaction in the database"""
-        valid_types = ["deposit", "withdrawal", "transfer_in", "transfer_out", "loan_disbursement", "loan_payment"]
+    def record_ledger_aggregates(self, conn, ledger_rows):
+        """
+        Fold ledger rows just inserted on conn into daily_balances and transaction_rollups
         
-        if transaction_type not in valid_types:
-            raise ValueError(f"Invalid transaction type. Must be one of: {', '.join(valid_types)}")
+        Code that writes ledger rows itself must call this in the same unit of work.
+        ledger_rows are (account_id, transaction_type, cents, timestamp, balance_after)
+        tuples in the order they were written, with timestamp a datetime.
+        """
+        self._record_daily_balances(conn, ledger_rows)
+        self._record_rollups(conn, ledger_rows)
+    
+    def _record_daily_balances(self, conn, ledger_rows):
+        """
+        Fold new ledger rows into the daily_balances snapshots
         
-        timestamp = self.db.get_current_timestamp()
+        ledger_rows are (account_id, transaction_type, cents, timestamp, balance_after)
+        tuples in the order they were written. The first row of a day fixes its
+        opening balance, later rows only move the closing balance.
+        """
+        days = {}
+        for account_id, transaction_type, cents, timestamp, balance_after in ledger_rows:
+            signed = cents if transaction_type in CREDIT_TYPES else -cents
+            key = (account_id, timestamp.date().isoformat())
+            if key in days:
+                days[key][1] = balance_after
+            else:
+                days[key] = [balance_after - signed, balance_after]
+        
+        conn.executemany("""
+            INSERT INTO daily_balances (account_id, balance_date, opening_balance, closing_balance)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT (account_id, balance_date) DO UPDATE SET closing_balance = excluded.closing_balance
+        """, [(account_id, day, opening, closing) for (account_id, day), (opening, closing) in days.items()])
+    
+    def _record_rollups(self, conn, ledger_rows):
+        """
+        Fold new ledger rows into the transaction_rollups aggregates
         
-        query = """
-            INSERT INTO transactions (
-                account_id, transaction_type, amount, 
-                description, related_account_id, transaction_date
-            ) 
-            VALUES (?, ?, ?, ?, ?, ?)
+        ledger_rows are the same tuples as for _record_daily_balances. Rows are
+        combined per account, day and type first, so each rollup is written once.
         """
-        params = (
-            account_id,
-            transaction_type,
-            amount,
-            description or transaction_type.replace("_", " ").capitalize(),
-            related_account_id,
-            timestamp
-        )
+        rollups = {}
+        for account_id, transaction_type, cents, timestamp, _ in ledger_rows:
+            key = (account_id, timestamp.date().isoformat(), transaction_type)
+            if key in rollups:
+                rollup = rollups[key]
+                rollup[0] += 1
+                rollup[1] += cents
+                rollup[2] = min(rollup[2], cents)
+                rollup[3] = max(rollup[3], cents)
+            else:
+                rollups[key] = [1, cents, cents, cents]
+        
+        conn.executemany("""
+            INSERT INTO transaction_rollups (
+                account_id, rollup_date, transaction_type, transaction_count, total, minimum, maximum
+            )
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (account_id, rollup_date, transaction_type) DO UPDATE SET
+                transaction_count = transaction_count + excluded.transaction_count,
+                total = total + excluded.total,
+                minimum = MIN(minimum, excluded.minimum),
+                maximum = MAX(maximum, excluded.maximum)
+        """, [key + tuple(rollup) for key, rollup in rollups.items()])
+    
+    def apply_batch(self, operations, chunk_size=500):
+        """
+        Apply many deposits, withdrawals and transfers at once
         
-        transaction_id = self.db.execute_query(query, params)
+        Parameters:
+        - operations: Iterable of dicts with 'type' ('deposit', 'withdrawal' or 'transfer'),
+          'account_id', 'amount', an optional 'description' and, for transfers, 'to_account_id'
+        - chunk_size: Number of operations applied per database transaction
         
-        return transaction_id
+        Each chunk loads the balances it needs with one query, applies the operations
+        in order, then writes balances and ledger rows with executemany and commits
+        once. An operation that is invalid or would overdraw is reported in 'failed'
+        and skipped without aborting the rest of the batch.
+        
+        Returns:
+        - {'succeeded': [...], 'failed': [...]} where every entry carries the 'index'
+          of its operation in the input
+        """
+        if chunk_size <= 0:
+            raise ValueError("Chunk size must be positive")
+        
+        results = {"succeeded": [], "failed": []}
+        
+        chunk = []
+        for index, operation in enumerate(operations):
+            chunk.append((index, operation))
+            if len(chunk) >= chunk_size:
+                self._apply_batch_chunk(chunk, results)
+                chunk = []
+        
+        if chunk:
+            self._apply_batch_chunk(chunk, results)
+        
+        return results
+    
+    def _prepare_batch_operation(self, operation):
+        """Validate a batch operation and normalise it to (type, account_id, to_account_id, cents, description)"""
+        operation_type = operation.get("type")
+        if operation_type not in ("deposit", "withdrawal", "transfer"):
+            raise ValueError("Invalid operation type. Must be one of: deposit, withdrawal, transfer")
+        
+        account_id = self._batch_account_id(operation.get("account_id"), "Account ID")
+        
+        amount = to_decimal(operation.get("amount"))
+        if amount <= 0:
+            raise ValueError(f"{operation_type.capitalize()} amount must be positive")
+        
+        to_account_id = None
+        if operation_type == "transfer":
+            to_account_id = self._batch_account_id(operation.get("to_account_id"), "Destination account ID")
+            if to_account_id == account_id:
+                raise ValueError("Cannot transfer to the same account")
+        
+        return operation_type, account_id, to_account_id, to_cents(amount), operation.get("description")
+    
+    def _batch_account_id(self, value, label):
+        """Check that a batch operation names an account by integer ID and return it as an int"""
+        if value is None:
+            raise ValueError(f"{label} is required")
+        # Digit strings are accepted, since batches are often parsed from CSV or JSON
+        if isinstance(value, str) and value.strip().isdigit():
+            return int(value)
+        if not isinstance(value, int) or isinstance(value, bool):
+            raise ValueError(f"{label} must be an integer")
+        return value
+    
+    def _apply_batch_chunk(self, chunk, results):
+        """Apply one chunk of batch operations inside a single transaction"""
+        operations = dict(chunk)
+        
+        prepared = []
+        for index, operation in chunk:
+            try:
+                prepared.append((index, self._prepare_batch_operation(operation)))
+            except (ValueError, TypeError, AttributeError) as e:
+                results["failed"].append({"index": index, "operation": operation, "error": str(e)})
+        
+        if not prepared:
+            return
+        
+        account_ids = {item[1][1] for item in prepared} | {item[1][2] for item in prepared if item[1][2] is not None}
+        
+        try:
+            with self.db.transaction() as conn:
+                # Load every balance the chunk touches in one query
+                placeholders = ", ".join("?" for _ in account_ids)
+                rows = conn.execute(
+                    f"SELECT account_id, balance FROM accounts WHERE account_id IN ({placeholders})",
+                    tuple(account_ids)
+                ).fetchall()
+                balances = {row["account_id"]: row["balance"] for row in rows}
+                
+                ledger_rows = []
+                applied = []
+                failed = []
+                
+                for index, (operation_type, account_id, to_account_id, cents, description) in prepared:
+                    timestamp = self.db.get_current_timestamp()
+                    
+                    if account_id not in balances:
+                        failed.append((index, f"Account with ID {account_id} not found"))
+                        continue
+                    
+                    if operation_type == "deposit":
+                        balances[account_id] += cents
+                        ledger_rows.append((
+                            account_id, "deposit", cents, description or "Deposit", None, timestamp, balances[account_id]
+                        ))
+                    elif operation_type == "withdrawal":
+                        if balances[account_id] < cents:
+                            failed.append((index, "Insufficient funds for withdrawal"))
+                            continue
+                        balances[account_id] -= cents
+                        ledger_rows.append((
+                            account_id, "withdrawal", cents, description or "Withdrawal", None, timestamp, balances[account_id]
+                        ))
+                    else:
+                        if to_account_id not in balances:
+                            failed.append((index, f"Destination account with ID {to_account_id} not found"))
+                            continue
+                        if balances[account_id] < cents:
+                            failed.append((index, "Insufficient funds for transfer"))
+                            continue
+                        balances[account_id] -= cents
+                        balances[to_account_id] += cents
+                        ledger_rows.append((
+                            account_id, "transfer_out", cents,
+                            description or f"Transfer to account {to_account_id}", to_account_id, timestamp,
+                            balances[account_id]
+                        ))
+                        ledger_rows.append((
+                            to_account_id, "transfer_in", cents,
+                            description or f"Transfer from account {account_id}", account_id, timestamp,
+                            balances[to_account_id]
+                        ))
+                    
+                    legs = 2 if operation_type == "transfer" else 1
+                    applied.append((index, operation_type, account_id, cents, legs, balances[account_id]))
+                
+                touched = {row[0] for row in ledger_rows}
+                if touched:
+                    now = self.db.get_current_timestamp()
+                    conn.executemany(
+                        "UPDATE accounts SET balance = ?, updated_at = ? WHERE account_id = ?",
+                        [(balances[account_id], now, account_id) for account_id in touched]
+                    )
+                    self.account_manager.invalidate_cached_accounts(touched)
+                    conn.executemany("""
+                        INSERT INTO transactions (
+                            account_id, transaction_type, amount,
+                            description, related_account_id, transaction_date, balance_after
+                        )
+                        VALUES (?, ?, ?, ?, ?, ?, ?)
+                    """, ledger_rows)
+                    self.record_ledger_aggregates(conn, [
+                        (row[0], row[1], row[2], row[5], row[6]) for row in ledger_rows
+                    ])
+                    
+                    # The write lock is held, so AUTOINCREMENT ids in this chunk are consecutive
+                    next_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0] - len(ledger_rows) + 1
+        except Exception as e:
+            # Nothing in this chunk was committed, later chunks still run
+            for index, _ in prepared:
+                results["failed"].append({"index": index, "operation": operations[index], "error": f"Batch chunk failed: {e}"})
+            return
+        
+        for index, error in failed:
+            results["failed"].append({"index": index, "operation": operations[index], "error": error})
+        
+        for index, operation_type, account_id, cents, legs, new_balance in applied:
+            results["succeeded"].append({
+                "index": index,
+                "transaction_type": operation_type,
+                "account_id": account_id,
+                "amount": from_cents(cents),
+                "transaction_ids": list(range(next_id, next_id + legs)),
+                "new_balance": from_cents(new_balance)
+            })
+            next_id += legs
     
     def get_transaction(self, transaction_id):
         """Get a specific transaction by ID"""
         query = "SELECT * FROM transactions WHERE transaction_id = ?"
         transaction = self.db.execute_query(query, (transaction_id,), "one")
         
-        return dict(transaction) if transaction else None
+        return self._transaction_from_row(transaction) if transaction else None
     
-    def get_account_transactions(self, account_id, limit=50, offset=0, transaction_type=None):
-        """Get all transactions for a specific account"""
+    def get_account_transactions(self, account_id, limit=50, offset=0, transaction_type=None, cursor=None):
+        """
+        Get all transactions for a specific account, newest first
+        
+        Pass the cursor from get_account_transactions_page instead of an offset to
+        continue after a given row; offset is ignored when a cursor is given.
+        """
         # Build query
         query = "SELECT * FROM transactions WHERE account_id = ?"
         params = [account_id]
@@ -201,57 +473,321 @@ class TransactionManager:
             query += " AND transaction_type = ?"
             params.append(transaction_type)
         
-        query += " ORDER BY transaction_date DESC LIMIT ? OFFSET ?"
-        params.extend([limit, offset])
+        query, params = self._apply_keyset(query, params, limit, offset, cursor)
         
         # Execute query
         transactions = self.db.execute_query(query, tuple(params), "all")
         
-        return [dict(t) for t in transactions] if transactions else []
+        return [self._transaction_from_row(t) for t in transactions] if transactions else []
     
-    def get_transaction_stats(self, account_id=None, start_date=None, end_date=None):
-        """Get statistics on transactions for reporting"""
-        # Build query
+    def get_loan_transactions(self, loan_id, transaction_type=None):
+        """Get the disbursement and payment transactions of a loan, oldest first"""
+        query = "SELECT * FROM transactions WHERE loan_id = ?"
+        params = [loan_id]
+        
+        if transaction_type:
+            query += " AND transaction_type = ?"
+            params.append(transaction_type)
+        
+        query += " ORDER BY transaction_date, transaction_id"
+        
+        # Execute query
+        transactions = self.db.execute_query(query, tuple(params), "all")
+        
+        return [self._transaction_from_row(t) for t in transactions] if transactions else []
+    
+    def get_account_transactions_page(self, account_id, limit=50, cursor=None, transaction_type=None):
+        """
+        Get one page of an account's transactions using keyset pagination
+        
+        Returns:
+        - {'transactions': [...], 'next_cursor': cursor for the following page or None}
+        """
+        # Fetch one extra row to find out whether another page exists
+        transactions = self.get_account_transactions(
+            account_id, limit=limit + 1, transaction_type=transaction_type, cursor=cursor
+        )
+        return self._build_page(transactions, limit)
+    
+    def search_transactions_page(self, limit=50, cursor=None, **filters):
+        """Get one page of search_transactions results using keyset pagination"""
+        if filters.get("order_by", "date") != "date":
+            raise ValueError("Cursor pagination requires date ordering")
+        
+        transactions = self.search_transactions(limit=limit + 1, cursor=cursor, **filters)
+        return self._build_page(transactions, limit)
+    
+    def _apply_keyset(self, query, params, limit, offset, cursor):
+        """Add newest-first ordering and either a keyset cursor or an offset to a query"""
+        # (transaction_date, transaction_id) is unique, so pages stay stable under concurrent inserts
+        if cursor:
+            last_date, last_id = decode_cursor(cursor, 2)
+            query += " AND (transaction_date, transaction_id) < (?, ?)"
+            params.extend([last_date, last_id])
+            offset = 0
+        
+        query += " ORDER BY transaction_date DESC, transaction_id DESC LIMIT ? OFFSET ?"
+        params.extend([limit, offset])
+        return query, params
+    
+    def _build_page(self, transactions, limit):
+        """Trim an over-fetched result to a page and compute the next cursor"""
+        next_cursor = None
+        if len(transactions) > limit:
+            transactions = transactions[:limit]
+            last = transactions[-1]
+            next_cursor = encode_cursor(last["transaction_date"], last["transaction_id"])
+        
+        return {"transactions": transactions, "next_cursor": next_cursor}
+    
+    def get_balance_as_of(self, account_id, as_of):
+        """
+        Get an account's balance at a point in time
+        
+        Reads balance_after from the last ledger row at or before as_of with one
+        index seek. Before the first transaction the account held its opening balance.
+        """
+        account = self.account_manager.get_account(account_id, use_cache=False)
+        if not account:
+            raise ValueError(f"Account with ID {account_id} not found")
+        
         query = """
-            SELECT 
-                transaction_type,
-                COUNT(*) as count, 
-                SUM(amount) as total,
-                AVG(amount) as average,
-                MIN(amount) as minimum,
-                MAX(amount) as maximum
-            FROM transactions
-            WHERE 1=1
+            SELECT balance_after FROM transactions
+            WHERE account_id = ? AND transaction_date <= ?
+            ORDER BY transaction_date DESC, transaction_id DESC
+            LIMIT 1
         """
-        params = []
+        row = self.db.execute_query(query, (account_id, as_of), "one")
+        if row:
+            return from_cents(row["balance_after"])
         
-        if account_id:
-            query += " AND account_id = ?"
-            params.append(account_id)
+        query = """
+            SELECT transaction_type, amount, balance_after FROM transactions
+            WHERE account_id = ?
+            ORDER BY transaction_date, transaction_id
+            LIMIT 1
+        """
+        first = self.db.execute_query(query, (account_id,), "one")
+        if first:
+            signed = first["amount"] if first["transaction_type"] in CREDIT_TYPES else -first["amount"]
+            return from_cents(first["balance_after"] - signed)
         
-        if start_date:
-            query += " AND transaction_date >= ?"
-            params.append(start_date)
+        return account["balance"]
+    
+    def get_statement_balances(self, account_id, start_date, end_date):
+        """
+        Get the opening and closing balances of a statement period
         
-        if end_date:
-            query += " AND transaction_date <= ?"
-            params.append(end_date)
+        Parameters:
+        - start_date, end_date: First and last day of the period (inclusive), as dates or 'YYYY-MM-DD'
         
-        query += " GROUP BY transaction_type"
+        Both balances come from the daily_balances snapshots without touching the ledger.
+        """
+        account = self.account_manager.get_account(account_id, use_cache=False)
+        if not account:
+            raise ValueError(f"Account with ID {account_id} not found")
         
-        # Execute query
-        stats = self.db.execute_query(query, tuple(params), "all")
+        start_date = as_date(start_date)
+        end_date = as_date(end_date)
+        if start_date > end_date:
+            raise ValueError("Statement start date must not be after its end date")
+        
+        return {
+            "account_id": account_id,
+            "start_date": start_date.isoformat(),
+            "end_date": end_date.isoformat(),
+            "opening_balance": self._balance_at_end_of_day(account, start_date - datetime.timedelta(days=1)),
+            "closing_balance": self._balance_at_end_of_day(account, end_date)
+        }
+    
+    def _balance_at_end_of_day(self, account, day):
+        """Look up an account's balance at the close of a day from daily_balances"""
+        query = """
+            SELECT closing_balance FROM daily_balances
+            WHERE account_id = ? AND balance_date <= ?
+            ORDER BY balance_date DESC
+            LIMIT 1
+        """
+        row = self.db.execute_query(query, (account["account_id"], day.isoformat()), "one")
+        if row:
+            return from_cents(row["closing_balance"])
+        
+        # No activity up to that day, so the balance is whatever the next active day opened with
+        query = """
+            SELECT opening_balance FROM daily_balances
+            WHERE account_id = ? AND balance_date > ?
+            ORDER BY balance_date
+            LIMIT 1
+        """
+        row = self.db.execute_query(query, (account["account_id"], day.isoformat()), "one")
+        if row:
+            return from_cents(row["opening_balance"])
         
-        return [dict(s) for s in stats] if stats else []
+        return account["balance"]
+    
+    def reconcile_balance(self, account_id):
+        """
+        Compare an account's balance with the balance_after of its latest ledger row
+        
+        A mismatch means the balance was changed without recording a transaction.
+        """
+        account = self.account_manager.get_account(account_id, use_cache=False)
+        if not account:
+            raise ValueError(f"Account with ID {account_id} not found")
+        
+        query = """
+            SELECT balance_after FROM transactions
+            WHERE account_id = ?
+            ORDER BY transaction_date DESC, transaction_id DESC
+            LIMIT 1
+        """
+        row = self.db.execute_query(query, (account_id,), "one")
+        ledger_balance = from_cents(row["balance_after"]) if row else None
+        
+        return {
+            "account_id": account_id,
+            "balance": account["balance"],
+            "ledger_balance": ledger_balance,
+            "matches": ledger_balance is None or ledger_balance == account["balance"]
+        }
+    
+    def get_transaction_stats(self, account_id=None, start_date=None, end_date=None):
+        """
+        Get statistics on transactions for reporting
+        
+        start_date and end_date are inclusive bounds on transaction_date, as dates,
+        datetimes or ISO strings. Whole days inside the range are answered from the
+        transaction_rollups aggregates; ledger rows are only read for the partial
+        days at either edge, so the cost does not grow with the length of the range.
+        """
+        lower = self._timestamp_bound(start_date) if start_date else None
+        upper = self._timestamp_bound(end_date) if end_date else None
+        
+        # First and last days that fall entirely inside the range
+        first_day = last_day = None
+        if lower:
+            first_day = lower[1].date()
+            if lower[1].time() != datetime.time():
+                first_day += datetime.timedelta(days=1)
+        if upper:
+            # A day is only whole up to its last instant, which a bound never reaches
+            last_day = upper[1].date() - datetime.timedelta(days=1)
+        
+        account_filter = " AND account_id = ?" if account_id else ""
+        account_params = [account_id] if account_id else []
+        stats = {}
+        
+        if first_day and last_day and first_day > last_day:
+            # No whole day in the range, so the ledger answers it alone
+            edges = [("transaction_date >= ? AND transaction_date <= ?", [lower[0], upper[0]])]
+        else:
+            query = """
+                SELECT transaction_type, SUM(transaction_count) AS count, SUM(total) AS total,
+                       MIN(minimum) AS minimum, MAX(maximum) AS maximum
+                FROM transaction_rollups
+                WHERE 1=1
+            """ + account_filter
+            params = list(account_params)
+            
+            if first_day:
+                query += " AND rollup_date >= ?"
+                params.append(first_day.isoformat())
+            
+            if last_day:
+                query += " AND rollup_date <= ?"
+                params.append(last_day.isoformat())
+            
+            query += " GROUP BY transaction_type"
+            self._merge_stats(stats, self.db.execute_query(query, tuple(params), "all"))
+            
+            edges = []
+            if lower and lower[0] < first_day.isoformat():
+                edges.append(("transaction_date >= ? AND transaction_date < ?", [lower[0], first_day.isoformat()]))
+            if upper:
+                edges.append(("transaction_date >= ? AND transaction_date <= ?", [upper[1].date().isoformat(), upper[0]]))
+        
+        for condition, params in edges:
+            query = f"""
+                SELECT transaction_type, COUNT(*) AS count, SUM(amount) AS total,
+                       MIN(amount) AS minimum, MAX(amount) AS maximum
+                FROM transactions
+                WHERE {condition}{account_filter}
+                GROUP BY transaction_type
+            """
+            self._merge_stats(stats, self.db.execute_query(query, tuple(params + account_params), "all"))
+        
+        results = []
+        for transaction_type in sorted(stats):
+            count, total, minimum, maximum = stats[transaction_type]
+            results.append({
+                "transaction_type": transaction_type,
+                "count": count,
+                "total": from_cents(total),
+                "average": average_from_cents(total / count),
+                "minimum": from_cents(minimum),
+                "maximum": from_cents(maximum)
+            })
+        
+        return results
+    
+    def _merge_stats(self, stats, rows):
+        """Combine per-type count, total, minimum and maximum rows into stats"""
+        for row in rows or []:
+            current = stats.get(row["transaction_type"])
+            if current is None:
+                stats[row["transaction_type"]] = [row["count"], row["total"], row["minimum"], row["maximum"]]
+            else:
+                current[0] += row["count"]
+                current[1] += row["total"]
+                current[2] = min(current[2], row["minimum"])
+                current[3] = max(current[3], row["maximum"])
+    
+    def _timestamp_bound(self, value):
+        """Normalise a date, datetime or ISO string to (text compared with transaction_date, datetime)"""
+        if isinstance(value, datetime.datetime):
+            return value.isoformat(" "), value
+        if isinstance(value, datetime.date):
+            return value.isoformat(), datetime.datetime.combine(value, datetime.time())
+        try:
+            return str(value), datetime.datetime.fromisoformat(str(value))
+        except ValueError:
+            raise ValueError(f"Invalid date: {value}")
     
     def search_transactions(self, account_id=None, transaction_type=None, min_amount=None, 
                           max_amount=None, start_date=None, end_date=None, 
-                          description_contains=None, limit=50, offset=0):
-        """Search for transactions with various filters"""
+                          description_contains=None, limit=50, offset=0, cursor=None, order_by="date"):
+        """
+        Search for transactions with various filters
+        
+        description_contains is matched against the full-text index: the words must
+        appear in order, the last one as a prefix ("loan pay" finds "Loan payment").
+        Text with no words in it does not filter.
+        Results are newest first, or best match first with order_by='relevance'
+        (which cannot be combined with a cursor).
+        """
+        if order_by not in ("date", "relevance"):
+            raise ValueError("Order must be one of: date, relevance")
+        
         # Build query
-        query = "SELECT * FROM transactions WHERE 1=1"
+        query = "SELECT transactions.* FROM transactions WHERE 1=1"
         params = []
         
+        # Text without any words (such as '' from an empty search box) is no filter at all
+        match = self._fts_phrase(description_contains) if description_contains is not None else None
+        if match is not None:
+            # Run the FTS lookup once for the matching ids and their bm25 rank, then fetch
+            # rows by primary key; MATERIALIZED stops SQLite re-running MATCH per candidate row
+            query = """
+                WITH matches AS MATERIALIZED (
+                    SELECT rowid AS transaction_id, rank FROM transactions_fts WHERE transactions_fts MATCH ?
+                )
+                SELECT transactions.* FROM matches JOIN transactions USING (transaction_id)
+                WHERE 1=1
+            """
+            params.append(match)
+        elif order_by == "relevance":
+            raise ValueError("Relevance ordering requires a description search")
+        
         if account_id:
             query += " AND account_id = ?"
             params.append(account_id)
@@ -262,11 +798,11 @@ class TransactionManager:
         
         if min_amount is not None:
             query += " AND amount >= ?"
-            params.append(min_amount)
+            params.append(to_cents(min_amount))
         
         if max_amount is not None:
             query += " AND amount <= ?"
-            params.append(max_amount)
+            params.append(to_cents(max_amount))
         
         if start_date:
             query += " AND transaction_date >= ?"
@@ -276,14 +812,24 @@ class TransactionManager:
             query += " AND transaction_date <= ?"
             params.append(end_date)
         
-        if description_contains:
-            query += " AND description LIKE ?"
-            params.append(f"%{description_contains}%")
-        
-        query += " ORDER BY transaction_date DESC LIMIT ? OFFSET ?"
-        params.extend([limit, offset])
+        if order_by == "relevance":
+            if cursor:
+                raise ValueError("Cursor pagination requires date ordering")
+            query += " ORDER BY matches.rank, transaction_date DESC, transaction_id DESC LIMIT ? OFFSET ?"
+            params.extend([limit, offset])
+        else:
+            query, params = self._apply_keyset(query, params, limit, offset, cursor)
         
         # Execute query
         transactions = self.db.execute_query(query, tuple(params), "all")
         
-        return [dict(t) for t in transactions] if transactions else []
+        return [self._transaction_from_row(t) for t in transactions] if transactions else []
+    
+    def _fts_phrase(self, text):
+        """Turn free text into an FTS5 prefix phrase query, or None if it has no words"""
+        text = str(text).strip()
+        if not re.search(r"\w", text):
+            return None
+        
+        # Quoting makes FTS5 operators and punctuation in the text literal
+        return '"' + text.replace('"', '""') + '" *'
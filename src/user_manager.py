@@ -1,38 +1,20 @@
-import hashlib
 import datetime
 from src.database import Database
+from src.passwords import PasswordHasher
+from src.cache import LRUCache
 
 
 class UserManager:
     """Manages user authentication and user accounts"""
     
-    def __init__(self, db_path=None):
-        self.db = Database(db_path)
-        self.initialize_users_table()
+    def __init__(self, db_path=None, db=None, hasher=None, user_cache_ttl=0, user_cache_size=1024):
+        self.db = db if db is not None else Database(db_path)
+        # The hasher owns the KDF cost and verification cache
+        self.hasher = hasher if hasher is not None else PasswordHasher()
+        # Users looked up by ID are cached for user_cache_ttl seconds; 0 disables the cache
+        self.user_cache = LRUCache(user_cache_size, user_cache_ttl) if user_cache_ttl > 0 else None
         self.create_default_admin()
     
-    def initialize_users_table(self):
-        """Create users table if it doesn't exist"""
-        query = '''
-            CREATE TABLE IF NOT EXISTS users (
-                user_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                username TEXT UNIQUE NOT NULL,
-                password_hash TEXT NOT NULL,
-                email TEXT UNIQUE NOT NULL,
-                full_name TEXT NOT NULL,
-                user_type TEXT NOT NULL DEFAULT 'customer',
-                is_active BOOLEAN DEFAULT 1,
-                created_at TIMESTAMP NOT NULL,
-                last_login TIMESTAMP,
-                account_id INTEGER,
-                FOREIGN KEY (account_id) REFERENCES accounts(account_id) ON DELETE SET NULL
-            )
-        '''
-        try:
-            self.db.execute_query(query)
-        except Exception as e:
-            print(f"Error creating users table: {e}")
-    
     def create_default_admin(self):
         """Create default admin user if it doesn't exist"""
         try:
@@ -52,12 +34,12 @@ class UserManager:
             print(f"Error creating default admin: {e}")
     
     def hash_password(self, password):
-        """Hash password using SHA-256"""
-        return hashlib.sha256(password.encode()).hexdigest()
+        """Hash password with a salted KDF (scrypt by default)"""
+        return self.hasher.hash(password)
     
     def verify_password(self, password, password_hash):
-        """Verify password against hash"""
-        return self.hash_password(password) == password_hash
+        """Verify password against a hash in any supported format, including legacy SHA-256"""
+        return self.hasher.verify(password, password_hash)
     
     def create_user(self, username, password, email, full_name, user_type='customer', account_id=None):
         """Create a new user"""
@@ -79,12 +61,32 @@ class UserManager:
     def authenticate_user(self, username, password):
         """Authenticate user login"""
         user = self.get_user_by_username(username)
-        if user and user['is_active'] and self.verify_password(password, user['password_hash']):
+        if not user:
+            # Do the same work as a real check so unknown usernames are not revealed by timing
+            self.hasher.burn(password)
+            return None
+        
+        # Check the password before is_active, so inactive accounts take as long as active ones
+        if self.verify_password(password, user['password_hash']) and user['is_active']:
+            # Upgrade legacy or weaker hashes now that the plain password is known
+            if self.hasher.needs_rehash(user['password_hash']):
+                self.rehash_password(user['user_id'], user['password_hash'], password)
+            
             # Update last login
             self.update_last_login(user['user_id'])
             return user
         return None
     
+    def rehash_password(self, user_id, old_hash, password):
+        """Replace a user's stored hash with one in the current format"""
+        # Only swap the hash the password was checked against, never a concurrent password change
+        query = "UPDATE users SET password_hash = ? WHERE user_id = ? AND password_hash = ?"
+        try:
+            self.db.execute_query(query, (self.hash_password(password), user_id, old_hash))
+            self.invalidate_user(user_id)
+        except Exception as e:
+            print(f"Error upgrading password hash: {e}")
+    
     def get_user_by_username(self, username):
         """Get user by username"""
         query = "SELECT * FROM users WHERE username = ?"
@@ -95,11 +97,25 @@ class UserManager:
     
     def get_user_by_id(self, user_id):
         """Get user by ID"""
+        if self.user_cache is not None:
+            user = self.user_cache.get(user_id)
+            if user is not None:
+                return user
+        
         query = "SELECT * FROM users WHERE user_id = ?"
         try:
-            return self.db.execute_query(query, (user_id,), fetch_mode='one')
+            user = self.db.execute_query(query, (user_id,), fetch_mode='one')
         except Exception as e:
             return None
+        
+        if user is not None and self.user_cache is not None:
+            self.user_cache.set(user_id, user)
+        return user
+    
+    def invalidate_user(self, user_id):
+        """Drop a user from the cache after their row changes"""
+        if self.user_cache is not None:
+            self.user_cache.invalidate(user_id)
     
     def get_user_by_email(self, email):
         """Get user by email"""
@@ -115,6 +131,7 @@ class UserManager:
         last_login = datetime.datetime.now()
         try:
             self.db.execute_query(query, (last_login, user_id))
+            self.invalidate_user(user_id)
         except Exception as e:
             print(f"Error updating last login: {e}")
     
@@ -123,6 +140,7 @@ class UserManager:
         query = "UPDATE users SET account_id = ? WHERE user_id = ?"
         try:
             self.db.execute_query(query, (account_id, user_id))
+            self.invalidate_user(user_id)
             return True
         except Exception as e:
             raise Exception(f"Error linking user to account: {e}")
@@ -140,6 +158,7 @@ class UserManager:
         query = "UPDATE users SET is_active = 0 WHERE user_id = ?"
         try:
             self.db.execute_query(query, (user_id,))
+            self.invalidate_user(user_id)
             return True
         except Exception as e:
             raise Exception(f"Error deactivating user: {e}")
@@ -149,6 +168,7 @@ class UserManager:
         query = "UPDATE users SET is_active = 1 WHERE user_id = ?"
         try:
             self.db.execute_query(query, (user_id,))
+            self.invalidate_user(user_id)
             return True
         except Exception as e:
             raise Exception(f"Error activating user: {e}")
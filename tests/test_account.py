@@ -2,6 +2,7 @@ import unittest
 import os
 import sys
 import datetime
+import threading
 from pathlib import Path
 
 # Add the project root to the Python path
@@ -19,8 +20,7 @@ class TestAccountManager(unittest.TestCase):
         """Set up test environment before each test"""
         # Create a test database and account manager
         self.test_db = setup_test_database()
-        self.account_manager = AccountManager()
-        self.account_manager.db = self.test_db  # Use test database
+        self.account_manager = AccountManager(self.test_db)
         
         # Sample account data for testing
         self.test_account_data = {
@@ -139,6 +139,65 @@ class TestAccountManager(unittest.TestCase):
         # Verify balance update
         self.assertEqual(updated_account['balance'], new_balance)
 
+    
+    def test_apply_balance_delta(self):
+        """Test atomic balance changes and the non-negative guard"""
+        account = self.account_manager.create_account(**self.test_account_data)
+        account_id = account['account_id']
+        
+        # Credit and debit return the new balance
+        self.assertEqual(self.account_manager.apply_balance_delta(account_id, 250.0), 1250.0)
+        self.assertEqual(self.account_manager.apply_balance_delta(account_id, -1250.0), 0.0)
+        
+        # Overdrawing is refused unless explicitly allowed
+        self.assertIsNone(self.account_manager.apply_balance_delta(account_id, -1.0))
+        self.assertEqual(self.account_manager.get_account(account_id)['balance'], 0.0)
+        self.assertEqual(self.account_manager.apply_balance_delta(account_id, -1.0, allow_negative=True), -1.0)
+        
+        # Missing accounts are reported as errors
+        with self.assertRaises(ValueError):
+            self.account_manager.apply_balance_delta(999999, 10.0)
+    
+    def test_concurrent_balance_deltas(self):
+        """Test that concurrent deposits do not lose updates"""
+        account = self.account_manager.create_account(**self.test_account_data)
+        account_id = account['account_id']
+        
+        def worker():
+            for _ in range(25):
+                self.account_manager.apply_balance_delta(account_id, 1.0)
+        
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        updated_account = self.account_manager.get_account(account_id)
+        self.assertEqual(updated_account['balance'], self.test_account_data['initial_balance'] + 100)
+
+    
+    def test_search_accounts_by_prefix(self):
+        """Test typeahead search by owner name and account number prefix"""
+        alice = self.account_manager.create_account('Alice Smith', 'checking')
+        self.account_manager.create_account('alan Jones', 'savings')
+        self.account_manager.create_account('Bob Brown', 'checking')
+        self.account_manager.create_account('50%_Discount Ltd', 'business')
+        
+        # Owner names match case-insensitively
+        results = self.account_manager.search_accounts_by_prefix('AL')
+        self.assertEqual([a['owner_name'] for a in results], ['alan Jones', 'Alice Smith'])
+        
+        # Wildcards in the term are literal
+        results = self.account_manager.search_accounts_by_prefix('50%_')
+        self.assertEqual([a['owner_name'] for a in results], ['50%_Discount Ltd'])
+        self.assertEqual(self.account_manager.search_accounts_by_prefix('%'), [])
+        
+        # Account numbers match by prefix and results are capped
+        results = self.account_manager.search_accounts_by_prefix(alice['account_number'].lower())
+        self.assertEqual([a['account_id'] for a in results], [alice['account_id']])
+        self.assertEqual(len(self.account_manager.search_accounts_by_prefix('TEST', limit=2)), 2)
+        self.assertEqual(self.account_manager.search_accounts_by_prefix('   '), [])
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,151 @@
+import unittest
+import sys
+import threading
+from decimal import Decimal
+from pathlib import Path
+from unittest import mock
+
+# Add the project root to the Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from src.account import AccountManager
+from src.transaction import TransactionManager
+from src.cache import LRUCache, AccountCache
+from test_config import DatabaseHelper, setup_test_database, cleanup_test_database
+
+
+class TestAccountCache(unittest.TestCase):
+    """Test cases for the read-through account cache"""
+
+    def setUp(self):
+        """Set up test environment before each test"""
+        self.test_db = setup_test_database()
+        self.test_db.account_cache = AccountCache(LRUCache(maxsize=100))
+        self.account_manager = AccountManager(self.test_db)
+        self.transaction_manager = TransactionManager(self.test_db)
+        self.account = self.account_manager.create_account('Ada Lovelace', 'checking', initial_balance=100)
+
+    def tearDown(self):
+        """Clean up after each test"""
+        self.test_db.account_cache = None
+        self.test_db.cleanup_test_db()
+        cleanup_test_database()
+
+    def _stats(self):
+        return self.test_db.account_cache.stats()
+
+    def test_lookups_are_cached(self):
+        """Test that repeated lookups by id and by number are served from the cache"""
+        account_id = self.account['account_id']
+        account_number = self.account['account_number']
+
+        first = self.account_manager.get_account(account_id)
+        first['balance'] = Decimal('0')
+        self.assertEqual(self.account_manager.get_account(account_id)['balance'], Decimal('100'))
+        self.assertEqual(self.account_manager.get_account_by_number(account_number)['account_id'], account_id)
+
+        # create_account's own lookup filled the cache, so every read above was a hit
+        stats = self._stats()
+        self.assertEqual((stats['hits'], stats['misses']), (4, 1))
+        self.assertGreater(stats['hit_rate'], 0)
+
+        # Writing behind the cache's back is only seen once the entry is dropped
+        self.test_db.execute_query("UPDATE accounts SET owner_name = 'Changed' WHERE account_id = ?", (account_id,))
+        self.assertEqual(self.account_manager.get_account(account_id)['owner_name'], 'Ada Lovelace')
+
+    def test_writes_invalidate(self):
+        """Test that every write path drops the cached account"""
+        account_id = self.account['account_id']
+        other = self.account_manager.create_account('Alan Turing', 'savings')
+        self.account_manager.get_account(account_id)
+
+        self.transaction_manager.deposit(account_id, 50)
+        self.assertEqual(self.account_manager.get_account(account_id)['balance'], Decimal('150'))
+
+        self.account_manager.update_account(account_id, owner_name='Ada King')
+        self.assertEqual(self.account_manager.get_account_by_number(self.account['account_number'])['owner_name'],
+                         'Ada King')
+
+        self.transaction_manager.apply_batch([
+            {'type': 'transfer', 'account_id': account_id, 'to_account_id': other['account_id'], 'amount': 25}
+        ])
+        self.assertEqual(self.account_manager.get_account(account_id)['balance'], Decimal('125'))
+        self.assertEqual(self.account_manager.get_account(other['account_id'])['balance'], Decimal('25'))
+
+        unused = self.account_manager.create_account('Grace Hopper', 'business')
+        self.account_manager.close_account(unused['account_id'])
+        self.assertIsNone(self.account_manager.get_account(unused['account_id']))
+        self.assertIsNone(self.account_manager.get_account_by_number(unused['account_number']))
+
+    def test_balance_checks_read_past_cache(self):
+        """Test that closing and balance reports use the current row, not a stale cached one"""
+        empty = self.account_manager.create_account('Grace Hopper', 'business')
+        self.account_manager.get_account(empty['account_id'])
+
+        # Another worker deposits; this worker's cache still says the balance is zero
+        self.test_db.execute_query("UPDATE accounts SET balance = 500 WHERE account_id = ?", (empty['account_id'],))
+        self.assertEqual(self.account_manager.get_account(empty['account_id'])['balance'], Decimal('0'))
+
+        with self.assertRaises(ValueError):
+            self.account_manager.close_account(empty['account_id'])
+        self.assertEqual(self.account_manager.get_account(empty['account_id'], use_cache=False)['balance'], Decimal('5'))
+        self.assertEqual(self.transaction_manager.get_balance_as_of(empty['account_id'], '2000-01-01'), Decimal('5'))
+
+    def test_transactions_bypass_cache(self):
+        """Test that reads inside a unit of work see its writes and never populate the cache"""
+        account_id = self.account['account_id']
+        self.account_manager.get_account(account_id)
+
+        with self.assertRaises(RuntimeError):
+            with self.test_db.transaction():
+                self.account_manager.apply_balance_delta(account_id, 10)
+                self.assertEqual(self.account_manager.get_account(account_id)['balance'], Decimal('110'))
+                raise RuntimeError("Rolled back")
+
+        self.assertEqual(self.account_manager.get_account(account_id)['balance'], Decimal('100'))
+
+        # Another thread reading before the commit cannot leave the old row cached
+        with self.test_db.transaction():
+            self.account_manager.apply_balance_delta(account_id, 10)
+            reader = threading.Thread(target=self.account_manager.get_account, args=(account_id,))
+            reader.start()
+            reader.join()
+        self.assertEqual(self.account_manager.get_account(account_id)['balance'], Decimal('110'))
+
+    def test_read_racing_a_write_is_not_cached(self):
+        """Test that a row read before a concurrent invalidation is not put back in the cache"""
+        account_id = self.account['account_id']
+        self.test_db.account_cache.clear()
+        execute_query = self.test_db.execute_query
+
+        def read_then_write(query, params=(), fetch_mode=None):
+            # The lookup reads the old row, then another thread deposits before it is cached
+            row = execute_query(query, params, fetch_mode)
+            if query.startswith("SELECT * FROM accounts"):
+                execute_query("UPDATE accounts SET balance = balance + 100 WHERE account_id = ?", (account_id,))
+                self.account_manager.invalidate_cached_accounts([account_id])
+            return row
+
+        with mock.patch.object(self.test_db, 'execute_query', side_effect=read_then_write):
+            self.assertEqual(self.account_manager.get_account(account_id)['balance'], Decimal('100'))
+
+        self.assertIsNone(self.test_db.account_cache.get(account_id))
+        self.assertEqual(self.account_manager.get_account(account_id)['balance'], Decimal('101'))
+
+    def test_eviction_metrics(self):
+        """Test that the LRU backend counts hits, misses and evictions"""
+        cache = LRUCache(maxsize=2)
+        for key in ('a', 'b', 'c'):
+            cache.set(key, key)
+        cache.get('a')
+        cache.get('c')
+
+        stats = cache.stats()
+        self.assertEqual((stats['size'], stats['evictions']), (2, 1))
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+        self.assertEqual(stats['hit_rate'], 0.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
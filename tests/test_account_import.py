@@ -0,0 +1,125 @@
+import unittest
+import os
+import sys
+import io
+import json
+import tempfile
+from decimal import Decimal
+from pathlib import Path
+
+# Add the project root to the Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from src.account import AccountManager
+from src.account_import import AccountImporter, read_jsonl
+from src.account_numbers import is_valid_account_number
+from test_config import DatabaseHelper, setup_test_database, cleanup_test_database
+
+
+class TestAccountImporter(unittest.TestCase):
+    """Test cases for the bulk account importer"""
+
+    def setUp(self):
+        """Set up test environment before each test"""
+        self.test_db = setup_test_database()
+        self.account_manager = AccountManager(self.test_db)
+        self.importer = AccountImporter(self.test_db, chunk_size=2)
+        self.temp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        """Clean up after each test"""
+        self.temp_dir.cleanup()
+        self.test_db.cleanup_test_db()
+        cleanup_test_database()
+
+    def _write(self, name, text):
+        path = os.path.join(self.temp_dir.name, name)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        return path
+
+    def test_import_csv_with_rejects(self):
+        """Test that valid rows are imported and invalid rows go to the reject file"""
+        source = self._write('accounts.csv', (
+            "owner_name,account_type,email,phone_number,initial_balance\n"
+            "Ada Lovelace,checking,ada@example.com,555-0100,100.50\n"
+            ",savings,,,\n"
+            "Alan Turing,savings,,,\n"
+            "Grace Hopper,spaceship,,,10\n"
+            "Edsger Dijkstra,business,,,-5\n"
+            "Barbara Liskov,money_market,,,2500\n"
+        ))
+        rejects = os.path.join(self.temp_dir.name, 'rejects.jsonl')
+
+        result = self.importer.import_file(source, reject_path=rejects)
+        self.assertEqual(result, {'imported': 3, 'rejected': 3})
+
+        accounts = {account['owner_name']: account for account in self.account_manager.get_all_accounts()}
+        self.assertEqual(set(accounts), {'Ada Lovelace', 'Alan Turing', 'Barbara Liskov'})
+        self.assertEqual(accounts['Ada Lovelace']['balance'], Decimal('100.50'))
+        self.assertIsNone(accounts['Alan Turing']['email'])
+        self.assertEqual(len({account['account_number'] for account in accounts.values()}), 3)
+        self.assertTrue(all(is_valid_account_number(account['account_number']) for account in accounts.values()))
+
+        with open(rejects, encoding='utf-8') as f:
+            rejected = [json.loads(line) for line in f]
+        self.assertEqual([record['line'] for record in rejected], [3, 5, 6])
+        self.assertEqual(rejected[0]['error'], "Owner name is required")
+        self.assertIn("Invalid account type", rejected[1]['error'])
+        self.assertEqual(rejected[2]['row']['owner_name'], 'Edsger Dijkstra')
+
+    def test_import_jsonl(self):
+        """Test JSON Lines input, including malformed lines"""
+        stream = io.StringIO(
+            '{"owner_name": "Ada Lovelace", "account_type": "checking", "initial_balance": 12.34}\n'
+            '\n'
+            'not json\n'
+            '["a", "list"]\n'
+            '{"owner_name": "Alan Turing", "account_type": "savings"}\n'
+        )
+
+        result = self.importer.import_rows(read_jsonl(stream))
+
+        self.assertEqual(result, {'imported': 2, 'rejected': 2})
+        account = self.account_manager.search_accounts(owner_name_contains='Ada')[0]
+        self.assertEqual(account['balance'], Decimal('12.34'))
+
+        with self.assertRaises(ValueError):
+            self.importer.import_file(self._write('accounts.txt', ''))
+
+    def test_non_scalar_fields_reject_only_their_row(self):
+        """Test that lists and objects in JSON fields are rejected without failing the chunk"""
+        stream = io.StringIO(
+            '{"owner_name": "Ada Lovelace", "account_type": "checking"}\n'
+            '{"owner_name": "Alan Turing", "account_type": "savings", "email": {"work": "alan@example.com"}}\n'
+            '{"owner_name": ["Grace", "Hopper"], "account_type": "checking"}\n'
+            '{"owner_name": "Edsger Dijkstra", "account_type": "business", "initial_balance": true}\n'
+            '{"owner_name": "Barbara Liskov", "account_type": "savings", "initial_balance": "25"}\n'
+        )
+
+        importer = AccountImporter(self.test_db, chunk_size=10)
+        self.assertEqual(importer.import_rows(read_jsonl(stream)), {'imported': 2, 'rejected': 3})
+        self.assertEqual({account['owner_name'] for account in self.account_manager.get_all_accounts()},
+                         {'Ada Lovelace', 'Barbara Liskov'})
+
+    def test_failed_chunk_is_rejected(self):
+        """Test that a chunk whose insert fails is rejected without stopping the import"""
+        rows = [(line, {'owner_name': f'User {line}', 'account_type': 'checking'}) for line in range(1, 6)]
+
+        # Pre-take the number the second chunk will get so its insert hits the UNIQUE constraint
+        taken = self.importer.allocator._format(3)
+        self.test_db.execute_query(
+            "INSERT INTO accounts (account_number, owner_name, account_type, created_at, updated_at) "
+            "VALUES (?, 'Existing', 'checking', ?, ?)",
+            (taken, self.test_db.get_current_timestamp(), self.test_db.get_current_timestamp())
+        )
+
+        result = self.importer.import_rows(rows)
+
+        self.assertEqual(result, {'imported': 3, 'rejected': 2})
+        self.assertEqual(len(self.account_manager.get_all_accounts()), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+import unittest
+import os
+import sys
+import threading
+from pathlib import Path
+
+# Add the project root to the Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from src.account_numbers import AccountNumberAllocator, luhn_check_digit, is_valid_account_number
+from src.database import Database
+from test_config import DatabaseHelper, setup_test_database, cleanup_test_database
+
+
+class TestAccountNumberAllocator(unittest.TestCase):
+    """Test cases for block-allocated account numbers"""
+
+    def setUp(self):
+        """Set up test environment before each test"""
+        self.test_db = setup_test_database()
+
+    def tearDown(self):
+        """Clean up after each test"""
+        self.test_db.cleanup_test_db()
+        cleanup_test_database()
+
+    def _sequence_value(self, prefix):
+        row = self.test_db.execute_query(
+            "SELECT next_value FROM sequences WHERE name = ?", (f"account_number:{prefix}",), 'one'
+        )
+        return row['next_value'] if row else None
+
+    def test_check_digit(self):
+        """Test the Luhn check digit against a known value"""
+        self.assertEqual(luhn_check_digit('7992739871'), '3')
+        self.assertTrue(is_valid_account_number('79927398713'))
+        self.assertFalse(is_valid_account_number('79927398714'))
+        self.assertFalse(is_valid_account_number('TEST000001'))
+
+    def test_numbers_come_from_reserved_blocks(self):
+        """Test that numbers are sequential and the database is hit once per block"""
+        allocator = AccountNumberAllocator(self.test_db, block_size=10)
+        numbers = [allocator.next_number() for _ in range(25)]
+
+        self.assertEqual(numbers[0], '20000000016')
+        self.assertEqual(len(set(numbers)), 25)
+        self.assertTrue(all(is_valid_account_number(number) for number in numbers))
+        self.assertEqual(self._sequence_value('20'), 31)
+
+        # A second worker gets its own block, and other prefixes have their own sequence
+        other = AccountNumberAllocator(self.test_db, block_size=10)
+        self.assertEqual(other.next_number()[:10], '2000000031')
+        self.assertTrue(AccountNumberAllocator(self.test_db, prefix='31').next_number().startswith('3100000001'))
+
+        bulk = allocator.allocate(5)
+        self.assertEqual(len(set(bulk) | set(numbers)), 30)
+
+        with self.assertRaises(ValueError):
+            AccountNumberAllocator(self.test_db, prefix='AB')
+
+    def test_concurrent_workers(self):
+        """Test that threads sharing an allocator never get the same number"""
+        allocator = AccountNumberAllocator(self.test_db, block_size=50)
+        results = []
+
+        def worker():
+            numbers = [allocator.next_number() for _ in range(200)]
+            results.extend(numbers)
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(results), 800)
+        self.assertEqual(len(set(results)), 800)
+
+    def test_reservation_inside_transaction(self):
+        """Test that a rolled back reservation leaves no serials behind in memory"""
+        allocator = AccountNumberAllocator(self.test_db, block_size=100)
+
+        with self.assertRaises(RuntimeError):
+            with self.test_db.transaction():
+                first = allocator.next_number()
+                raise RuntimeError("Rolled back")
+
+        self.assertIsNone(self._sequence_value('20'))
+        self.assertEqual(allocator.next_number(), first)
+        self.assertEqual(self._sequence_value('20'), 101)
+
+    def test_create_account_uses_allocator(self):
+        """Test that accounts created in the same second get distinct numbers"""
+        db = Database(self.test_db.db_path)
+        try:
+            numbers = {db.generate_account_number() for _ in range(50)}
+            self.assertEqual(len(numbers), 50)
+            self.assertTrue(all(number.startswith('20') for number in numbers))
+        finally:
+            db.close_all()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+import unittest
+import warnings
+import os
+import sys
+from pathlib import Path
+
+# Add the project root to the Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from src.amortization import HAS_NUMPY, build_schedules, iter_schedules, monthly_payment
+
+
+class TestAmortization(unittest.TestCase):
+    """Test cases for the amortization schedule engine"""
+
+    def setUp(self):
+        """Set up a small portfolio of loans"""
+        self.principals = [10000.0, 2500.0, 1200.0]
+        self.rates = [6.0, 12.0, 0.0]
+        self.terms = [12, 24, 6]
+        self.loan_ids = [101, 102, 103]
+
+    def test_schedule_amortizes_to_zero(self):
+        """Test that each loan is repaid exactly over its term"""
+        schedule = build_schedules(self.principals, self.rates, self.terms, loan_ids=self.loan_ids, use_numpy=False)
+
+        self.assertEqual(len(schedule), sum(self.terms))
+        for loan_id, principal, rate, term in zip(self.loan_ids, self.principals, self.rates, self.terms):
+            rows = list(schedule.for_loan(loan_id).rows())
+            self.assertEqual([row['period'] for row in rows], list(range(1, term + 1)))
+            self.assertEqual(rows[-1]['balance'], 0.0)
+            self.assertAlmostEqual(sum(row['principal'] for row in rows), principal, places=1)
+            self.assertAlmostEqual(rows[0]['payment'], monthly_payment(principal, rate, term), places=2)
+
+        # 0% loans repay in equal parts with no interest
+        self.assertEqual(set(schedule.for_loan(103)['payment']), {200.0})
+
+    def test_extra_payments_and_rate_changes(self):
+        """Test that extra payments shorten a loan and rate changes reprice it"""
+        base = build_schedules([10000.0], [6.0], [12], use_numpy=False)
+        early = build_schedules([10000.0], [6.0], [12], extra_payments={0: {3: 4000.0}}, use_numpy=False)
+        repriced = build_schedules([10000.0], [6.0], [12], rate_changes={0: {7: 12.0}}, use_numpy=False)
+
+        self.assertLess(len(early), len(base))
+        self.assertEqual(early['extra_payment'][2], 4000.0)
+        self.assertEqual(early['balance'][-1], 0.0)
+        self.assertLess(sum(early['interest']), sum(base['interest']))
+
+        self.assertEqual(repriced['payment'][:6], base['payment'][:6])
+        self.assertGreater(repriced['payment'][6], base['payment'][6])
+        self.assertEqual(repriced['balance'][-1], 0.0)
+
+    def test_iter_schedules_streams_chunks(self):
+        """Test that loans are processed in bounded chunks"""
+        loans = [
+            {'loan_id': loan_id, 'loan_amount': principal, 'interest_rate': rate, 'term_months': term}
+            for loan_id, principal, rate, term in zip(self.loan_ids, self.principals, self.rates, self.terms)
+        ]
+
+        chunks = list(iter_schedules(loans, chunk_size=2, extra_payments={103: {1: 100.0}}))
+
+        self.assertEqual(len(chunks), 2)
+        self.assertEqual(sorted(set(chunks[0].to_dict()['loan_id'])), [101, 102])
+        self.assertEqual(chunks[1]['extra_payment'][0], 100.0)
+
+    def test_invalid_input(self):
+        """Test that bad loans are rejected"""
+        with self.assertRaises(ValueError):
+            build_schedules([1000.0], [5.0], [0])
+        with self.assertRaises(ValueError):
+            build_schedules([1000.0, 2000.0], [5.0], [12])
+
+    @unittest.skipUnless(HAS_NUMPY, "NumPy is not installed")
+    def test_numpy_matches_python(self):
+        """Test that the array paths agree with the plain Python loop"""
+        cases = [
+            {},
+            {'extra_payments': {101: {3: 4000.0}, 102: {1: 50.0, 10: 500.0}}},
+            {'rate_changes': {101: {7: 12.0}, 103: {2: 3.0}}},
+            # Loan 103 ends after 6 periods, so its change at period 7 never applies
+            {'rate_changes': {101: {7: 12.0}, 103: {7: 3.0}}},
+        ]
+        for events in cases:
+            expected = build_schedules(self.principals, self.rates, self.terms, loan_ids=self.loan_ids,
+                                       use_numpy=False, **events).to_dict()
+            with warnings.catch_warnings():
+                warnings.simplefilter('error', RuntimeWarning)
+                actual = build_schedules(self.principals, self.rates, self.terms, loan_ids=self.loan_ids,
+                                         use_numpy=True, **events).to_dict()
+
+            self.assertEqual(actual['loan_id'], expected['loan_id'])
+            self.assertEqual(actual['period'], expected['period'])
+            for name in ('payment', 'interest', 'principal', 'extra_payment', 'balance'):
+                for a, b in zip(actual[name], expected[name]):
+                    self.assertAlmostEqual(a, b, places=2)
+
+
+if __name__ == '__main__':
+    unittest.main()
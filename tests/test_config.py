@@ -13,7 +13,7 @@ from src.database import Database
 class DatabaseHelper(Database):
     """Test database class that uses a temporary database for testing"""
     
-    def __init__(self, db_path=None):
+    def __init__(self, db_path=None, **kwargs):
         """Initialize test database with a temporary file"""
         if db_path is None:
             # Create a temporary database file
@@ -24,7 +24,7 @@ class DatabaseHelper(Database):
         # Initialize counter for this specific database instance
         self._account_counter = 10000 + hash(db_path) % 100000  # Unique starting point
         
-        super().__init__(db_path)
+        super().__init__(db_path, **kwargs)
         
     def generate_account_number(self):
         """Generate a unique account number for testing"""
@@ -33,11 +33,15 @@ class DatabaseHelper(Database):
     
     def cleanup_test_db(self):
         """Clean up the test database file"""
-        if hasattr(self, '_test_db_path') and os.path.exists(self._test_db_path):
-            try:
-                os.unlink(self._test_db_path)
-            except Exception:
-                pass  # Ignore cleanup errors
+        self.close_all()
+        if hasattr(self, '_test_db_path'):
+            # WAL mode leaves -wal and -shm files next to the database
+            for path in (self._test_db_path, self._test_db_path + '-wal', self._test_db_path + '-shm'):
+                if os.path.exists(path):
+                    try:
+                        os.unlink(path)
+                    except Exception:
+                        pass  # Ignore cleanup errors
 
 
 def setup_test_database():
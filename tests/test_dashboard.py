@@ -0,0 +1,74 @@
+import unittest
+import os
+import sys
+from pathlib import Path
+
+# Add the project root to the Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from src.account import AccountManager
+from src.transaction import TransactionManager
+from src.loan import LoanManager
+from src.dashboard import DashboardStats
+from test_config import DatabaseHelper, setup_test_database, cleanup_test_database
+
+
+class TestDashboardStats(unittest.TestCase):
+    """Test cases for the dashboard counters"""
+
+    def setUp(self):
+        """Set up test environment before each test"""
+        self.test_db = setup_test_database()
+        self.account_manager = AccountManager(self.test_db)
+        self.transaction_manager = TransactionManager(self.test_db)
+        self.loan_manager = LoanManager(self.test_db)
+
+        account = self.account_manager.create_account('Dashboard User', 'checking', initial_balance=1000.0)
+        self.account_manager.create_account('Second User', 'savings')
+        self.transaction_manager.deposit(account['account_id'], 100.0)
+        self.transaction_manager.withdraw(account['account_id'], 50.0)
+
+        loan = self.loan_manager.apply_for_loan(account['account_id'], 1000.0, 5.0, 12)
+        self.loan_manager.approve_loan(loan['loan_id'])
+        self.loan_manager.apply_for_loan(account['account_id'], 500.0, 5.0, 6)
+
+        # Insert the bug directly so the tracker does not write to the shared bug log
+        now = self.test_db.get_current_timestamp()
+        self.test_db.execute_query(
+            "INSERT INTO bugs (title, description, severity, status, reported_date, last_updated) "
+            "VALUES ('Dashboard bug', 'Counts are wrong', 'low', 'open', ?, ?)",
+            (now, now)
+        )
+
+    def tearDown(self):
+        """Clean up after each test"""
+        self.test_db.cleanup_test_db()
+        cleanup_test_database()
+
+    def test_counts(self):
+        """Test that the counters match the data"""
+        stats = DashboardStats(self.test_db).get_stats()
+
+        self.assertEqual(stats['total_accounts'], 2)
+        self.assertEqual(stats['total_transactions'], 3)
+        self.assertEqual(stats['active_loans'], 1)
+        self.assertEqual(stats['loans_by_status'], {'active': 1, 'pending': 1})
+        self.assertEqual(stats['open_bugs'], 1)
+
+    def test_snapshot_is_cached(self):
+        """Test that the snapshot is reused until it expires or is invalidated"""
+        dashboard = DashboardStats(self.test_db, ttl=3600)
+        self.assertEqual(dashboard.get_stats()['total_accounts'], 2)
+
+        self.account_manager.create_account('Third User', 'checking')
+        self.assertEqual(dashboard.get_stats()['total_accounts'], 2)
+        self.assertEqual(dashboard.get_stats(refresh=True)['total_accounts'], 3)
+
+        self.account_manager.create_account('Fourth User', 'checking')
+        dashboard.invalidate()
+        self.assertEqual(dashboard.get_stats()['total_accounts'], 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,476 @@
+import unittest
+import os
+import sys
+import sqlite3
+import tempfile
+import threading
+from decimal import Decimal
+from pathlib import Path
+
+# Add the project root to the Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from src.database import ConnectionPool, Database
+from src.migrations import LATEST_VERSION, MIGRATIONS, SchemaMigrator
+from src.account import AccountManager
+from src.transaction import TransactionManager
+from src.loan import LoanManager
+from src.pagination import encode_cursor
+from src.statement_export import StatementExporter
+from src.account_import import AccountImporter
+from src.servicing import LoanServicingJob
+from test_config import DatabaseHelper, setup_test_database, cleanup_test_database
+
+
+class TestDatabase(unittest.TestCase):
+    """Test cases for the Database connection handling"""
+
+    def setUp(self):
+        """Set up test environment before each test"""
+        self.test_db = setup_test_database()
+
+    def tearDown(self):
+        """Clean up after each test"""
+        self.test_db.cleanup_test_db()
+        cleanup_test_database()
+
+    def test_connections_are_reused(self):
+        """Test that queries borrow the same pooled connection"""
+        with self.test_db.connection() as first:
+            pass
+        with self.test_db.connection() as second:
+            pass
+
+        self.assertIs(first, second)
+
+    def test_foreign_keys_enabled_on_pooled_connections(self):
+        """Test that pragmas are applied to every pooled connection"""
+        result = self.test_db.execute_query("PRAGMA foreign_keys", fetch_mode='one')
+        self.assertEqual(result[0], 1)
+
+    def test_default_pragma_profile(self):
+        """Test that the durable profile enables WAL with full syncs"""
+        with self.test_db.connection() as conn:
+            self.assertEqual(conn.execute("PRAGMA journal_mode").fetchone()[0], 'wal')
+            self.assertEqual(conn.execute("PRAGMA synchronous").fetchone()[0], 2)
+            self.assertEqual(conn.execute("PRAGMA busy_timeout").fetchone()[0], 5000)
+
+    def test_fast_pragma_profile_with_overrides(self):
+        """Test the fast profile and explicit pragma overrides"""
+        db = DatabaseHelper(pragma_profile='fast', pragmas={'cache_size': -2000})
+        try:
+            with db.connection() as conn:
+                self.assertEqual(conn.execute("PRAGMA synchronous").fetchone()[0], 1)
+                self.assertEqual(conn.execute("PRAGMA cache_size").fetchone()[0], -2000)
+        finally:
+            db.cleanup_test_db()
+
+    def test_invalid_pragma_profile(self):
+        """Test that unknown profiles and pragmas are rejected"""
+        with self.assertRaises(ValueError):
+            Database(self.test_db.db_path, pragma_profile='reckless')
+        with self.assertRaises(ValueError):
+            Database(self.test_db.db_path, pragmas={'writable_schema': 1})
+
+    def test_pool_is_bounded(self):
+        """Test that an exhausted pool times out instead of growing"""
+        pool = ConnectionPool(self.test_db._create_connection, size=1, timeout=0.1)
+        conn = pool.acquire()
+
+        with self.assertRaises(Exception):
+            pool.acquire()
+
+        pool.release(conn)
+        self.assertIs(pool.acquire(), conn)
+        pool.close_all()
+
+    def test_concurrent_queries(self):
+        """Test that several threads can share the pool"""
+        errors = []
+
+        def worker():
+            try:
+                for _ in range(20):
+                    self.test_db.execute_query("SELECT COUNT(*) FROM accounts", fetch_mode='one')
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertLessEqual(self.test_db.pool._created, self.test_db.pool.size)
+
+    def test_transaction_commits_once(self):
+        """Test that queries inside transaction() share one connection and commit together"""
+        now = self.test_db.get_current_timestamp()
+        insert = """
+            INSERT INTO accounts (account_number, owner_name, account_type, balance, created_at, updated_at)
+            VALUES (?, ?, 'checking', 0, ?, ?)
+        """
+
+        with self.test_db.transaction() as conn:
+            self.test_db.execute_query(insert, ('UOW1', 'First', now, now))
+            self.test_db.execute_query(insert, ('UOW2', 'Second', now, now))
+            self.assertTrue(conn.in_transaction)
+
+        result = self.test_db.execute_query("SELECT COUNT(*) AS count FROM accounts", fetch_mode='one')
+        self.assertEqual(result['count'], 2)
+
+    def test_transaction_rolls_back_on_error(self):
+        """Test that a failing unit of work leaves no partial writes"""
+        now = self.test_db.get_current_timestamp()
+        insert = """
+            INSERT INTO accounts (account_number, owner_name, account_type, balance, created_at, updated_at)
+            VALUES (?, ?, 'checking', 0, ?, ?)
+        """
+
+        with self.assertRaises(RuntimeError):
+            with self.test_db.transaction():
+                self.test_db.execute_query(insert, ('UOW1', 'First', now, now))
+                raise RuntimeError("boom")
+
+        result = self.test_db.execute_query("SELECT COUNT(*) AS count FROM accounts", fetch_mode='one')
+        self.assertEqual(result['count'], 0)
+        self.assertFalse(self.test_db.in_transaction)
+
+    def test_nested_transaction_uses_savepoint(self):
+        """Test that an inner failure only rolls back the inner block"""
+        now = self.test_db.get_current_timestamp()
+        insert = """
+            INSERT INTO accounts (account_number, owner_name, account_type, balance, created_at, updated_at)
+            VALUES (?, ?, 'checking', 0, ?, ?)
+        """
+
+        with self.test_db.transaction():
+            self.test_db.execute_query(insert, ('OUTER', 'Outer', now, now))
+            try:
+                with self.test_db.transaction():
+                    self.test_db.execute_query(insert, ('INNER', 'Inner', now, now))
+                    raise RuntimeError("inner failure")
+            except RuntimeError:
+                pass
+
+        rows = self.test_db.execute_query("SELECT account_number FROM accounts", fetch_mode='all')
+        self.assertEqual([row['account_number'] for row in rows], ['OUTER'])
+
+
+class TestMigrations(unittest.TestCase):
+    """Test cases for the schema migration engine"""
+
+    def setUp(self):
+        """Set up test environment before each test"""
+        self.test_db = setup_test_database()
+
+    def tearDown(self):
+        """Clean up after each test"""
+        self.test_db.cleanup_test_db()
+        cleanup_test_database()
+
+    def test_all_migrations_recorded(self):
+        """Test that a new database records every migration once"""
+        rows = self.test_db.execute_query("SELECT version FROM schema_version ORDER BY version", fetch_mode='all')
+        self.assertEqual([row['version'] for row in rows], [version for version, _, _ in MIGRATIONS])
+
+        with self.test_db.connection() as conn:
+            self.assertEqual(conn.execute("PRAGMA user_version").fetchone()[0], LATEST_VERSION)
+
+    def test_upgrade_is_idempotent(self):
+        """Test that an up-to-date database takes the fast path"""
+        self.assertEqual(SchemaMigrator(self.test_db).upgrade(), [])
+
+    def test_upgrade_legacy_database(self):
+        """Test upgrading a database created before the migration engine"""
+        with self.test_db.connection() as conn:
+            conn.execute("DROP TABLE schema_version")
+            conn.execute("DROP INDEX idx_transactions_account_date")
+            conn.execute("PRAGMA user_version = 0")
+
+        applied = SchemaMigrator(self.test_db).upgrade()
+
+        self.assertEqual(applied, [version for version, _, _ in MIGRATIONS])
+        index = self.test_db.execute_query(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND name = 'idx_transactions_account_date'",
+            fetch_mode='one'
+        )
+        self.assertIsNotNone(index)
+
+    def test_real_money_columns_converted_to_cents(self):
+        """Test that a database with REAL amounts is converted to integer cents"""
+        fd, path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+
+        # Build a database as it looked before the integer cent migration
+        conn = sqlite3.connect(path)
+        for version, _, migration in MIGRATIONS:
+            if version < 4:
+                migration(conn)
+        conn.execute(
+            "INSERT INTO accounts (account_number, owner_name, account_type, balance, created_at, updated_at) "
+            "VALUES ('LEGACY1', 'Legacy', 'checking', 10.1, '2024-01-01', '2024-01-01')"
+        )
+        conn.execute(
+            "INSERT INTO transactions (account_id, transaction_type, amount, transaction_date) "
+            "VALUES (1, 'deposit', 0.3, '2024-01-01')"
+        )
+        conn.commit()
+        conn.close()
+
+        db = DatabaseHelper(path)
+        try:
+            account = AccountManager(db).get_account(1)
+            self.assertEqual(account['balance'], Decimal('10.10'))
+            row = db.execute_query("SELECT typeof(amount) AS type, amount FROM transactions", fetch_mode='one')
+            self.assertEqual((row['type'], row['amount']), ('integer', 30))
+        finally:
+            db.close_all()
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(path + suffix):
+                    os.unlink(path + suffix)
+
+    def test_running_balances_backfilled(self):
+        """Test that existing ledger rows get balance_after and daily snapshots"""
+        fd, path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+
+        # Build a database as it looked before running balances were stored
+        conn = sqlite3.connect(path)
+        conn.execute("CREATE TABLE schema_version (version INTEGER PRIMARY KEY, description TEXT NOT NULL, applied_at TIMESTAMP NOT NULL)")
+        for version, description, migration in MIGRATIONS:
+            if version < 5:
+                migration(conn)
+                conn.execute("INSERT INTO schema_version VALUES (?, ?, '2024-01-01')", (version, description))
+        conn.execute(
+            "INSERT INTO accounts (account_number, owner_name, account_type, balance, created_at, updated_at) "
+            "VALUES ('LEGACY1', 'Legacy', 'checking', 12500, '2024-01-01', '2024-01-03')"
+        )
+        conn.executemany(
+            "INSERT INTO transactions (account_id, transaction_type, amount, transaction_date) VALUES (1, ?, ?, ?)",
+            [('deposit', 10000, '2024-01-01 09:00:00'), ('withdrawal', 2500, '2024-01-01 17:00:00'),
+             ('transfer_in', 5000, '2024-01-03 12:00:00')]
+        )
+        conn.commit()
+        conn.close()
+
+        db = DatabaseHelper(path)
+        try:
+            rows = db.execute_query("SELECT balance_after FROM transactions ORDER BY transaction_id", fetch_mode='all')
+            self.assertEqual([row['balance_after'] for row in rows], [10000, 7500, 12500])
+
+            statement = TransactionManager(db).get_statement_balances(1, '2024-01-02', '2024-01-03')
+            self.assertEqual(statement['opening_balance'], Decimal('75.00'))
+            self.assertEqual(statement['closing_balance'], Decimal('125.00'))
+        finally:
+            db.close_all()
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(path + suffix):
+                    os.unlink(path + suffix)
+
+    def test_loan_transactions_relinked(self):
+        """Test that loan ledger rows recorded before loan_id existed are relinked"""
+        fd, path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+
+        conn = sqlite3.connect(path)
+        conn.execute("CREATE TABLE schema_version (version INTEGER PRIMARY KEY, description TEXT NOT NULL, applied_at TIMESTAMP NOT NULL)")
+        for version, description, migration in MIGRATIONS:
+            if version < 8:
+                migration(conn)
+                conn.execute("INSERT INTO schema_version VALUES (?, ?, '2024-01-01')", (version, description))
+        conn.execute(
+            "INSERT INTO accounts (account_number, owner_name, account_type, balance, created_at, updated_at) "
+            "VALUES ('LEGACY1', 'Legacy', 'checking', 0, '2024-01-01', '2024-01-01')"
+        )
+        conn.execute(
+            "INSERT INTO loans (account_id, loan_amount, interest_rate, term_months, remaining_amount, status, application_date) "
+            "VALUES (1, 10000, 5.0, 12, 9000, 'active', '2024-01-01')"
+        )
+        conn.executemany(
+            "INSERT INTO transactions (account_id, transaction_type, amount, description, transaction_date) "
+            "VALUES (1, ?, ?, ?, '2024-01-02')",
+            [('deposit', 10000, 'Loan disbursement for loan #1'), ('withdrawal', 1000, 'Loan payment for loan #1'),
+             ('withdrawal', 500, 'Loan payment for loan #2'), ('deposit', 700, 'Salary')]
+        )
+        conn.commit()
+        conn.close()
+
+        db = DatabaseHelper(path)
+        try:
+            rows = db.execute_query("SELECT transaction_type, loan_id FROM transactions ORDER BY transaction_id", fetch_mode='all')
+            self.assertEqual(
+                [(row['transaction_type'], row['loan_id']) for row in rows],
+                [('loan_disbursement', 1), ('loan_payment', 1), ('withdrawal', None), ('deposit', None)]
+            )
+        finally:
+            db.close_all()
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(path + suffix):
+                    os.unlink(path + suffix)
+
+    def test_transaction_rollups_backfilled(self):
+        """Test that existing ledger rows are folded into daily rollups"""
+        fd, path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+
+        conn = sqlite3.connect(path)
+        conn.execute("CREATE TABLE schema_version (version INTEGER PRIMARY KEY, description TEXT NOT NULL, applied_at TIMESTAMP NOT NULL)")
+        for version, description, migration in MIGRATIONS:
+            if version < 11:
+                migration(conn)
+                conn.execute("INSERT INTO schema_version VALUES (?, ?, '2024-01-01')", (version, description))
+        conn.execute(
+            "INSERT INTO accounts (account_number, owner_name, account_type, balance, created_at, updated_at) "
+            "VALUES ('LEGACY1', 'Legacy', 'checking', 0, '2024-01-01', '2024-01-01')"
+        )
+        conn.executemany(
+            "INSERT INTO transactions (account_id, transaction_type, amount, transaction_date) VALUES (1, ?, ?, ?)",
+            [('deposit', 1000, '2024-01-01 09:00:00'), ('deposit', 300, '2024-01-01 17:00:00'),
+             ('withdrawal', 200, '2024-01-01 18:00:00'), ('deposit', 700, '2024-01-02 08:00:00')]
+        )
+        conn.commit()
+        conn.close()
+
+        db = DatabaseHelper(path)
+        try:
+            rows = db.execute_query(
+                "SELECT rollup_date, transaction_type, transaction_count, total, minimum, maximum "
+                "FROM transaction_rollups ORDER BY rollup_date, transaction_type", fetch_mode='all'
+            )
+            self.assertEqual([tuple(row) for row in rows], [
+                ('2024-01-01', 'deposit', 2, 1300, 300, 1000),
+                ('2024-01-01', 'withdrawal', 1, 200, 200, 200),
+                ('2024-01-02', 'deposit', 1, 700, 700, 700),
+            ])
+        finally:
+            db.close_all()
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(path + suffix):
+                    os.unlink(path + suffix)
+
+
+class TestQueryPlans(unittest.TestCase):
+    """Check that manager queries are served by indexes instead of full table scans"""
+
+    def setUp(self):
+        """Set up test environment with some data and a query recorder"""
+        self.test_db = setup_test_database()
+        self.account_manager = AccountManager(self.test_db)
+        self.transaction_manager = TransactionManager(self.test_db)
+        self.loan_manager = LoanManager(self.test_db)
+
+        account = self.account_manager.create_account('Plan User', 'checking', initial_balance=100.0)
+        self.account_id = account['account_id']
+        self.transaction_manager.deposit(self.account_id, 50.0)
+        self.loan_manager.apply_for_loan(self.account_id, 1000.0, 5.0, 12)
+
+        # Record every statement from here on, including those run on connections borrowed
+        # directly (batches, servicing chunks, imports and exports) rather than via execute_query
+        self.queries = []
+        self.recording = True
+        original_acquire = self.test_db.pool.acquire
+
+        def record(statement):
+            if self.recording and statement.lstrip().split(None, 1)[0].upper() in ('SELECT', 'UPDATE', 'DELETE'):
+                self.queries.append(statement)
+
+        def tracing_acquire():
+            conn = original_acquire()
+            conn.set_trace_callback(record)
+            return conn
+
+        self.test_db.pool.acquire = tracing_acquire
+
+    def tearDown(self):
+        """Clean up after each test"""
+        self.test_db.cleanup_test_db()
+        cleanup_test_database()
+
+    def assert_no_full_scans(self):
+        """Fail if any recorded query plan contains a bare table scan"""
+        self.recording = False
+        self.assertTrue(self.queries)
+        with self.test_db.connection() as conn:
+            tables = {row['name'] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+            # Statements are traced with their parameters inlined, so each is explained as is
+            for query in dict.fromkeys(self.queries):
+                plan = conn.execute(f"EXPLAIN QUERY PLAN {query}").fetchall()
+                for row in plan:
+                    detail = row['detail']
+                    # "SCAN table USING INDEX" walks an index in ORDER BY order, and scans of
+                    # subqueries or CTEs read results that were already narrowed down
+                    words = detail.split()
+                    if words[0] == 'SCAN' and words[1] in tables and 'INDEX' not in detail:
+                        self.fail(f"Full table scan ({detail}) for query: {' '.join(query.split())}")
+
+    def test_transaction_queries_use_indexes(self):
+        """Test transaction history, search and stats query plans"""
+        self.transaction_manager.get_account_transactions(self.account_id)
+        self.transaction_manager.get_account_transactions(self.account_id, transaction_type='deposit')
+        self.transaction_manager.search_transactions(account_id=self.account_id)
+        self.transaction_manager.search_transactions(transaction_type='deposit')
+        self.transaction_manager.search_transactions(start_date='2020-01-01', end_date='2030-01-01')
+        self.transaction_manager.search_transactions(description_contains='deposit')
+        self.transaction_manager.search_transactions(account_id=self.account_id, description_contains='dep',
+                                                     order_by='relevance')
+        self.transaction_manager.get_transaction_stats(account_id=self.account_id)
+        self.transaction_manager.get_transaction_stats(start_date='2020-01-01')
+        self.transaction_manager.get_transaction_stats(start_date='2020-01-01 12:00:00', end_date='2030-01-01 12:00:00')
+        self.transaction_manager.get_transaction_stats(self.account_id, '2020-01-01', '2020-01-01 12:00:00')
+        self.transaction_manager.get_balance_as_of(self.account_id, '2020-01-01')
+        self.transaction_manager.get_statement_balances(self.account_id, '2020-01-01', '2030-01-01')
+        self.transaction_manager.reconcile_balance(self.account_id)
+
+        exporter = StatementExporter(self.test_db, batch_size=1)
+        list(exporter.iter_batches(self.account_id, start_date='2020-01-01'))
+        list(exporter.iter_batches(start_date='2020-01-01', end_date='2030-01-01'))
+
+        self.assert_no_full_scans()
+
+    def test_batch_queries_use_indexes(self):
+        """Test the plans of bulk paths that run on their own connection"""
+        other = self.account_manager.create_account('Plan Payee', 'savings')
+        self.transaction_manager.apply_batch([
+            {'type': 'deposit', 'account_id': self.account_id, 'amount': 10},
+            {'type': 'transfer', 'account_id': self.account_id, 'to_account_id': other['account_id'], 'amount': 5}
+        ])
+
+        AccountImporter(self.test_db).import_rows([(1, {'owner_name': 'Imported User', 'account_type': 'savings'})])
+
+        self.loan_manager.approve_loan(1)
+        self.loan_manager.set_autopay(1)
+        LoanServicingJob(self.test_db).run('2030-01-01')
+
+        exporter = StatementExporter(self.test_db, batch_size=1)
+        list(exporter.iter_batches(self.account_id))
+
+        self.assert_no_full_scans()
+
+    def test_loan_queries_use_indexes(self):
+        """Test loan listing query plans"""
+        self.loan_manager.get_account_loans(self.account_id)
+        self.loan_manager.get_all_loans(status='pending')
+        self.loan_manager.get_all_loans()
+        self.loan_manager.list_loans_with_accounts()
+        self.loan_manager.list_loans_with_accounts(status='pending')
+        self.transaction_manager.get_loan_transactions(1, transaction_type='loan_payment')
+        self.loan_manager.list_loans_with_accounts(cursor=encode_cursor('2030-01-01', 1))
+
+        self.assert_no_full_scans()
+
+    def test_account_queries_use_indexes(self):
+        """Test account lookup, listing and summary query plans"""
+        self.account_manager.get_account(self.account_id)
+        self.account_manager.get_all_accounts()
+        self.account_manager.search_accounts(created_after='2020-01-01')
+        self.account_manager.get_account_summary(self.account_id)
+        self.account_manager.search_accounts_by_prefix('Plan')
+
+        self.assert_no_full_scans()
+
+
+if __name__ == '__main__':
+    unittest.main()
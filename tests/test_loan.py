@@ -1,6 +1,7 @@
 import unittest
 import os
 import sys
+from decimal import Decimal
 from pathlib import Path
 
 # Add the project root to the Python path
@@ -10,6 +11,7 @@ sys.path.insert(0, str(Path(__file__).parent))
 from src.account import AccountManager
 from src.transaction import TransactionManager
 from src.loan import LoanManager
+from src.pagination import encode_cursor
 from test_config import DatabaseHelper, setup_test_database, cleanup_test_database
 
 
@@ -37,7 +39,7 @@ class TestLoanManager(unittest.TestCase):
           # Sample loan data
         self.loan_data = {
             'account_id': self.account['account_id'],
-            'loan_amount': 5000.0,
+            'loan_amount': Decimal('5000.00'),
             'interest_rate': 5.5,
             'term_months': 12
         }
@@ -95,7 +97,8 @@ class TestLoanManager(unittest.TestCase):
         # Verify transaction was created
         transactions = self.transaction_manager.get_account_transactions(self.account['account_id'])
         self.assertTrue(any(
-            t['transaction_type'] == 'deposit' and 
+            t['transaction_type'] == 'loan_disbursement' and 
+            t['loan_id'] == loan['loan_id'] and
             t['amount'] == self.loan_data['loan_amount'] and
             'Loan disbursement' in t['description']
             for t in transactions
@@ -123,7 +126,7 @@ class TestLoanManager(unittest.TestCase):
         approved_loan = self.loan_manager.approve_loan(loan['loan_id'])
         
         # Make a payment
-        payment_amount = 500.0
+        payment_amount = Decimal('500.00')
         payment_result = self.loan_manager.make_payment(approved_loan['loan_id'], payment_amount)
         
         # Verify payment was applied to loan
@@ -135,7 +138,8 @@ class TestLoanManager(unittest.TestCase):
         # Verify transaction was created
         transactions = self.transaction_manager.get_account_transactions(self.account['account_id'])
         self.assertTrue(any(
-            t['transaction_type'] == 'withdrawal' and 
+            t['transaction_type'] == 'loan_payment' and 
+            t['loan_id'] == loan['loan_id'] and
             t['amount'] == payment_amount and
             'Loan payment' in t['description']
             for t in transactions
@@ -181,6 +185,59 @@ class TestLoanManager(unittest.TestCase):
             # Using assertAlmostEqual with a small delta to account for rounding differences
             self.assertAlmostEqual(payment, expected_payment, delta=0.1)
 
+    
+    def test_list_loans_with_accounts(self):
+        """Test the joined, paginated loan listing"""
+        other = self.account_manager.create_account('Other User', 'savings')
+        
+        created = [self.loan_manager.apply_for_loan(**self.loan_data) for _ in range(3)]
+        created.append(self.loan_manager.apply_for_loan(other['account_id'], 1000.0, 4.0, 6))
+        self.loan_manager.reject_loan(created[0]['loan_id'])
+        
+        # Walk every page and check account details are joined in
+        seen = []
+        cursor = None
+        while True:
+            page = self.loan_manager.list_loans_with_accounts(cursor=cursor, limit=3)
+            seen.extend(page['loans'])
+            cursor = page['next_cursor']
+            if cursor is None:
+                break
+        
+        self.assertEqual([loan['loan_id'] for loan in seen], [loan['loan_id'] for loan in reversed(created)])
+        self.assertEqual(seen[0]['owner_name'], 'Other User')
+        self.assertEqual(seen[-1]['account_number'], self.account['account_number'])
+        
+        # Status and account filters are applied in the query
+        pending = self.loan_manager.list_loans_with_accounts(status='pending', account_id=self.account['account_id'])
+        self.assertEqual(len(pending['loans']), 2)
+        self.assertIsNone(pending['next_cursor'])
+        
+        # A tampered cursor is a ValueError, which the loans page reports instead of failing
+        for tampered in ('not-a-cursor', encode_cursor("2026", [1]), encode_cursor({}, 1)):
+            with self.assertRaises(ValueError):
+                self.loan_manager.list_loans_with_accounts(cursor=tampered)
+
+    
+    def test_loan_transactions_are_linked(self):
+        """Test that disbursements and payments are linked to their loan"""
+        loan = self.loan_manager.apply_for_loan(**self.loan_data)
+        self.loan_manager.approve_loan(loan['loan_id'])
+        self.loan_manager.make_payment(loan['loan_id'], 250.0)
+        self.loan_manager.make_payment(loan['loan_id'], 100.0)
+        
+        # A second loan on the same account must not leak into the history
+        other = self.loan_manager.apply_for_loan(**self.loan_data)
+        self.loan_manager.approve_loan(other['loan_id'])
+        
+        history = self.transaction_manager.get_loan_transactions(loan['loan_id'])
+        self.assertEqual(
+            [t['transaction_type'] for t in history],
+            ['loan_disbursement', 'loan_payment', 'loan_payment']
+        )
+        
+        summary = self.loan_manager.get_loan_summary(loan['loan_id'])
+        self.assertEqual([p['amount'] for p in summary['payments_made']], [Decimal('250.00'), Decimal('100.00')])
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
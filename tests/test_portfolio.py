@@ -0,0 +1,123 @@
+import unittest
+import os
+import sys
+import datetime
+from decimal import Decimal
+from pathlib import Path
+
+# Add the project root to the Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from src.account import AccountManager
+from src.loan import LoanManager
+from src.portfolio import LoanPortfolio
+from src.servicing import LoanServicingJob
+from src.amortization import monthly_payment
+from test_config import DatabaseHelper, setup_test_database, cleanup_test_database
+
+
+class TestLoanPortfolio(unittest.TestCase):
+    """Test cases for the portfolio loan analytics"""
+
+    def setUp(self):
+        """Set up a few loans in different states"""
+        self.test_db = setup_test_database()
+        self.account_manager = AccountManager(self.test_db)
+        self.loan_manager = LoanManager(self.test_db)
+
+        self.account = self.account_manager.create_account('Portfolio User', 'checking', initial_balance=5000.0)
+        account_id = self.account['account_id']
+
+        self.short_loan = self.loan_manager.apply_for_loan(account_id, 1200.0, 0.0, 12)
+        self.long_loan = self.loan_manager.apply_for_loan(account_id, 10000.0, 6.0, 48)
+        self.pending_loan = self.loan_manager.apply_for_loan(account_id, 500.0, 5.0, 72)
+        self.loan_manager.approve_loan(self.short_loan['loan_id'])
+        self.loan_manager.approve_loan(self.long_loan['loan_id'])
+        self.loan_manager.make_payment(self.long_loan['loan_id'], 1000.0)
+
+        # Pin the schedule dates so delinquency does not depend on today's date
+        self.test_db.execute_query(
+            "UPDATE loans SET start_date = '2026-01-10 09:00:00', last_payment_date = NULL WHERE loan_id = ?",
+            (self.short_loan['loan_id'],)
+        )
+        self.test_db.execute_query(
+            "UPDATE loans SET start_date = '2026-01-10 09:00:00', last_payment_date = '2026-03-05 09:00:00' "
+            "WHERE loan_id = ?",
+            (self.long_loan['loan_id'],)
+        )
+
+        self.portfolio = LoanPortfolio(self.test_db, chunk_size=1)
+
+    def tearDown(self):
+        """Clean up after each test"""
+        self.test_db.cleanup_test_db()
+        cleanup_test_database()
+
+    def test_exposure(self):
+        """Test exposure grouped by status and term bucket"""
+        exposure = {(row['status'], row['term_bucket']): row for row in self.portfolio.get_exposure()}
+
+        self.assertEqual(set(exposure), {('active', '0-12'), ('active', '37-60'), ('pending', '61+')})
+        self.assertEqual(exposure[('active', '37-60')]['outstanding'], Decimal('9000.00'))
+        self.assertEqual(exposure[('active', '37-60')]['principal'], Decimal('10000.00'))
+        self.assertEqual(exposure[('pending', '61+')]['loan_count'], 1)
+
+    def test_delinquent_loans(self):
+        """Test that overdue payments are found relative to the as-of date"""
+        delinquent = self.portfolio.get_delinquent_loans(as_of='2026-04-20')
+
+        self.assertEqual([loan['loan_id'] for loan in delinquent],
+                         [self.short_loan['loan_id'], self.long_loan['loan_id']])
+        self.assertEqual(delinquent[0]['due_date'], '2026-02-10')
+        self.assertEqual(delinquent[0]['days_past_due'], 69)
+        self.assertEqual(delinquent[0]['missed_payments'], 3)
+        self.assertEqual(delinquent[1]['due_date'], '2026-04-05')
+        self.assertEqual(delinquent[1]['missed_payments'], 1)
+
+        # A grace period keeps recently due loans out
+        graced = self.portfolio.get_delinquent_loans(as_of='2026-04-20', grace_days=30)
+        self.assertEqual([loan['loan_id'] for loan in graced], [self.short_loan['loan_id']])
+
+        summary = {row['bucket']: row for row in self.portfolio.get_delinquency_summary(as_of='2026-04-20')}
+        self.assertEqual(summary['1-30']['outstanding'], Decimal('9000.00'))
+        self.assertEqual(summary['61-90']['loan_count'], 1)
+
+    def test_projected_cash_flow(self):
+        """Test projected inflows over the remaining terms of active loans"""
+        cash_flow = self.portfolio.get_projected_cash_flow(months=3, as_of=datetime.date(2026, 4, 20))
+
+        self.assertEqual([month['month'] for month in cash_flow], ['2026-05', '2026-06', '2026-07'])
+
+        # Both loans have three whole months behind them on the as-of date
+        expected = monthly_payment(1200.0, 0.0, 9) + monthly_payment(9000.0, 6.0, 45)
+        self.assertAlmostEqual(float(cash_flow[0]['expected_inflow']), expected, places=1)
+        self.assertEqual(cash_flow[0]['interest'], Decimal('45.00'))
+        self.assertEqual(cash_flow[0]['expected_inflow'], cash_flow[0]['interest'] + cash_flow[0]['principal'])
+
+        with self.assertRaises(ValueError):
+            self.portfolio.get_projected_cash_flow(months=0)
+
+    def test_results_cached_until_loans_change(self):
+        """Test that results are reused until a loan write or an explicit invalidation"""
+        before = self.portfolio.get_exposure()
+
+        # Changes made behind LoanManager's back are only seen after invalidate()
+        self.test_db.execute_query("UPDATE loans SET remaining_amount = 0 WHERE loan_id = ?",
+                                   (self.short_loan['loan_id'],))
+        self.assertEqual(self.portfolio.get_exposure(), before)
+        self.portfolio.invalidate()
+        self.assertNotEqual(self.portfolio.get_exposure(), before)
+
+        # Loan writes bump the loan book version, so the next read recomputes
+        self.loan_manager.reject_loan(self.pending_loan['loan_id'])
+        statuses = {row['status'] for row in self.portfolio.get_exposure()}
+        self.assertEqual(statuses, {'active', 'rejected'})
+
+        version = self.loan_manager.get_loan_book_version()
+        LoanServicingJob(self.test_db).run('2026-02-09')
+        self.assertGreater(self.loan_manager.get_loan_book_version(), version)
+
+
+if __name__ == '__main__':
+    unittest.main()
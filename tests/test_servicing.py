@@ -0,0 +1,154 @@
+import unittest
+import os
+import sys
+from decimal import Decimal
+from pathlib import Path
+from unittest import mock
+
+# Add the project root to the Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from src.account import AccountManager
+from src.transaction import TransactionManager
+from src.loan import LoanManager
+from src.servicing import LoanServicingJob
+from test_config import DatabaseHelper, setup_test_database, cleanup_test_database
+
+
+class TestLoanServicingJob(unittest.TestCase):
+    """Test cases for the batch loan servicing job"""
+
+    def setUp(self):
+        """Set up an account with active loans on a pinned schedule"""
+        self.test_db = setup_test_database()
+        self.account_manager = AccountManager(self.test_db)
+        self.transaction_manager = TransactionManager(self.test_db)
+        self.loan_manager = LoanManager(self.test_db)
+
+        self.account = self.account_manager.create_account('Servicing User', 'checking', initial_balance=5000.0)
+        self.loans = []
+        for amount in (10000.0, 2000.0, 1200.0):
+            loan = self.loan_manager.apply_for_loan(self.account['account_id'], amount, 6.0, 12)
+            self.loan_manager.approve_loan(loan['loan_id'])
+            self.loans.append(loan['loan_id'])
+
+        # Pin the start date so accrual and due dates do not depend on today
+        self.test_db.execute_query("UPDATE loans SET start_date = '2026-01-10 09:00:00'")
+
+    def tearDown(self):
+        """Clean up after each test"""
+        self.test_db.cleanup_test_db()
+        cleanup_test_database()
+
+    def test_accrual_is_idempotent(self):
+        """Test that interest accrues once per day elapsed"""
+        job = LoanServicingJob(self.test_db, chunk_size=2)
+
+        result = job.run('2026-02-09')
+        self.assertEqual(result['accrued'], 3)
+
+        # 30 days of 6% simple interest on 10,000.00
+        loan = self.loan_manager.get_loan(self.loans[0])
+        self.assertEqual(loan['remaining_amount'], Decimal('10049.32'))
+        self.assertEqual(loan['last_accrual_date'], '2026-02-09')
+
+        self.assertEqual(job.run('2026-02-09')['accrued'], 0)
+        self.assertEqual(self.loan_manager.get_loan(self.loans[0])['remaining_amount'], Decimal('10049.32'))
+
+    def test_autopay_collects_due_payments(self):
+        """Test that enrolled loans are debited once when due"""
+        self.loan_manager.set_autopay(self.loans[0])
+        self.loan_manager.set_autopay(self.loans[1])
+        balance_before = self.account_manager.get_account(self.account['account_id'])['balance']
+
+        job = LoanServicingJob(self.test_db)
+        self.assertEqual(job.run('2026-02-09')['collected'], 0)
+
+        result = job.run('2026-02-10')
+        self.assertEqual(result['collected'], 2)
+        self.assertEqual(result['collected_amount'], Decimal('1032.79'))
+
+        account = self.account_manager.get_account(self.account['account_id'])
+        self.assertEqual(account['balance'], balance_before - Decimal('1032.79'))
+
+        payments = self.transaction_manager.get_loan_transactions(self.loans[0], transaction_type='loan_payment')
+        self.assertEqual([p['amount'] for p in payments], [Decimal('860.66')])
+        self.assertEqual(payments[0]['balance_after'], balance_before - Decimal('860.66'))
+
+        loan = self.loan_manager.get_loan(self.loans[0])
+        self.assertEqual(loan['last_payment_date'], '2026-02-10 00:00:00')
+
+        # Payments are posted on the day they are collected and counted in that day's rollup
+        posted_on = payments[0]['transaction_date'][:10]
+        self.assertEqual(posted_on, self.test_db.get_current_timestamp().date().isoformat())
+        rollup = self.test_db.execute_query(
+            "SELECT transaction_count FROM transaction_rollups WHERE rollup_date = ? AND transaction_type = 'loan_payment'",
+            (posted_on,), 'one'
+        )
+        self.assertEqual(rollup['transaction_count'], 2)
+
+        # The third loan is not enrolled, and a re-run collects nothing more
+        self.assertEqual(self.transaction_manager.get_loan_transactions(self.loans[2], 'loan_payment'), [])
+        self.assertEqual(job.run('2026-02-10')['collected'], 0)
+
+    def test_back_dated_run_keeps_ledger_in_order(self):
+        """Test that servicing a past date after a later deposit leaves the ledger consistent"""
+        account_id = self.account['account_id']
+        self.loan_manager.set_autopay(self.loans[0])
+        self.transaction_manager.deposit(account_id, 1300.0)
+
+        result = LoanServicingJob(self.test_db).run('2026-02-10')
+        self.assertEqual(result['collected'], 1)
+
+        account = self.account_manager.get_account(account_id)
+        self.assertTrue(self.transaction_manager.reconcile_balance(account_id)['matches'])
+        self.assertEqual(self.transaction_manager.get_balance_as_of(account_id, '2099-01-01'), account['balance'])
+        today = self.test_db.get_current_timestamp().date()
+        balances = self.transaction_manager.get_statement_balances(account_id, today, today)
+        self.assertEqual(balances['closing_balance'], account['balance'])
+
+    def test_autopay_insufficient_funds_and_default(self):
+        """Test that unpaid loans are reported and eventually defaulted"""
+        self.account_manager.update_balance(self.account['account_id'], 10.0)
+        self.loan_manager.set_autopay(self.loans[0])
+
+        job = LoanServicingJob(self.test_db)
+        result = job.run('2026-02-10')
+        self.assertEqual(result['autopay_failed'], [self.loans[0]])
+        self.assertEqual(result['defaulted'], 0)
+
+        # 90 days past the 2026-02-10 due date
+        result = job.run('2026-05-12')
+        self.assertEqual(result['defaulted'], 3)
+        self.assertEqual(self.loan_manager.get_loan(self.loans[0])['status'], 'defaulted')
+
+    def test_interrupted_run_resumes(self):
+        """Test that a failed run resumes after the last committed chunk"""
+        job = LoanServicingJob(self.test_db, chunk_size=1)
+        original = job._accrue_chunk
+
+        def fail_on_second_loan(conn, business_date, first_after, last_loan_id, summary):
+            if last_loan_id == self.loans[1]:
+                raise RuntimeError("Interrupted")
+            original(conn, business_date, first_after, last_loan_id, summary)
+
+        with mock.patch.object(job, '_accrue_chunk', side_effect=fail_on_second_loan):
+            with self.assertRaises(RuntimeError):
+                job.run('2026-02-09')
+
+        checkpoints = {row['step']: row for row in job.get_checkpoints('2026-02-09')}
+        self.assertEqual(checkpoints['accrue']['last_loan_id'], self.loans[0])
+        self.assertIsNone(checkpoints['accrue']['completed_at'])
+
+        result = job.run('2026-02-09')
+        self.assertEqual(result['accrued'], 2)
+        self.assertEqual(self.loan_manager.get_loan(self.loans[0])['remaining_amount'], Decimal('10049.32'))
+
+        checkpoints = job.get_checkpoints('2026-02-09')
+        self.assertEqual([row['step'] for row in checkpoints], ['accrue', 'autopay', 'default'])
+        self.assertTrue(all(row['completed_at'] for row in checkpoints))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import unittest
+import os
+import sys
+import csv
+import io
+import json
+import datetime
+from decimal import Decimal
+from pathlib import Path
+
+# Add the project root to the Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from src.account import AccountManager
+from src.transaction import TransactionManager
+from src.statement_export import EXPORT_COLUMNS, HAS_PYARROW, StatementExporter
+from test_config import DatabaseHelper, setup_test_database, cleanup_test_database
+
+
+class TestStatementExporter(unittest.TestCase):
+    """Test cases for streaming ledger exports"""
+
+    def setUp(self):
+        """Set up two accounts with some history"""
+        self.test_db = setup_test_database()
+        self.account_manager = AccountManager(self.test_db)
+        self.transaction_manager = TransactionManager(self.test_db)
+
+        self.account = self.account_manager.create_account('Export User', 'business', initial_balance=100.0)
+        self.other = self.account_manager.create_account('Other User', 'checking', initial_balance=100.0)
+        for amount in (10.0, 20.0, 30.0, 40.0, 50.0):
+            self.transaction_manager.deposit(self.account['account_id'], amount, f"Deposit, \"{amount}\"")
+        self.transaction_manager.transfer(self.account['account_id'], self.other['account_id'], 5.0)
+
+        self.exporter = StatementExporter(self.test_db, batch_size=2)
+
+    def tearDown(self):
+        """Clean up after each test"""
+        self.test_db.cleanup_test_db()
+        cleanup_test_database()
+
+    def test_csv_export_streams_in_batches(self):
+        """Test that the CSV export covers every row, oldest first"""
+        chunks = list(self.exporter.iter_csv(self.account['account_id']))
+
+        # Header plus three batches of at most two rows
+        self.assertEqual(len(chunks), 4)
+        rows = list(csv.DictReader(io.StringIO(''.join(chunks))))
+        self.assertEqual(tuple(rows[0].keys()), EXPORT_COLUMNS)
+        self.assertEqual([row['amount'] for row in rows], ['10.00', '20.00', '30.00', '40.00', '50.00', '5.00'])
+        self.assertEqual(rows[0]['description'], 'Deposit, "10.0"')
+        self.assertEqual(rows[-1]['transaction_type'], 'transfer_out')
+        self.assertEqual(rows[-1]['balance_after'], '245.00')
+
+    def test_jsonl_export_and_filters(self):
+        """Test JSON Lines output and the date range filter"""
+        records = [json.loads(line) for line in ''.join(self.exporter.iter_jsonl()).splitlines()]
+        self.assertEqual(len(records), 7)
+        self.assertEqual({record['account_id'] for record in records},
+                         {self.account['account_id'], self.other['account_id']})
+
+        today = datetime.date.today()
+        self.assertEqual(len(list(self.exporter.iter_jsonl(end_date=today - datetime.timedelta(days=1)))), 0)
+        self.assertEqual(sum(len(batch) for batch in self.exporter.iter_batches(start_date=today, end_date=today)), 7)
+
+        with self.assertRaises(ValueError):
+            self.exporter.iter_csv(start_date='not a date')
+
+    def test_export_to_file(self):
+        """Test writing an export to an open file"""
+        buffer = io.StringIO()
+        count = self.exporter.export(buffer, 'jsonl', account_id=self.other['account_id'])
+
+        self.assertEqual(count, 1)
+        record = json.loads(buffer.getvalue())
+        self.assertEqual(record['transaction_type'], 'transfer_in')
+        self.assertEqual(Decimal(record['amount']), Decimal('5.00'))
+
+        with self.assertRaises(ValueError):
+            self.exporter.export(buffer, 'xml')
+
+    @unittest.skipIf(HAS_PYARROW, "pyarrow is installed")
+    def test_parquet_requires_pyarrow(self):
+        """Test that Parquet export explains the missing dependency"""
+        with self.assertRaises(ValueError):
+            self.exporter.export(io.BytesIO(), 'parquet')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,9 @@
 import unittest
 import os
 import sys
+import datetime
+from decimal import Decimal
+from unittest import mock
 from pathlib import Path
 
 # Add the project root to the Python path
@@ -9,6 +12,7 @@ sys.path.insert(0, str(Path(__file__).parent))
 
 from src.account import AccountManager
 from src.transaction import TransactionManager
+from src.pagination import encode_cursor
 from test_config import DatabaseHelper, setup_test_database, cleanup_test_database
 
 
@@ -58,7 +62,7 @@ class TestTransactionManager(unittest.TestCase):
     def test_deposit(self):
         """Test deposit functionality"""
         # Deposit amount
-        amount = 500.0
+        amount = Decimal('500.00')
         description = "Test deposit"
         
         # Perform deposit
@@ -81,7 +85,7 @@ class TestTransactionManager(unittest.TestCase):
     def test_withdraw(self):
         """Test withdrawal functionality"""
         # Withdrawal amount
-        amount = 300.0
+        amount = Decimal('300.00')
         description = "Test withdrawal"
         
         # Perform withdrawal
@@ -104,7 +108,7 @@ class TestTransactionManager(unittest.TestCase):
     def test_withdraw_insufficient_funds(self):
         """Test withdrawal with insufficient funds"""
         # Withdrawal amount larger than balance
-        amount = self.account1['balance'] + 100.0
+        amount = self.account1['balance'] + 100
         
         # Attempt withdrawal should raise an error
         with self.assertRaises(ValueError):
@@ -121,7 +125,7 @@ class TestTransactionManager(unittest.TestCase):
     def test_transfer(self):
         """Test transfer between accounts"""
         # Transfer amount
-        amount = 200.0
+        amount = Decimal('200.00')
         description = "Test transfer"
         
         # Perform transfer
@@ -162,6 +166,272 @@ class TestTransactionManager(unittest.TestCase):
         self.assertEqual(transaction_types.count('deposit'), 2)
         self.assertEqual(transaction_types.count('withdrawal'), 1)
 
+    
+    def test_transfer_is_atomic(self):
+        """Test that a failed transfer leaves both balances unchanged"""
+        original_record = self.transaction_manager.record_transaction
+        calls = []
+        
+        def failing_record(**kwargs):
+            calls.append(kwargs)
+            if len(calls) == 2:
+                raise Exception("Simulated failure recording incoming leg")
+            return original_record(**kwargs)
+        
+        self.transaction_manager.record_transaction = failing_record
+        
+        with self.assertRaises(Exception):
+            self.transaction_manager.transfer(
+                self.account1['account_id'],
+                self.account2['account_id'],
+                200.0
+            )
+        
+        # Verify nothing from the failed transfer was committed
+        updated_account1 = self.account_manager.get_account(self.account1['account_id'])
+        updated_account2 = self.account_manager.get_account(self.account2['account_id'])
+        self.assertEqual(updated_account1['balance'], self.account1['balance'])
+        self.assertEqual(updated_account2['balance'], self.account2['balance'])
+        self.assertEqual(self.transaction_manager.get_account_transactions(self.account1['account_id']), [])
+
+    
+    def test_amounts_are_exact(self):
+        """Test that amounts are stored as integer cents and summed exactly"""
+        for _ in range(10):
+            self.transaction_manager.deposit(self.account1['account_id'], 0.1)
+        
+        updated_account = self.account_manager.get_account(self.account1['account_id'])
+        self.assertEqual(updated_account['balance'], Decimal('1001.00'))
+        
+        stats = self.transaction_manager.get_transaction_stats(account_id=self.account1['account_id'])
+        self.assertEqual(stats[0]['total'], Decimal('1.00'))
+        self.assertEqual(stats[0]['average'], Decimal('0.10'))
+        
+        # Storage holds integer minor units
+        row = self.test_db.execute_query(
+            "SELECT typeof(balance) AS type, balance FROM accounts WHERE account_id = ?",
+            (self.account1['account_id'],), 'one'
+        )
+        self.assertEqual((row['type'], row['balance']), ('integer', 100100))
+
+    
+    def test_apply_batch(self):
+        """Test a mixed batch where some operations fail"""
+        operations = [
+            {'type': 'deposit', 'account_id': self.account1['account_id'], 'amount': '100.00'},
+            {'type': 'withdrawal', 'account_id': self.account2['account_id'], 'amount': '5000.00'},
+            {'type': 'transfer', 'account_id': self.account1['account_id'],
+             'to_account_id': self.account2['account_id'], 'amount': '250.00'},
+            {'type': 'deposit', 'account_id': 999999, 'amount': '10.00'},
+            {'type': 'refund', 'account_id': self.account1['account_id'], 'amount': '1.00'},
+            {'type': 'withdrawal', 'account_id': self.account2['account_id'], 'amount': '50.00'},
+        ]
+        
+        # A small chunk size exercises several transactions
+        result = self.transaction_manager.apply_batch(operations, chunk_size=2)
+        
+        self.assertEqual(sorted(item['index'] for item in result['succeeded']), [0, 2, 5])
+        self.assertEqual(sorted(item['index'] for item in result['failed']), [1, 3, 4])
+        
+        # Verify balances reflect only the successful operations
+        updated_account1 = self.account_manager.get_account(self.account1['account_id'])
+        updated_account2 = self.account_manager.get_account(self.account2['account_id'])
+        self.assertEqual(updated_account1['balance'], Decimal('850.00'))
+        self.assertEqual(updated_account2['balance'], Decimal('700.00'))
+        
+        # Verify ledger rows and reported transaction ids
+        transfer = next(item for item in result['succeeded'] if item['index'] == 2)
+        self.assertEqual(len(transfer['transaction_ids']), 2)
+        outgoing = self.transaction_manager.get_transaction(transfer['transaction_ids'][0])
+        incoming = self.transaction_manager.get_transaction(transfer['transaction_ids'][1])
+        self.assertEqual(outgoing['transaction_type'], 'transfer_out')
+        self.assertEqual(incoming['transaction_type'], 'transfer_in')
+        self.assertEqual(incoming['amount'], Decimal('250.00'))
+        self.assertEqual(len(self.transaction_manager.get_account_transactions(self.account2['account_id'])), 2)
+
+    def test_apply_batch_malformed_operations(self):
+        """Test that malformed operations fail one by one instead of aborting the chunk"""
+        account_id = self.account1['account_id']
+        operations = [
+            {'type': 'deposit', 'account_id': [account_id], 'amount': '1.00'},
+            {'type': 'deposit', 'account_id': None, 'amount': '1.00'},
+            {'type': 'transfer', 'account_id': account_id, 'to_account_id': {'id': 2}, 'amount': '1.00'},
+            None,
+            {'type': 'deposit', 'account_id': str(account_id), 'amount': '1.00'},
+        ]
+
+        result = self.transaction_manager.apply_batch(operations)
+
+        self.assertEqual([item['index'] for item in result['failed']], [0, 1, 2, 3])
+        self.assertEqual([item['index'] for item in result['succeeded']], [4])
+        self.assertEqual(self.account_manager.get_account(account_id)['balance'], Decimal('1001.00'))
+
+    def test_keyset_pagination(self):
+        """Test walking an account history page by page with cursors"""
+        for i in range(7):
+            self.transaction_manager.deposit(self.account1['account_id'], 1.0, f"Deposit {i}")
+
+        expected = [t['transaction_id'] for t in self.transaction_manager.get_account_transactions(self.account1['account_id'])]
+
+        # Rows inserted while paging must not shift or repeat later pages
+        seen = []
+        cursor = None
+        while True:
+            page = self.transaction_manager.get_account_transactions_page(
+                self.account1['account_id'], limit=3, cursor=cursor
+            )
+            seen.extend(t['transaction_id'] for t in page['transactions'])
+            cursor = page['next_cursor']
+            if cursor is None:
+                break
+            if len(seen) == 3:
+                self.transaction_manager.deposit(self.account1['account_id'], 1.0, "Arrived mid-walk")
+
+        self.assertEqual(seen, expected)
+
+        # Search pages use the same cursor format
+        page = self.transaction_manager.search_transactions_page(limit=5, account_id=self.account1['account_id'])
+        self.assertEqual(len(page['transactions']), 5)
+        self.assertIsNotNone(page['next_cursor'])
+
+        with self.assertRaises(ValueError):
+            self.transaction_manager.get_account_transactions_page(self.account1['account_id'], cursor='not-a-cursor')
+
+        # Well-formed cursors with the wrong value types are rejected before they reach a query
+        for tampered in (encode_cursor("2026", [1]), encode_cursor([], 1), encode_cursor("yesterday", 1),
+                         encode_cursor("2026-01-01", True), encode_cursor("2026-01-01", "1")):
+            with self.assertRaises(ValueError):
+                self.transaction_manager.get_account_transactions_page(self.account1['account_id'], cursor=tampered)
+
+
+    def test_running_and_daily_balances(self):
+        """Test balance_after, balance-as-of and statement balances"""
+        first = self.transaction_manager.deposit(self.account1['account_id'], 100.0)
+        self.transaction_manager.withdraw(self.account1['account_id'], 30.0)
+        self.transaction_manager.transfer(self.account1['account_id'], self.account2['account_id'], 20.0)
+        self.transaction_manager.apply_batch([
+            {'type': 'deposit', 'account_id': self.account1['account_id'], 'amount': '5.00'},
+        ])
+
+        # Every ledger row carries the balance it left behind
+        rows = self.transaction_manager.get_account_transactions(self.account1['account_id'])
+        self.assertEqual(
+            [row['balance_after'] for row in reversed(rows)],
+            [Decimal('1100.00'), Decimal('1070.00'), Decimal('1050.00'), Decimal('1055.00')]
+        )
+        incoming = self.transaction_manager.get_account_transactions(self.account2['account_id'])[0]
+        self.assertEqual(incoming['balance_after'], Decimal('520.00'))
+
+        first_row = self.transaction_manager.get_transaction(first['transaction_id'])
+        self.assertEqual(
+            self.transaction_manager.get_balance_as_of(self.account1['account_id'], first_row['transaction_date']),
+            Decimal('1100.00')
+        )
+        self.assertEqual(
+            self.transaction_manager.get_balance_as_of(self.account1['account_id'], '2000-01-01'),
+            Decimal('1000.00')
+        )
+
+        # Today's snapshot opens at the initial balance and closes at the current one
+        today = first_row['transaction_date'][:10]
+        statement = self.transaction_manager.get_statement_balances(self.account1['account_id'], today, today)
+        self.assertEqual(statement['opening_balance'], Decimal('1000.00'))
+        self.assertEqual(statement['closing_balance'], Decimal('1055.00'))
+
+        self.assertTrue(self.transaction_manager.reconcile_balance(self.account1['account_id'])['matches'])
+        self.account_manager.update_balance(self.account1['account_id'], 1.0)
+        self.assertFalse(self.transaction_manager.reconcile_balance(self.account1['account_id'])['matches'])
+
+
+    def test_stats_combine_rollups_and_edges(self):
+        """Test that stats from rollups and edge-day rows match stats over the raw ledger"""
+        account_id = self.account1['account_id']
+        now = [None]
+        with mock.patch.object(self.test_db, 'get_current_timestamp', lambda: now[0]):
+            for day, hour, amount in [(1, 9, 10), (1, 18, 40), (2, 12, 5), (3, 8, 70), (3, 20, 1), (4, 0, 3)]:
+                now[0] = datetime.datetime(2024, 1, day, hour)
+                self.transaction_manager.deposit(account_id, amount)
+                self.transaction_manager.withdraw(self.account2['account_id'], amount)
+            now[0] = datetime.datetime(2024, 1, 2, 15)
+            self.transaction_manager.apply_batch([
+                {'type': 'transfer', 'account_id': account_id, 'to_account_id': self.account2['account_id'], 'amount': 2},
+                {'type': 'deposit', 'account_id': account_id, 'amount': 500},
+            ])
+
+        rollup = self.test_db.execute_query(
+            "SELECT * FROM transaction_rollups WHERE account_id = ? AND rollup_date = '2024-01-02' AND transaction_type = 'deposit'",
+            (account_id,), 'one'
+        )
+        self.assertEqual(
+            (rollup['transaction_count'], rollup['total'], rollup['minimum'], rollup['maximum']), (2, 50500, 500, 50000)
+        )
+
+        def raw_stats(account_id, start_date, end_date):
+            query = """
+                SELECT transaction_type, COUNT(*) AS count, SUM(amount) AS total,
+                       MIN(amount) AS minimum, MAX(amount) AS maximum
+                FROM transactions
+                WHERE transaction_date >= ? AND transaction_date <= ? AND (? IS NULL OR account_id = ?)
+                GROUP BY transaction_type
+            """
+            rows = self.test_db.execute_query(query, (start_date, end_date, account_id, account_id), 'all')
+            return {row['transaction_type']: (row['count'], Decimal(row['total']) / 100) for row in rows}
+
+        ranges = [
+            ('2024-01-01', '2024-01-04'),
+            ('2024-01-01 12:00:00', '2024-01-03 12:00:00'),
+            ('2024-01-02', '2024-01-02 23:00:00'),
+            ('2024-01-03 09:00:00', '2024-01-03 21:00:00'),
+            ('2024-01-01', '2030-01-01'),
+        ]
+        for start_date, end_date in ranges:
+            for filter_id in (account_id, None):
+                stats = self.transaction_manager.get_transaction_stats(filter_id, start_date, end_date)
+                self.assertEqual(
+                    {stat['transaction_type']: (stat['count'], stat['total']) for stat in stats},
+                    raw_stats(filter_id, start_date, end_date),
+                    (start_date, end_date, filter_id)
+                )
+
+        stats = self.transaction_manager.get_transaction_stats(account_id, datetime.date(2024, 1, 1), '2024-01-03 23:59:59')
+        deposits = next(stat for stat in stats if stat['transaction_type'] == 'deposit')
+        self.assertEqual((deposits['count'], deposits['minimum'], deposits['maximum']), (6, Decimal('1.00'), Decimal('500.00')))
+        self.assertEqual(deposits['average'], Decimal('104.33'))
+
+        with self.assertRaises(ValueError):
+            self.transaction_manager.get_transaction_stats(start_date='last week')
+
+
+    def test_search_descriptions(self):
+        """Test full-text description search and relevance ordering"""
+        self.transaction_manager.deposit(self.account1['account_id'], 10.0, "Salary for March")
+        self.transaction_manager.deposit(self.account1['account_id'], 10.0, "Refund: loan #50 overpayment")
+        self.transaction_manager.withdraw(self.account1['account_id'], 10.0, "Loan payment for loan #5")
+
+        # Words match in order with the last one as a prefix, case-insensitively
+        results = self.transaction_manager.search_transactions(description_contains='loan pay')
+        self.assertEqual([t['description'] for t in results], ["Loan payment for loan #5"])
+        results = self.transaction_manager.search_transactions(description_contains='SAL')
+        self.assertEqual([t['description'] for t in results], ["Salary for March"])
+
+        # Query syntax in the text is treated literally
+        self.assertEqual(self.transaction_manager.search_transactions(description_contains='"march" OR'), [])
+
+        # Text without words, such as an empty search box, does not filter
+        everything = self.transaction_manager.search_transactions()
+        self.assertEqual(self.transaction_manager.search_transactions(description_contains=''), everything)
+        self.assertEqual(self.transaction_manager.search_transactions(description_contains=' # '), everything)
+
+        # The index follows updates to descriptions
+        self.test_db.execute_query("UPDATE transactions SET description = 'Bonus' WHERE description = 'Salary for March'")
+        self.assertEqual(self.transaction_manager.search_transactions(description_contains='salary'), [])
+        self.assertEqual(len(self.transaction_manager.search_transactions(description_contains='bonus')), 1)
+
+        # Relevance puts the description mentioning "loan" twice first
+        results = self.transaction_manager.search_transactions(description_contains='loan', order_by='relevance')
+        self.assertEqual(results[0]['description'], "Loan payment for loan #5")
+        with self.assertRaises(ValueError):
+            self.transaction_manager.search_transactions_page(description_contains='loan', order_by='relevance')
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,149 @@
+import unittest
+import os
+import sys
+import hashlib
+from pathlib import Path
+from unittest import mock
+
+# Add the project root to the Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from src.cache import LRUCache
+from src.passwords import PasswordHasher
+from src.user_manager import UserManager
+from test_config import DatabaseHelper, setup_test_database, cleanup_test_database
+
+
+class TestPasswordHashing(unittest.TestCase):
+    """Test cases for password hashing, rehash on login and the verification cache"""
+
+    def setUp(self):
+        """Set up a user manager with a cheap KDF cost so tests stay fast"""
+        self.test_db = setup_test_database()
+        self.hasher = PasswordHasher(scrypt_n=2 ** 10)
+        self.user_manager = UserManager(db=self.test_db, hasher=self.hasher)
+
+    def tearDown(self):
+        """Clean up after each test"""
+        self.test_db.cleanup_test_db()
+        cleanup_test_database()
+
+    def test_hash_format(self):
+        """Test that hashes are salted, versioned and verifiable"""
+        first = self.hasher.hash('s3cret')
+        second = self.hasher.hash('s3cret')
+
+        self.assertTrue(first.startswith('scrypt$1024$8$1$'))
+        self.assertNotEqual(first, second)
+        self.assertTrue(self.hasher.verify('s3cret', first))
+        self.assertFalse(self.hasher.verify('wrong', first))
+        self.assertFalse(self.hasher.verify('s3cret', 'scrypt$garbage'))
+
+        pbkdf2 = PasswordHasher(scheme='pbkdf2_sha256', pbkdf2_iterations=1000)
+        stored = pbkdf2.hash('s3cret')
+        self.assertTrue(stored.startswith('pbkdf2_sha256$1000$'))
+        self.assertTrue(self.hasher.verify('s3cret', stored))
+        self.assertTrue(self.hasher.needs_rehash(stored))
+        self.assertTrue(PasswordHasher(scrypt_n=2 ** 11).needs_rehash(first))
+        self.assertFalse(self.hasher.needs_rehash(first))
+
+    def test_legacy_hash_upgraded_on_login(self):
+        """Test that an unsalted SHA-256 hash still logs in and is replaced"""
+        legacy = hashlib.sha256(b'oldpass').hexdigest()
+        self.test_db.execute_query(
+            "INSERT INTO users (username, password_hash, email, full_name, created_at) VALUES (?, ?, ?, ?, ?)",
+            ('legacy', legacy, 'legacy@example.com', 'Legacy User', self.test_db.get_current_timestamp())
+        )
+
+        self.assertIsNone(self.user_manager.authenticate_user('legacy', 'wrong'))
+        self.assertEqual(self.user_manager.get_user_by_username('legacy')['password_hash'], legacy)
+
+        self.assertIsNotNone(self.user_manager.authenticate_user('legacy', 'oldpass'))
+        upgraded = self.user_manager.get_user_by_username('legacy')['password_hash']
+        self.assertTrue(upgraded.startswith('scrypt$'))
+
+        self.assertIsNotNone(self.user_manager.authenticate_user('legacy', 'oldpass'))
+        self.assertIsNone(self.user_manager.authenticate_user('nobody', 'oldpass'))
+
+    def test_successful_verifications_are_cached(self):
+        """Test that repeat checks skip the KDF and failures are never cached"""
+        stored = self.hasher.hash('s3cret')
+
+        with mock.patch.object(self.hasher, '_verify', wraps=self.hasher._verify) as kdf:
+            self.assertTrue(self.hasher.verify('s3cret', stored))
+            self.assertTrue(self.hasher.verify('s3cret', stored))
+            self.assertEqual(kdf.call_count, 1)
+
+            self.assertFalse(self.hasher.verify('wrong', stored))
+            self.assertFalse(self.hasher.verify('wrong', stored))
+            self.assertEqual(kdf.call_count, 3)
+
+            self.hasher.clear_cache()
+            self.assertTrue(self.hasher.verify('s3cret', stored))
+            self.assertEqual(kdf.call_count, 4)
+
+    def test_failed_logins_run_the_kdf(self):
+        """Test that inactive users and legacy hashes cost a full KDF, like any other login"""
+        user = self.user_manager.create_user('inactive', 'pw', 'inactive@example.com', 'Inactive User')
+        self.user_manager.deactivate_user(user['user_id'])
+        legacy = hashlib.sha256(b'oldpass').hexdigest()
+        # Builds the dummy hash up front, so each check below is a single KDF run
+        self.hasher.burn('warm-up')
+
+        with mock.patch.object(self.hasher, '_scrypt', wraps=self.hasher._scrypt) as kdf:
+            self.assertIsNone(self.user_manager.authenticate_user('inactive', 'pw'))
+            self.assertEqual(kdf.call_count, 1)
+
+            self.assertFalse(self.hasher.verify('wrong', legacy))
+            self.assertEqual(kdf.call_count, 2)
+
+    def test_user_cache_invalidated_on_writes(self):
+        """Test that cached users are reused until UserManager changes them"""
+        user_manager = UserManager(db=self.test_db, hasher=self.hasher, user_cache_ttl=60)
+        user = user_manager.create_user('cached', 'pw', 'cached@example.com', 'Cached User')
+
+        with mock.patch.object(self.test_db, 'execute_query', wraps=self.test_db.execute_query) as query:
+            self.assertEqual(user_manager.get_user_by_id(user['user_id'])['username'], 'cached')
+            self.assertEqual(user_manager.get_user_by_id(user['user_id'])['username'], 'cached')
+            self.assertEqual(query.call_count, 0)
+
+        user_manager.deactivate_user(user['user_id'])
+        self.assertEqual(user_manager.get_user_by_id(user['user_id'])['is_active'], 0)
+
+        account_id = self.test_db.execute_query(
+            "INSERT INTO accounts (account_number, owner_name, account_type, created_at, updated_at) "
+            "VALUES ('CACHE1', 'Cached User', 'checking', ?, ?)",
+            (self.test_db.get_current_timestamp(), self.test_db.get_current_timestamp())
+        )
+        user_manager.link_user_to_account(user['user_id'], account_id)
+        self.assertEqual(user_manager.get_user_by_id(user['user_id'])['account_id'], account_id)
+
+
+class TestLRUCache(unittest.TestCase):
+    """Test cases for the in-process LRU cache"""
+
+    def test_eviction_and_expiry(self):
+        """Test that the least recently used entry is evicted and old entries expire"""
+        cache = LRUCache(maxsize=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        self.assertEqual(cache.get('a'), 1)
+        cache.set('c', 3)
+
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual((cache.get('a'), cache.get('c')), (1, 3))
+
+        cache.invalidate('a')
+        self.assertEqual(cache.get('a', 'missing'), 'missing')
+
+        with mock.patch('src.cache.time.monotonic', side_effect=[100.0, 100.5, 102.0]):
+            expiring = LRUCache(ttl=1)
+            expiring.set('key', 'value')
+            self.assertEqual(expiring.get('key'), 'value')
+            self.assertIsNone(expiring.get('key'))
+        self.assertEqual(len(expiring), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,4 +1,4 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, session
+from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify, g, Response, stream_with_context
 import sys
 import os
 from pathlib import Path
@@ -8,11 +8,18 @@ from functools import wraps
 # Add the project root to the Python path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
+from src.database import Database
 from src.account import AccountManager
 from src.transaction import TransactionManager
 from src.loan import LoanManager
 from src.bug_tracker import BugTracker
 from src.user_manager import UserManager
+from src.passwords import PasswordHasher
+from src.dashboard import DashboardStats
+from src.portfolio import LoanPortfolio
+from src.statement_export import StatementExporter
+from src.money import to_decimal
+from src.cache import LRUCache, AccountCache
 
 app = Flask(__name__)
 app.secret_key = 'banking_system_secret_key'  # Used for flash messages and sessions
@@ -31,12 +38,45 @@ def format_date(date_obj, format_str='%b %d, %Y'):
     else:
         return date_obj.strftime(format_str)
 
-# Initialize managers
-account_manager = AccountManager()
-transaction_manager = TransactionManager()
-loan_manager = LoanManager()
-bug_tracker = BugTracker()
-user_manager = UserManager()
+# Initialize managers - all of them share one connection pool
+db = Database()
+# Account rows are cached by id and number; every AccountManager and TransactionManager write
+# invalidates them. The cache is per worker, so writes in one gunicorn worker only reach the
+# others when the entry expires. Balance checks and reports always read the database.
+ACCOUNT_CACHE_SIZE = 10000
+ACCOUNT_CACHE_TTL = 30
+db.account_cache = AccountCache(LRUCache(maxsize=ACCOUNT_CACHE_SIZE, ttl=ACCOUNT_CACHE_TTL))
+account_manager = AccountManager(db)
+transaction_manager = TransactionManager(db)
+loan_manager = LoanManager(db)
+bug_tracker = BugTracker(db)
+# Password checks run the KDF on the request thread; tune its cost to the login load
+password_hasher = PasswordHasher()
+# User rows are cached across requests for this many seconds. UserManager writes invalidate
+# them; changes made elsewhere (such as deleting a linked account) show up once the entry expires.
+USER_CACHE_TTL = 60
+user_manager = UserManager(db=db, hasher=password_hasher, user_cache_ttl=USER_CACHE_TTL)
+
+# Dashboard counters may be up to this many seconds old
+DASHBOARD_STATS_TTL = 30
+dashboard_stats = DashboardStats(db, ttl=DASHBOARD_STATS_TTL)
+
+# Portfolio analytics are cached until the loan book changes
+loan_portfolio = LoanPortfolio(db)
+PORTFOLIO_MAX_MONTHS = 120
+
+# Ledger exports are streamed a batch at a time
+statement_exporter = StatementExporter(db)
+
+# Most matches the account typeahead returns
+ACCOUNT_SEARCH_LIMIT = 10
+
+
+def current_user():
+    """Get the logged-in user, loaded at most once per request"""
+    if 'current_user' not in g:
+        g.current_user = user_manager.get_user_by_id(session['user_id']) if 'user_id' in session else None
+    return g.current_user
 
 
 # Authentication decorators
@@ -59,7 +99,7 @@ def admin_required(f):
             flash('Please log in to access this page.', 'warning')
             return redirect(url_for('login'))
         
-        user = user_manager.get_user_by_id(session['user_id'])
+        user = current_user()
         if not user or user['user_type'] != 'admin':
             flash('Access denied. Admin privileges required.', 'danger')
             return redirect(url_for('dashboard'))
@@ -72,7 +112,7 @@ def customer_access_check(account_id):
     if 'user_id' not in session:
         return False
     
-    user = user_manager.get_user_by_id(session['user_id'])
+    user = current_user()
     if not user:
         return False
     
@@ -84,6 +124,19 @@ def customer_access_check(account_id):
     return user['account_id'] == account_id
 
 
+def form_accounts(user, selected_account_id=None):
+    """Accounts to pre-render into a form's account picker"""
+    # Admins pick accounts through the typeahead search, so only a preselected one is rendered
+    if user['user_type'] == 'admin':
+        account = account_manager.get_account(selected_account_id) if selected_account_id else None
+    elif user['account_id']:
+        account = account_manager.get_account(user['account_id'])
+    else:
+        account = None
+    
+    return [account] if account else []
+
+
 @app.route('/login', methods=['GET', 'POST'])
 def login():
     """User login"""
@@ -174,7 +227,7 @@ def logout():
 @login_required
 def dashboard():
     """User dashboard - redirects to appropriate view based on user type"""
-    user = user_manager.get_user_by_id(session['user_id'])
+    user = current_user()
     
     if user['user_type'] == 'admin':
         return redirect(url_for('index'))  # Admin sees full dashboard
@@ -186,7 +239,7 @@ def dashboard():
 @login_required
 def customer_dashboard():
     """Customer dashboard - limited view for regular users"""
-    user = user_manager.get_user_by_id(session['user_id'])
+    user = current_user()
     
     if user['user_type'] == 'admin':
         return redirect(url_for('index'))
@@ -218,36 +271,20 @@ def customer_dashboard():
 @login_required
 def index():
     """Home page route with dashboard statistics - Admin only"""
-    user = user_manager.get_user_by_id(session['user_id'])
+    user = current_user()
     
     # Redirect customers to their dashboard
     if user['user_type'] != 'admin':
         return redirect(url_for('customer_dashboard'))
     
-    # Get total accounts
-    all_accounts = account_manager.get_all_accounts()
-    total_accounts = len(all_accounts)
-    
-    # Get transaction count (this is an approximation since we don't have a direct count method)
-    # In a real app, you'd have a more efficient way to get this count
-    total_transactions = 0
-    for account in all_accounts:
-        transactions = transaction_manager.get_account_transactions(account['account_id'], limit=1000)
-        total_transactions += len(transactions)
-    
-    # Get active loans
-    all_loans = loan_manager.get_all_loans()
-    active_loans = len([loan for loan in all_loans if loan['status'] == 'active'])
-    
-    # Get open bugs
-    all_bugs = bug_tracker.get_all_bugs()
-    open_bugs = len([bug for bug in all_bugs if bug['status'] == 'open'])
+    # All counters come from a few aggregate queries, cached for a short while
+    stats = dashboard_stats.get_stats()
     
     return render_template('index.html', 
-                          total_accounts=total_accounts,
-                          total_transactions=total_transactions,
-                          active_loans=active_loans,
-                          open_bugs=open_bugs)
+                          total_accounts=stats['total_accounts'],
+                          total_transactions=stats['total_transactions'],
+                          active_loans=stats['active_loans'],
+                          open_bugs=stats['open_bugs'])
 
 
 @app.route('/accounts')
@@ -273,7 +310,7 @@ def new_account():
         account_type = request.form.get('account_type')
         email = request.form.get('email')
         phone_number = request.form.get('phone_number')
-        initial_balance = float(request.form.get('initial_balance', 0))
+        initial_balance = to_decimal(request.form.get('initial_balance') or 0)
         
         try:
             # Create the account
@@ -307,8 +344,13 @@ def view_account(account_id):
         flash('Account not found', 'danger')
         return redirect(url_for('accounts') if session.get('user_type') == 'admin' else url_for('customer_dashboard'))
     
-    # Get transactions for this account
-    transactions = transaction_manager.get_account_transactions(account_id)
+    # Get one page of transactions for this account, older pages follow the cursor
+    try:
+        page = transaction_manager.get_account_transactions_page(account_id, cursor=request.args.get('cursor'))
+    except ValueError:
+        flash('Invalid transaction page requested.', 'warning')
+        page = transaction_manager.get_account_transactions_page(account_id)
+    transactions = page['transactions']
     
     # Get loans for this account
     loans = loan_manager.get_account_loans(account_id)    # Format dates for display
@@ -325,17 +367,48 @@ def view_account(account_id):
             if date_field in loan and loan[date_field]:
                 loan[date_field] = format_date(loan[date_field])
       # Get current user for role-based UI controls
-    user = user_manager.get_user_by_id(session['user_id'])
+    user = current_user()
     
     return render_template(
         'account_details.html', 
         account=account, 
         transactions=transactions,
+        next_cursor=page['next_cursor'],
         loans=loans,
         user=user
     )
 
 
+@app.route('/accounts/<int:account_id>/export')
+@login_required
+def export_account(account_id):
+    """Stream an account's ledger as a CSV or JSONL download"""
+    # Check access permissions
+    if not customer_access_check(account_id):
+        flash('Access denied. You can only export your own account.', 'danger')
+        return redirect(url_for('dashboard'))
+    
+    file_format = request.args.get('format', 'csv')
+    if file_format not in ('csv', 'jsonl'):
+        flash('Export format must be CSV or JSONL.', 'warning')
+        return redirect(url_for('view_account', account_id=account_id))
+    
+    # Dates are checked here, before the response starts streaming
+    try:
+        export = statement_exporter.iter_csv if file_format == 'csv' else statement_exporter.iter_jsonl
+        chunks = export(account_id, request.args.get('start_date'), request.args.get('end_date'))
+    except ValueError as e:
+        flash(f'Error exporting transactions: {str(e)}', 'danger')
+        return redirect(url_for('view_account', account_id=account_id))
+    
+    mimetype = 'text/csv' if file_format == 'csv' else 'application/x-ndjson'
+    return Response(
+        stream_with_context(chunks),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename=account-{account_id}-transactions.{file_format}'}
+    )
+
+
 @app.route('/accounts/<int:account_id>/edit', methods=['GET', 'POST'])
 @admin_required
 def edit_account(account_id):
@@ -390,7 +463,7 @@ def delete_account(account_id):
 @login_required
 def deposit():
     """Deposit money into an account"""
-    user = user_manager.get_user_by_id(session['user_id'])
+    user = current_user()
     
     if request.method == 'POST':
         account_id = int(request.form.get('account_id'))
@@ -400,7 +473,7 @@ def deposit():
             flash('Access denied. You can only deposit to your own account.', 'danger')
             return redirect(url_for('dashboard'))
         
-        amount = float(request.form.get('amount'))
+        amount = to_decimal(request.form.get('amount'))
         description = request.form.get('description')
         
         try:
@@ -409,24 +482,18 @@ def deposit():
             return redirect(url_for('view_account', account_id=account_id))
         except Exception as e:
             flash(f'Error making deposit: {str(e)}', 'danger')
-      # Get accounts for dropdown - admin sees all, customer sees only their own
-    if user['user_type'] == 'admin':
-        all_accounts = account_manager.get_all_accounts()
-    else:
-        if user['account_id']:
-            account = account_manager.get_account(user['account_id'])
-            all_accounts = [account] if account else []
-        else:
-            all_accounts = []
     
-    return render_template('deposit.html', accounts=all_accounts)
+    # Get accounts for dropdown - admins search, customers see only their own
+    all_accounts = form_accounts(user, request.args.get('account_id', type=int))
+    
+    return render_template('deposit.html', accounts=all_accounts, account_search=user['user_type'] == 'admin')
 
 
 @app.route('/transactions/withdraw', methods=['GET', 'POST'])
 @login_required
 def withdraw():
     """Withdraw money from an account"""
-    user = user_manager.get_user_by_id(session['user_id'])
+    user = current_user()
     
     if request.method == 'POST':
         account_id = int(request.form.get('account_id'))
@@ -436,7 +503,7 @@ def withdraw():
             flash('Access denied. You can only withdraw from your own account.', 'danger')
             return redirect(url_for('dashboard'))
         
-        amount = float(request.form.get('amount'))
+        amount = to_decimal(request.form.get('amount'))
         description = request.form.get('description')
         
         try:
@@ -446,24 +513,17 @@ def withdraw():
         except Exception as e:
             flash(f'Error making withdrawal: {str(e)}', 'danger')
     
-    # Get accounts for dropdown - admin sees all, customer sees only their own
-    if user['user_type'] == 'admin':
-        all_accounts = account_manager.get_all_accounts()
-    else:
-        if user['account_id']:
-            account = account_manager.get_account(user['account_id'])
-            all_accounts = [account] if account else []
-        else:
-            all_accounts = []
+    # Get accounts for dropdown - admins search, customers see only their own
+    all_accounts = form_accounts(user, request.args.get('account_id', type=int))
     
-    return render_template('withdraw.html', accounts=all_accounts)
+    return render_template('withdraw.html', accounts=all_accounts, account_search=user['user_type'] == 'admin')
 
 
 @app.route('/transactions/transfer', methods=['GET', 'POST'])
 @login_required
 def transfer():
     """Transfer money between accounts"""
-    user = user_manager.get_user_by_id(session['user_id'])
+    user = current_user()
     
     if request.method == 'POST':
         from_account_id = int(request.form.get('from_account_id'))
@@ -474,7 +534,7 @@ def transfer():
             flash('Access denied. You can only transfer from your own account.', 'danger')
             return redirect(url_for('dashboard'))
         
-        amount = float(request.form.get('amount'))
+        amount = to_decimal(request.form.get('amount'))
         description = request.form.get('description')
         
         try:
@@ -484,72 +544,129 @@ def transfer():
         except Exception as e:
             flash(f'Error making transfer: {str(e)}', 'danger')
     
-    # Get accounts for dropdowns - admin sees all, customer sees only their own for source
-    if user['user_type'] == 'admin':
-        all_accounts = account_manager.get_all_accounts()
-    else:
-        if user['account_id']:
-            account = account_manager.get_account(user['account_id'])
-            all_accounts = [account] if account else []
-        else:
-            all_accounts = []
+    # Get accounts for dropdowns - admins search, customers see only their own for source
+    all_accounts = form_accounts(user, request.args.get('from_account_id', type=int))
     
-    # For destination, everyone can see all accounts (you can transfer to anyone)
-    all_destination_accounts = account_manager.get_all_accounts()
+    # For destination, everyone can search all accounts (you can transfer to anyone)
+    to_account_id = request.args.get('to_account_id', type=int)
+    destination = account_manager.get_account(to_account_id) if to_account_id else None
+    all_destination_accounts = [destination] if destination else []
     
-    return render_template('transfer.html', accounts=all_accounts, destination_accounts=all_destination_accounts)
+    return render_template('transfer.html', accounts=all_accounts, destination_accounts=all_destination_accounts,
+                           account_search=user['user_type'] == 'admin')
+
+
+@app.route('/api/accounts/search')
+@login_required
+def api_search_accounts():
+    """Typeahead account search for the account pickers, returns JSON"""
+    user = current_user()
+    
+    limit = min(request.args.get('limit', ACCOUNT_SEARCH_LIMIT, type=int), ACCOUNT_SEARCH_LIMIT)
+    try:
+        accounts = account_manager.search_accounts_by_prefix(request.args.get('q', ''), limit)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    results = []
+    for account in accounts:
+        result = {
+            'account_id': account['account_id'],
+            'account_number': account['account_number'],
+            'owner_name': account['owner_name'],
+            'account_type': account['account_type']
+        }
+        # Only reveal balances the user is allowed to see
+        if user['user_type'] == 'admin' or user['account_id'] == account['account_id']:
+            result['balance'] = str(account['balance'])
+        results.append(result)
+    
+    return jsonify(results)
 
 
 @app.route('/loans')
 @login_required
 def loans():
     """List loans - admin sees all, customers see only their own"""
-    user = user_manager.get_user_by_id(session['user_id'])
+    user = current_user()
     
+    status = request.args.get('status') or None
+    
+    # Admin sees all loans, customers see only their own
     if user['user_type'] == 'admin':
-        # Admin sees all loans
-        all_accounts = account_manager.get_all_accounts()
-        account_loans = []
-        
-        for account in all_accounts:
-            loans = loan_manager.get_account_loans(account['account_id'])
-            for loan in loans:
-                loan_data = dict(loan)
-                loan_data['account_number'] = account['account_number']
-                loan_data['owner_name'] = account['owner_name']
-                
-                # Format loan dates
-                for date_field in ['application_date', 'start_date', 'end_date', 'last_payment_date']:
-                    if date_field in loan_data and loan_data[date_field]:
-                        loan_data[date_field] = format_date(loan_data[date_field])
-                        
-                account_loans.append(loan_data)
+        account_id = None
+    elif user['account_id']:
+        account_id = user['account_id']
     else:
-        # Customer sees only their own loans
-        account_loans = []
-        if user['account_id']:
-            account = account_manager.get_account(user['account_id'])
-            loans = loan_manager.get_account_loans(user['account_id'])
-            
-            for loan in loans:
-                loan_data = dict(loan)
-                loan_data['account_number'] = account['account_number']
-                loan_data['owner_name'] = account['owner_name']
-                  # Format loan dates
-                for date_field in ['application_date', 'start_date', 'end_date', 'last_payment_date']:
-                    if date_field in loan_data and loan_data[date_field]:
-                        loan_data[date_field] = format_date(loan_data[date_field])
-                        
-                account_loans.append(loan_data)
+        return render_template('loans.html', loans=[], user=user, status=status, next_cursor=None)
     
-    return render_template('loans.html', loans=account_loans, user=user)
+    try:
+        page = loan_manager.list_loans_with_accounts(
+            status=status, account_id=account_id, cursor=request.args.get('cursor')
+        )
+    except ValueError:
+        flash('Invalid loan page requested.', 'warning')
+        page = loan_manager.list_loans_with_accounts(status=status, account_id=account_id)
+    
+    account_loans = page['loans']
+    for loan_data in account_loans:
+        # Format loan dates
+        for date_field in ['application_date', 'start_date', 'end_date', 'last_payment_date']:
+            if date_field in loan_data and loan_data[date_field]:
+                loan_data[date_field] = format_date(loan_data[date_field])
+    
+    return render_template('loans.html', loans=account_loans, user=user, status=status,
+                           next_cursor=page['next_cursor'])
+
+
+@app.route('/api/loans/portfolio')
+@admin_required
+def api_loan_portfolio():
+    """Portfolio exposure, delinquency and projected cash flow - Admin only, returns JSON"""
+    if request.args.get('refresh'):
+        loan_portfolio.invalidate()
+    
+    # Longer projections are clamped; each extra month costs a pass over every active loan
+    months = request.args.get('months', '12')
+    if not months.isdigit() or int(months) < 1:
+        return jsonify({'error': 'months must be a positive whole number'}), 400
+    months = min(int(months), PORTFOLIO_MAX_MONTHS)
+    
+    try:
+        as_of = request.args.get('as_of')
+        exposure = loan_portfolio.get_exposure()
+        delinquency = loan_portfolio.get_delinquency_summary(as_of)
+        cash_flow = loan_portfolio.get_projected_cash_flow(months, as_of)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    # Amounts are sent as strings so no precision is lost
+    def stringify(rows):
+        return [{key: str(value) if key in ('principal', 'outstanding', 'expected_inflow', 'interest') else value
+                 for key, value in row.items()} for row in rows]
+    
+    return jsonify({
+        'exposure': stringify(exposure),
+        'delinquency': stringify(delinquency),
+        'cash_flow': stringify(cash_flow)
+    })
+
+
+@app.route('/api/cache/stats')
+@admin_required
+def api_cache_stats():
+    """Hit rate and eviction counters of the account and user caches - Admin only, returns JSON"""
+    return jsonify({
+        'accounts': db.account_cache.stats() if db.account_cache else None,
+        'users': user_manager.user_cache.stats() if user_manager.user_cache else None
+    })
 
 
 @app.route('/loans/apply', methods=['GET', 'POST'])
 @login_required
 def apply_for_loan():
     """Apply for a new loan"""
-    user = user_manager.get_user_by_id(session['user_id'])
+    user = current_user()
     
     if request.method == 'POST':
         account_id = int(request.form.get('account_id'))
@@ -559,7 +676,7 @@ def apply_for_loan():
             flash('Access denied. You can only apply for loans on your own account.', 'danger')
             return redirect(url_for('dashboard'))
         
-        loan_amount = float(request.form.get('loan_amount'))
+        loan_amount = to_decimal(request.form.get('loan_amount'))
         interest_rate = float(request.form.get('interest_rate'))
         term_months = int(request.form.get('term_months'))
         
@@ -581,17 +698,10 @@ def apply_for_loan():
         except Exception as e:
             flash(f'Error applying for loan: {str(e)}', 'danger')
     
-    # Get accounts for dropdown - admin sees all, customer sees only their own
-    if user['user_type'] == 'admin':
-        all_accounts = account_manager.get_all_accounts()
-    else:
-        if user['account_id']:
-            account = account_manager.get_account(user['account_id'])
-            all_accounts = [account] if account else []
-        else:
-            all_accounts = []
+    # Get accounts for dropdown - admins search, customers see only their own
+    all_accounts = form_accounts(user, request.args.get('account_id', type=int))
     
-    return render_template('apply_loan.html', accounts=all_accounts)
+    return render_template('apply_loan.html', accounts=all_accounts, account_search=user['user_type'] == 'admin')
 
 
 @app.route('/loans/<int:loan_id>/approve', methods=['POST'])
@@ -637,7 +747,7 @@ def make_payment(loan_id):
     account = account_manager.get_account(loan['account_id'])
     
     if request.method == 'POST':
-        payment_amount = float(request.form.get('payment_amount'))
+        payment_amount = to_decimal(request.form.get('payment_amount'))
         
         try:
             payment_result = loan_manager.make_payment(loan_id, payment_amount)